@@ -73,6 +73,7 @@ url_bsp = [
     url(r'^import/$', views_market.console_bsp_import, name='console_market_bsp_import'),
     url(r'^import/download-excel-format/$', views_market.console_bsp_import_download_excel_format, name='console_market_bsp_import_download_excel_format'),
     url(r'^import/upload-excel/$', views_market.console_bsp_import_upload_excel, name='console_market_bsp_import_upload_excel'),
+    url(r'^import/progress/$', views_market.console_bsp_import_progress, name='console_market_bsp_import_progress'),
     url(r'^import/queue/$', views_market.console_bsp_import_queue, name='console_market_bsp_import_queue'),
     url(r'^import/remove/$', views_market.console_bsp_import_remove, name='console_market_bsp_import_remove'),
 
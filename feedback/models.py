@@ -113,6 +113,8 @@ class BspFeedbackResponse(BaseResponse):
             { 'fields':['organization_id'], 'cls':False, 'sparse': True},
             'bsp_id',
             { 'fields':['batch_id'], 'cls':False, 'sparse': True, 'unique': True },
+            # Graph data pipelines (refer reports.visuals.build_answer_pipeline)
+            { 'fields':['organization_id', 'list_answers.question_label', '-response_date'], 'cls':False },
         ]
     }
 
@@ -9,12 +9,15 @@ from django.contrib.auth.models import User
 from market.models import BusinessServicePoint
 from feedback.models import BspFeedbackForm, BspFeedbackResponse
 from critics.models import Entities, Rating, Comment
+from reports import data_cache, rollups
 
-def save_bsp_feedback_response(response_json):
+def save_bsp_feedback_response(response_json, form=None):
     """
     Method to save BSP Feedback Response.
 
     :param response_json: JSON dict data that has to be processed.
+    :param form: (Optional) Already fetched feedback form; used to avoid queries when
+        processing responses in batch.
     :return: True if processing was successful, False if response was already processed.
 
     .. warning::
@@ -28,7 +31,8 @@ def save_bsp_feedback_response(response_json):
 
     # Get BSP Feedback form
     form_id = response_json['form_id']
-    form = BspFeedbackForm.objects.get(id=form_id)
+    if form is None or str(form.id) != str(form_id):
+        form = BspFeedbackForm.objects.get(id=form_id)
     form_version = response_json['form_version']
     version_obsolete = False if str(form.version) == form_version else True
 
@@ -92,7 +96,7 @@ def save_bsp_feedback_response(response_json):
             comment = None
 
         # (d) Create BSP Feedback Response
-        bsp_response = BspFeedbackResponse.objects.create(
+        bsp_response = BspFeedbackResponse(
             organization_id = bsp.organization_id,
             bsp_id          = str(bsp.pk),
             form_id         = str(form.id),
@@ -127,6 +131,11 @@ def save_bsp_feedback_response(response_json):
 
             batch_id        = batch_id
         )
+        bsp_response.save(force_insert=True, form=form)
+
+        # Update graph rollups & invalidate cached graph data
+        rollups.add_responses([bsp_response])
+        data_cache.bump_generation(bsp.organization_id, form.id)
 
         # Processing completed! Return now
         return True
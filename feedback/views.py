@@ -5,6 +5,7 @@ from django.shortcuts import render
 from django.http import HttpResponseForbidden, HttpResponse, JsonResponse
 from django.http.response import Http404
 from django.conf import settings
+from django.utils.functional import SimpleLazyObject
 import json
 import copy
 from django.views.decorators.csrf import csrf_exempt
@@ -27,8 +28,10 @@ from reports.models import GraphDiagram
 from market.models import BusinessServicePoint, BspTypes, Brand
 from accounts.models import RegisteredUser
 from storeroom.models import ResponseQueue
+from storeroom.buffer import enqueue_response, get_backpressure, BufferWriteError
 from critics.models import Rating
 from utilities.api_utils import ApiResponse
+from utilities.cache_utils import TTLCache
 
 #TODO: Mobile/Web access checks
 def open_bsp_feedback(request, bsp_id):
@@ -50,9 +53,9 @@ def open_bsp_feedback(request, bsp_id):
         # Key Error: username not present,  DoesNotExist_mongo: Invalid BSP
         return HttpResponseForbidden("Invalid page request.")
 
-    # Get feedback form.
+    # Get feedback form along with theme.
     try:
-        form = bsp.feedback_form.form
+        form = BspFeedbackForm.objects.select_related('theme_skin__theme').get(id=bsp.feedback_form.form_id)
     except AttributeError:
         # AttributeError: bsp.feedback_form is None
         form = None
@@ -62,11 +65,13 @@ def open_bsp_feedback(request, bsp_id):
         # Feedback form found, prepare form render data
         template = 'themes/{}/form_base.html'.format(form.theme_skin.theme.code)
 
-        lookup_translations = form.get_translation_lookup()
-        for ques in BspFixedQuestions.questions:
-            trans = ques.translation
-            # print trans.pk
-            lookup_translations[str(trans.pk)] = trans
+        def get_lookup_translations():
+            lookup_translations = form.get_translation_lookup()
+            for ques in BspFixedQuestions.questions:
+                trans = ques.translation
+                # print trans.pk
+                lookup_translations[str(trans.pk)] = trans
+            return lookup_translations
 
         data = {
             'context': 'BSP_FEEDBACK',
@@ -74,10 +79,14 @@ def open_bsp_feedback(request, bsp_id):
 
             'form': form,
             'title': bsp.name,
-            'lookup_translations': lookup_translations,
+            'lookup_translations': SimpleLazyObject(get_lookup_translations),
             'FIXED_QUESTIONS': BspFixedQuestions.questions,
             'DEFAULT_LANGUAGE_CODE': Language.DEFAULT_LANGUAGE_CODE,    # Fallback language incase translation not found
 
+            # Rendered questionnaire cache
+            'form_render_key': form.get_render_cache_key(),
+            'FORM_RENDER_CACHE_TIMEOUT': settings.FORM_RENDER_CACHE_TIMEOUT,
+
             # TODO: Set user properties
             'reg_user': RegisteredUser.objects.get(user__username=username),
             'USER_DEFAULT_LANG_CODE': 'eng'
@@ -89,12 +98,17 @@ def open_bsp_feedback(request, bsp_id):
 
 
 
+# Short-lived cache of BSP & feedback form existence used by submission.
+# Format: { ("bsp", "<bsp_id>"): <bool>, ("form", "<form_id>"): <bool>, ... }
+feedback_exists_cache = TTLCache(ttl=settings.STOREROOM_LOOKUP_CACHE_TTL, max_size=4096)
+
 # TODO: Mobile/Web access checks
 @csrf_exempt
 def submit_bsp_feedback_response(request):
     """
     API view to submit BSP feedback response. This view receives response
-    submitted by the user and is queued for processing.
+    submitted by the user and is queued for processing. If queue is overloaded,
+    response is rejected with http 429 and ``Retry-After`` header (refer :func:`storeroom.buffer.get_backpressure`).
 
     **Type**: POST
 
@@ -104,24 +118,32 @@ def submit_bsp_feedback_response(request):
     if request.method.lower() == 'post':
         token = request.POST['token']
 
+        # Backpressure
+        retry_after = get_backpressure(ResponseQueue.CT_BSP_FEEDBACK)
+        if retry_after is not None:
+            return ApiResponse(
+                status = ApiResponse.ST_TOO_MANY_REQUESTS,
+                message = 'Too many responses in queue. Please retry after {} seconds.'.format(retry_after),
+                retry_after = retry_after
+            ).gen_http_response(use_http_code=True, headers={'Retry-After': str(retry_after)})
+
         response_data = request.POST['response']
 
         try:
             response_json = json.loads(response_data)
 
-            # Get concerned BSP
+            # Check concerned BSP
             bsp_id = response_json['bsp_id']
-            bsp = BusinessServicePoint.objects.get(pk=bsp_id)
+            if not feedback_exists_cache.get_or_set(('bsp', str(bsp_id)), lambda: BusinessServicePoint.objects(pk=bsp_id).count() > 0):
+                raise DoesNotExist_mongo()
 
-            # Get BSP Feedback form
+            # Check BSP Feedback form
             form_id = response_json['form_id']
-            form = BspFeedbackForm.objects.get(id=form_id)
+            if not feedback_exists_cache.get_or_set(('form', str(form_id)), lambda: BspFeedbackForm.objects.filter(id=form_id).exists()):
+                raise BspFeedbackForm.DoesNotExist()
 
             # OK! Push to the queue
-            resp_queue = ResponseQueue.objects.create(
-                context = ResponseQueue.CT_BSP_FEEDBACK,
-                data    = response_data,
-            )
+            enqueue_response(ResponseQueue.CT_BSP_FEEDBACK, response_data)
 
             return ApiResponse(status=ApiResponse.ST_SUCCESS, message='Response queued for processing.').gen_http_response()
         except ValueError:
@@ -135,6 +157,8 @@ def submit_bsp_feedback_response(request):
             return ApiResponse(status=ApiResponse.ST_FORBIDDEN, message="Invalid business or service point.").gen_http_response()
         except BspFeedbackForm.DoesNotExist:
             return ApiResponse(status=ApiResponse.ST_FORBIDDEN, message="Feedback form with id '{}' does not exists.".format(form_id)).gen_http_response()
+        except BufferWriteError as ex:
+            return ApiResponse(status=ApiResponse.ST_SERVER_ERROR, message=ex.message).gen_http_response()
     else:
         # GET Forbidden
         return ApiResponse(status=ApiResponse.ST_FORBIDDEN, message='Use post.').gen_http_response()
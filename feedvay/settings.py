@@ -293,6 +293,53 @@ DEFAULT_FORM_THEME = {
     'theme_code': 'bootstrap_3',
     'skin_code': 'default'
 }
+FORM_SCHEMA_CACHE_SIZE = 256    # Max number of compiled form schemas (form versions) cached per process
+FORM_EXPRESSION_CACHE_SIZE = 1024    # Max number of compiled condition & calculated field expressions cached per process
+FORM_RENDER_CACHE_TIMEOUT = 24*60*60    # In seconds; rendered questionnaire cache (key changes with form version & translations)
+FORM_TRANSLATIONS_CACHE_TIMEOUT = 24*60*60    # In seconds; server cache of form translation bundles
+FORM_TRANSLATIONS_MAX_AGE = 365*24*60*60   # In seconds; client cache lifetime of versioned form translation bundle
+
+# ----- Storeroom -----
+STOREROOM_QUEUE_LEASE = 5*60    # In seconds; lease of claimed response queue records after which they are reclaimed by other workers
+STOREROOM_QUEUE_RETRY = {       # Retry of failed response queue records (refer 'ResponseQueue.trans_failed')
+    'MAX_ATTEMPTS': 5,          # Records are moved to dead letters after these many attempts (failed or lease expired)
+    'BACKOFF_BASE': 60,         # In seconds; delay after first failure, doubled on every next failure
+    'BACKOFF_MAX': 6*60*60,     # In seconds; max delay between attempts
+}
+STOREROOM_QUEUE_BUFFER = {      # Group-commit buffer for submitted responses (refer 'storeroom.buffer')
+    'ENABLED': True,
+    'MAX_ITEMS': 100,           # Flush when these many responses are buffered
+    'MAX_DELAY_MS': 50,         # Flush atleast every these many milliseconds
+    'ACK': 'flush',             # 'flush': respond after write; 'immediate': respond after buffering (may lose responses on crash)
+    'FLUSH_TIMEOUT': 10,        # In seconds; max wait for write in 'flush' mode
+}
+STOREROOM_QUEUE_LANES = {       # Per-context priority lanes of response queue (refer 'ResponseQueue.claim_lanes')
+    # WEIGHT: Share of each batch claimed by workers; MAX_DEPTH: Pending responses after which
+    # submissions are rejected with 429; RETRY_AFTER: Seconds client must wait after 429
+    'bsp_feedback': {'WEIGHT': 4, 'MAX_DEPTH': 20000, 'RETRY_AFTER': 30},
+    'survey_response': {'WEIGHT': 1, 'MAX_DEPTH': 100000, 'RETRY_AFTER': 120},
+}
+STOREROOM_BACKPRESSURE_CHECK_TTL = 5    # In seconds; cache of queue depth checked by submit views
+STOREROOM_LOOKUP_CACHE_TTL = 60     # In seconds; cache of survey/phase/BSP existence checks in submit views
+STOREROOM_BATCH_MAX_RESPONSES = 500     # Max responses per batch submission
+STOREROOM_BATCH_MAX_BYTES = 20*1024*1024    # Max (decompressed) size of batch submission payload
+STOREROOM_PAYLOAD_CODEC = 'json'    # Codec of ResponseQueue/ImportRecord payloads: 'json' (plain string) or 'zlib' (compressed binary; opt-in,
+                                    # rollback to a release without codecs requires 'storeroom_pack_payloads --codec json' first)
+STOREROOM_METRICS_RETENTION = 7*24*60*60     # In seconds; retention of per-minute queue processing counters
+
+# ----- Reports -----
+REPORTS_GRAPH_CACHE = {         # Cache of graph data (refer 'reports.data_cache')
+    'ENABLED': True,
+    'TIMEOUT': 60*60,           # In seconds; cached data is also invalidated when a new response is ingested
+    'LOCK_TIMEOUT': 120,        # In seconds; max time for which a miss is locked for computation
+    'LOCK_WAIT': 30,            # In seconds; max wait of concurrent requests for locked computation
+}
+REPORTS_ROLLUPS = {             # Daily per-question answer rollups (refer 'reports.models.AnswerRollup')
+    'INGEST': True,             # Update rollups when responses are ingested
+    'READ': False,              # Compute supported graphs from rollups; enable only after backfill using
+                                # 'reports_rebuild_rollups' command and disable while rollups are being rebuilt
+    'MAX_VALUE_LENGTH': 64,     # String answers longer than this are not counted in rollups; graphs on them read responses
+}
 
 # ----- Google Map API ----
 API_GOOGLE_MAP = "<google_api_key>"
@@ -35,6 +35,7 @@ urlpatterns = [
     url(r'^geography/', include('geography.urls')),
     url(r'^feedback/', include('feedback.urls')),
     url(r'^reports/', include('reports.urls')),
+    url(r'^storeroom/', include('storeroom.urls')),
 
     # Admin and staff
     url(r'^admin/', admin.site.urls),
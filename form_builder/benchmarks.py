@@ -0,0 +1,369 @@
+# Copyright (C) 2017 Feedvay (Gagandeep Singh: singh.gagan144@gmail.com) - All Rights Reserved
+# Content in this document can not be copied and/or distributed without the express
+# permission of Gagandeep Singh.
+import gc
+import random
+import resource
+import time
+
+from form_builder import form_schema
+from form_builder.schema_cache import CompiledFormSchema
+
+# Dummy translation id used for all synthetic components
+BENCHMARK_TRANSLATION_ID = '000000000000000000000000'
+
+# ---------- Synthetic forms ----------
+def generate_field_dict(label, field_class, required=True):
+    """
+    Method to generate json of a form field for benchmarking.
+
+    :param label: Field label
+    :param field_class: Class name of the field; refer :data:`SYNTHETIC_FIELD_CLASSES`
+    :param required: Whether field is mandatory
+    :return: Field JSON
+
+    **Authors**: Gagandeep Singh
+    """
+    field_dict = {
+        "_cls_base": "BasicFormField",
+        "_cls": field_class,
+        "label": label,
+        "text_translation_id": BENCHMARK_TRANSLATION_ID,
+        "required": required,
+    }
+
+    if field_class == 'NumberFormField':
+        field_dict.update({"min_value": 0, "max_value": 1000})
+    elif field_class == 'DecimalFormField':
+        field_dict.update({"min_value": 0.0, "max_value": 1000.0})
+    elif field_class in ['MCSSFormField', 'MCMSFormField']:
+        field_dict.update({
+            "list_choices": [{"value": "choice_{}".format(i), "text": BENCHMARK_TRANSLATION_ID} for i in range(5)],
+        })
+        if field_class == 'MCMSFormField':
+            field_dict.update({"min_selection": 1, "max_selection": 3})
+
+    return field_dict
+
+# Field classes used in synthetic forms in round robin
+SYNTHETIC_FIELD_CLASSES = (
+    'TextFormField',
+    'TextAreaFormField',
+    'NumberFormField',
+    'DecimalFormField',
+    'DateFormField',
+    'BinaryFormField',
+    'MCSSFormField',
+    'MCMSFormField',
+    'RatingFormField',
+)
+
+def generate_form_schema(num_fields):
+    """
+    Method to generate a flat form schema with ``num_fields`` fields of various classes.
+
+    :param num_fields: Number of fields
+    :return: Schema JSON
+
+    **Authors**: Gagandeep Singh
+    """
+    return [
+        generate_field_dict("field_{}".format(i), SYNTHETIC_FIELD_CLASSES[i % len(SYNTHETIC_FIELD_CLASSES)])
+        for i in range(num_fields)
+    ]
+
+def generate_section_dict(component_id, children):
+    """
+    Method to generate json of a section layout for benchmarking.
+
+    **Authors**: Gagandeep Singh
+    """
+    return {
+        "_cls_base": "BaseLayout",
+        "_cls": "SectionLayout",
+        "_id": component_id,
+        "highlight_layout": True,
+        "children": children,
+    }
+
+def generate_condition_dict(condition_class, component_id, expression, **kwargs):
+    """
+    Method to generate json of a condition for benchmarking.
+
+    **Authors**: Gagandeep Singh
+    """
+    condition_dict = {
+        "_cls_base": "BaseCondition",
+        "_cls": condition_class,
+        "_id": component_id,
+        "is_advance": False,
+        "expression": expression,
+        "lock_expression": False,
+        "validate_expr_var": False,
+    }
+    condition_dict.update(kwargs)
+    return condition_dict
+
+def generate_nested_form_schema(num_fields, group_size=10):
+    """
+    Method to generate a form schema with ``num_fields`` fields nested in conditions & layouts.
+    Fields are divided in groups of ``group_size`` and each group is placed, in round robin, as:
+
+        - plain fields at top level,
+        - :class:`form_builder.layouts.SectionLayout` containing a nested :class:`form_builder.conditions.BinaryCondition`,
+        - :class:`form_builder.conditions.BinaryCondition` with true & false branches,
+        - :class:`form_builder.conditions.SwitchCondition` with two cases & default branch.
+
+    Schema is deterministic for same arguments so that results are comparable between commits.
+
+    :param num_fields: Number of fields
+    :param group_size: Number of fields per group
+    :return: Schema JSON
+
+    **Authors**: Gagandeep Singh
+    """
+    list_fields = generate_form_schema(num_fields)
+    expression = "data.field_0 == 'lorem ipsum'"
+
+    schema = []
+    for group_no, i in enumerate(range(0, num_fields, group_size)):
+        group = list_fields[i:i+group_size]
+        half = (len(group)+1)//2
+        pattern = group_no % 4
+
+        if pattern == 0:
+            schema += group
+        elif pattern == 1:
+            schema.append(generate_section_dict("section_{}".format(group_no), group[:half] + [
+                generate_condition_dict(
+                    "BinaryCondition", "binary_{}".format(group_no), expression,
+                    true_branch = generate_section_dict("binary_{}_true".format(group_no), group[half:])
+                )
+            ]))
+        elif pattern == 2:
+            schema.append(generate_condition_dict(
+                "BinaryCondition", "binary_{}".format(group_no), expression,
+                true_branch = generate_section_dict("binary_{}_true".format(group_no), group[:half]),
+                false_branch = generate_section_dict("binary_{}_false".format(group_no), group[half:])
+            ))
+        else:
+            third = (len(group)+2)//3
+            schema.append(generate_condition_dict(
+                "SwitchCondition", "switch_{}".format(group_no), "data.field_0",
+                list_cases = ['a', 'b'],
+                list_branches = [
+                    generate_section_dict("switch_{}_a".format(group_no), group[:third]),
+                    generate_section_dict("switch_{}_b".format(group_no), group[third:2*third]),
+                ],
+                use_default = True,
+                default_branch = generate_section_dict("switch_{}_default".format(group_no), group[2*third:])
+            ))
+
+    return schema
+
+def generate_answer(rnd, field, valid=True):
+    """
+    Method to generate an answer for a field.
+
+    :param rnd: Instance of ``random.Random``
+    :param field: Form field object
+    :param valid: If False, an invalid answer is generated
+    :return: Answer value
+
+    **Authors**: Gagandeep Singh
+    """
+    field_class = field._cls
+    if field_class in ['TextFormField', 'TextAreaFormField']:
+        return 'lorem ipsum' if valid else 1
+    elif field_class == 'NumberFormField':
+        return rnd.randint(0, 1000) if valid else -1
+    elif field_class == 'DecimalFormField':
+        return round(rnd.uniform(0, 1000), 2) if valid else 'abc'
+    elif field_class == 'DateFormField':
+        return '2017-01-01' if valid else 20170101
+    elif field_class in ['BinaryFormField', 'MCSSFormField']:
+        return rnd.choice(field.get_all_choice_values()) if valid else 'unknown'
+    elif field_class == 'MCMSFormField':
+        return rnd.sample(field.get_all_choice_values(), 2) if valid else []
+    elif field_class == 'RatingFormField':
+        return rnd.randint(1, field.max_score) if valid else field.max_score + 1
+    return None
+
+def generate_responses(rnd, compiled, count, invalid_ratio=0.1):
+    """
+    Method to generate responses for a compiled schema.
+
+    :param rnd: Instance of ``random.Random``
+    :param compiled: :class:`form_builder.schema_cache.CompiledFormSchema`
+    :param count: Number of responses
+    :param invalid_ratio: Fraction of responses having an invalid answer
+    :return: List of response JSON
+
+    **Authors**: Gagandeep Singh
+    """
+    list_fields = compiled.field_index.get_fields()
+
+    list_responses = []
+    for i in range(count):
+        answers = {str(fld.label): generate_answer(rnd, fld) for fld in list_fields}
+        if rnd.random() < invalid_ratio:
+            fld = rnd.choice(list_fields)
+            answers[str(fld.label)] = generate_answer(rnd, fld, valid=False)
+
+        list_responses.append({"answers": answers, "answers_other": {}})
+
+    return list_responses
+
+# ---------- Measurement ----------
+def get_peak_memory_kb():
+    """
+    Returns peak resident memory (in KB) of this process so far.
+
+    **Authors**: Gagandeep Singh
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def measure(func, repeat=3):
+    """
+    Method to measure a function call.
+
+    **Points**:
+
+        - ``wall_time_sec`` is best of ``repeat`` calls; ``mean_time_sec`` is average.
+        - ``allocated_objects`` is the number of gc tracked objects created by a call and alive
+          until it returns (including returned value). Garbage collector is disabled during the call.
+        - ``peak_memory_kb`` is peak resident memory of the process after the calls. Since it
+          never decreases, run suites in a fresh process for comparable numbers.
+
+    :param func: Callable without arguments
+    :param repeat: Number of calls
+    :return: JSON dict of results
+
+    **Authors**: Gagandeep Singh
+    """
+    list_times = []
+    allocated = 0
+    for i in range(repeat):
+        gc.collect()
+        count_before = len(gc.get_objects())
+        gc.disable()
+        try:
+            start = time.time()
+            result = func()
+            list_times.append(time.time() - start)
+            allocated = max(allocated, len(gc.get_objects()) - count_before)
+        finally:
+            gc.enable()
+        del result
+
+    return {
+        "wall_time_sec": round(min(list_times), 6),
+        "mean_time_sec": round(sum(list_times)/len(list_times), 6),
+        "allocated_objects": allocated,
+        "peak_memory_kb": get_peak_memory_kb(),
+    }
+
+# ---------- Suites ----------
+def benchmark_validation(num_fields=100, num_responses=10000, batch_size=1000, seed=0):
+    """
+    Benchmark of :class:`form_builder.response_validation.ResponseValidator` for a synthetic form.
+    Responses are same for same ``seed`` so that results are comparable between commits.
+
+    :param num_fields: Number of fields in the form
+    :param num_responses: Number of responses to be validated
+    :param batch_size: Responses per batch
+    :param seed: Random seed
+    :return: JSON dict of results
+
+    **Authors**: Gagandeep Singh
+    """
+    start = time.time()
+    compiled = CompiledFormSchema(None, 'benchmark', generate_form_schema(num_fields))
+    validator = compiled.response_validator
+    compile_time = time.time() - start
+
+    list_responses = generate_responses(random.Random(seed), compiled, num_responses)
+
+    count_invalid = 0
+    start = time.time()
+    for i in range(0, num_responses, batch_size):
+        for errors in validator.validate_batch(list_responses[i:i+batch_size]):
+            if len(errors):
+                count_invalid += 1
+    validation_time = time.time() - start
+
+    return {
+        "suite": "validation",
+        "fields": num_fields,
+        "responses": num_responses,
+        "seed": seed,
+        "invalid": count_invalid,
+        "compile_time_sec": round(compile_time, 6),
+        "validation_time_sec": round(validation_time, 6),
+        "validations_per_sec": int(num_responses / validation_time) if validation_time else None,
+    }
+
+# Form sizes used by schema suite
+SCHEMA_SUITE_SIZES = (10, 100, 1000, 5000)
+
+def benchmark_schema(sizes=SCHEMA_SUITE_SIZES, repeat=3, seed=0):
+    """
+    Benchmark of schema operations for synthetic nested forms of various sizes
+    (refer :func:`generate_nested_form_schema`). For each size following are measured:
+
+        - ``load_form_schema``: :func:`form_builder.form_schema.load_form_schema`
+        - ``validate_form``: :func:`form_builder.models.Form.validate_form` (unsaved form)
+        - ``iterate_form_fields``: :func:`form_builder.models.iterate_form_fields` over loaded schema
+        - ``to_json``: Json of loaded schema nodes
+        - ``get_answer_sheet_data``: :func:`form_builder.models.BaseResponse.get_answer_sheet_data` for one response
+
+    Schemas are deterministic and responses are same for same ``seed``; output is a JSON dict
+    and can be compared across commits.
+
+    :param sizes: List of number of fields
+    :param repeat: Number of calls per measurement
+    :param seed: Random seed
+    :return: JSON dict of results
+
+    **Authors**: Gagandeep Singh
+    """
+    from form_builder.models import Form, iterate_form_fields
+    from languages.models import Translation
+    from surveys.models import SurveyResponse
+
+    rnd = random.Random(seed)
+    list_results = []
+    for num_fields in sizes:
+        schema = generate_nested_form_schema(num_fields)
+        schema_obj = form_schema.load_form_schema(schema)
+        list(iterate_form_fields(schema_obj))   # Warm-up: compiles layout children
+
+        # Dummy id so that compiled schema is cached as for saved forms; form is never saved
+        form = Form(id=0, title='Benchmark', schema=schema, constants=[], calculated_fields=[])
+        lookup_translation = { BENCHMARK_TRANSLATION_ID: Translation(unique_id=BENCHMARK_TRANSLATION_ID, sentence='Question?') }
+
+        compiled = CompiledFormSchema(None, 'benchmark', schema)
+        response_json = generate_responses(rnd, compiled, 1, invalid_ratio=0)[0]
+        response = SurveyResponse(
+            form_id = 'benchmark',
+            form_version = 'benchmark',
+            answers = response_json['answers'],
+            answers_other = {},
+            list_answers = []
+        )
+
+        list_results.append({
+            "fields": num_fields,
+            "load_form_schema": measure(lambda: form_schema.load_form_schema(schema), repeat),
+            "validate_form": measure(form.validate_form, repeat),
+            "iterate_form_fields": measure(lambda: list(iterate_form_fields(schema_obj)), repeat),
+            "to_json": measure(lambda: [node.to_json() for node in schema_obj], repeat),
+            "get_answer_sheet_data": measure(lambda: response.get_answer_sheet_data(form=form, lookup_translation=lookup_translation), repeat),
+        })
+
+    return {
+        "suite": "schema",
+        "repeat": repeat,
+        "seed": seed,
+        "results": list_results,
+    }
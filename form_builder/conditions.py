@@ -15,6 +15,7 @@ import layouts
 #   - For naming use convention '<name>Condition'; It must contain word Condition in the end
 #   - Add check condition in following routine:
 #       - form_builder.models.iterate_form_fields()
+#       - form_builder.field_index.iterate_form_fields_with_path()
 #       - /form_builder/templates/form_builder/form_designer.html -> get_variable_with_id()
 #   - Form designer: create partial templates for this condition:
 #       /static/templates/form_builder/
@@ -27,7 +28,7 @@ import layouts
 #               Controller: QuestionSchemaController, inside '$scope.remove_condition'
 #                   Add condition to remove all translation when this condition is deleted
 #   - Form:
-#       /form_builder/templates/themes/form_base.html
+#       /form_builder/templates/themes/form_schema.html
 class BaseCondition(JsonObject):
     """
     A condition describes a control flow depending upon an expression evaluation. This implements a branching mechanism, determining
@@ -0,0 +1,630 @@
+# Copyright (C) 2017 Feedvay (Gagandeep Singh: singh.gagan144@gmail.com) - All Rights Reserved
+# Content in this document can not be copied and/or distributed without the express
+# permission of Gagandeep Singh.
+import hashlib
+import math
+import re
+
+from django.conf import settings
+
+from form_builder.form_exceptions import ExpressionCompileError
+from utilities.cache_utils import LRUCache
+
+# ---------- Tokenizer ----------
+# Token types
+TK_NUMBER = 'number'
+TK_STRING = 'string'
+TK_NAME = 'name'
+TK_OP = 'op'
+TK_END = 'end'
+
+RE_TOKEN = re.compile(r'''
+    \s*(?:
+        (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?) |
+        (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*') |
+        (?P<name>[$A-Za-z_][$A-Za-z0-9_]*(?:\.[$A-Za-z_][$A-Za-z0-9_]*)*) |
+        (?P<op>===|!==|==|!=|<=|>=|&&|\|\||[-+*/%<>!?:(),])
+    )
+''', re.VERBOSE)
+
+RE_STRING_ESCAPE = re.compile(r'\\(.)')
+ESCAPE_CHARS = {'n': '\n', 't': '\t', 'r': '\r'}
+
+def tokenize(expression):
+    """
+    Method to convert an expression into list of tokens.
+
+    :param expression: Expression string
+    :return: List of tuples ``(<token type>, <value>)``
+
+    **Throws**: :class:`form_builder.form_exceptions.ExpressionCompileError`
+
+    **Authors**: Gagandeep Singh
+    """
+    list_tokens = []
+    pos = 0
+    length = len(expression.rstrip())
+    while pos < length:
+        match = RE_TOKEN.match(expression, pos)
+        if match is None or match.end() == pos:
+            raise ExpressionCompileError("Unsupported syntax at '{}'.".format(expression[pos:pos+20].strip()))
+
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == TK_NUMBER:
+            value = float(value) if any(c in value for c in '.eE') else int(value)
+        elif kind == TK_STRING:
+            value = RE_STRING_ESCAPE.sub(lambda m: ESCAPE_CHARS.get(m.group(1), m.group(1)), value[1:-1])
+
+        list_tokens.append((kind, value))
+        pos = match.end()
+
+    list_tokens.append((TK_END, None))
+    return list_tokens
+
+
+# ---------- Runtime helpers (javascript semantics) ----------
+def is_number(value):
+    return isinstance(value, (int, long, float)) and not isinstance(value, bool)
+
+def js_truthy(value):
+    """
+    Javascript truthiness; empty lists & dicts are true.
+    """
+    if isinstance(value, (list, dict)):
+        return True
+    if isinstance(value, float) and math.isnan(value):
+        return False
+    return bool(value)
+
+def js_to_number(value):
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return int(value)
+    if is_number(value):
+        return value
+    if isinstance(value, basestring):
+        value = value.strip()
+        if value == '':
+            return 0
+        try:
+            return int(value)
+        except ValueError:
+            return float(value)
+    raise TypeError("Cannot convert {} to number".format(type(value)))
+
+def js_to_string(value):
+    if value is None:
+        return u'null'
+    if isinstance(value, bool):
+        return u'true' if value else u'false'
+    if isinstance(value, float) and value.is_integer():
+        return unicode(int(value))
+    if isinstance(value, list):
+        return u','.join(js_to_string(v) for v in value)
+    return unicode(value)
+
+def js_add(left, right):
+    if isinstance(left, basestring) or isinstance(right, basestring):
+        return js_to_string(left) + js_to_string(right)
+    left, right = js_to_number(left), js_to_number(right)
+    if left is None or right is None:
+        return None
+    return left + right
+
+def js_arithmetic(operator):
+    def apply(left, right):
+        left, right = js_to_number(left), js_to_number(right)
+        if left is None or right is None:
+            return None
+        if operator == '-':
+            return left - right
+        elif operator == '*':
+            return left * right
+        elif operator == '/':
+            if right == 0:
+                return None
+            result = float(left) / right
+            return int(result) if result.is_integer() else result
+        elif operator == '%':
+            if right == 0:
+                return None
+            return math.fmod(left, right) if isinstance(left, float) or isinstance(right, float) else int(math.fmod(left, right))
+    return apply
+
+def js_loose_equals(left, right):
+    if left is None or right is None:
+        return left is None and right is None
+    if is_number(left) or is_number(right) or isinstance(left, bool) or isinstance(right, bool):
+        try:
+            return js_to_number(left) == js_to_number(right)
+        except (TypeError, ValueError):
+            return False
+    return left == right
+
+def js_strict_equals(left, right):
+    if is_number(left) and is_number(right):
+        return left == right
+    if isinstance(left, basestring) and isinstance(right, basestring):
+        return left == right
+    if type(left) != type(right):
+        return False
+    return left == right
+
+def js_compare(operator):
+    def apply(left, right):
+        if left is None or right is None:
+            return False
+        if not (isinstance(left, basestring) and isinstance(right, basestring)):
+            try:
+                left, right = js_to_number(left), js_to_number(right)
+            except (TypeError, ValueError):
+                return False
+        if operator == '<':
+            return left < right
+        elif operator == '>':
+            return left > right
+        elif operator == '<=':
+            return left <= right
+        elif operator == '>=':
+            return left >= right
+    return apply
+
+def js_round(value):
+    return int(math.floor(value + 0.5))
+
+BINARY_OPERATORS = {
+    '+': js_add,
+    '-': js_arithmetic('-'),
+    '*': js_arithmetic('*'),
+    '/': js_arithmetic('/'),
+    '%': js_arithmetic('%'),
+    '==': js_loose_equals,
+    '!=': lambda l, r: not js_loose_equals(l, r),
+    '===': js_strict_equals,
+    '!==': lambda l, r: not js_strict_equals(l, r),
+    '<': js_compare('<'),
+    '>': js_compare('>'),
+    '<=': js_compare('<='),
+    '>=': js_compare('>='),
+}
+
+# Allowed functions & constants
+MATH_FUNCTIONS = {
+    'Math.abs': abs,
+    'Math.ceil': lambda x: int(math.ceil(x)),
+    'Math.floor': lambda x: int(math.floor(x)),
+    'Math.round': js_round,
+    'Math.max': max,
+    'Math.min': min,
+    'Math.pow': math.pow,
+    'Math.sqrt': math.sqrt,
+}
+MATH_CONSTANTS = {
+    'Math.PI': math.pi,
+    'Math.E': math.e,
+}
+LITERALS = {
+    'true': True,
+    'false': False,
+    'null': None,
+    'undefined': None,
+}
+
+# Variable scopes accessible in an expression
+VARIABLE_SCOPES = ('data', 'constants', 'calculated_fields')
+
+# Maximum nesting of sub-expressions (parentheses, function arguments, ternary branches & unary operators)
+MAX_NESTING = 50
+
+
+# ---------- Compiler ----------
+class ExpressionParser(object):
+    """
+    Recursive descent parser that compiles a javascript expression into a python callable.
+    Only a safe subset of javascript is supported:
+
+        - Literals: numbers, strings, ``true``, ``false``, ``null``, ``undefined``
+        - Variables: ``data.<label>``, ``constants.<label>``, ``calculated_fields.<label>`` optionally
+          prefixed with ``$scope.``. Property ``length`` is supported on strings & lists.
+        - Operators: ``+ - * / %``, ``== != === !== < > <= >=``, ``&& || !``, unary ``-``/``+``,
+          ternary ``?:`` and parentheses. Nesting is limited to :data:`MAX_NESTING`.
+        - Functions: ``Math.abs``, ``ceil``, ``floor``, ``round``, ``max``, ``min``, ``pow``, ``sqrt`` and
+          constants ``Math.PI``, ``Math.E``.
+
+    Each grammar rule returns a function ``fn(context)`` where context is a dictionary
+    ``{ "data": {...}, "constants": {...}, "calculated_fields": {...} }``.
+
+    **Authors**: Gagandeep Singh
+    """
+
+    def __init__(self, expression):
+        self.expression = expression
+        self.tokens = tokenize(expression)
+        self.pos = 0
+        self.depth = 0
+        self.variables = set()
+
+    # --- Token helpers ---
+    def peek(self):
+        return self.tokens[self.pos]
+
+    def next(self):
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def accept_op(self, *ops):
+        kind, value = self.tokens[self.pos]
+        if kind == TK_OP and value in ops:
+            self.pos += 1
+            return value
+        return None
+
+    def expect_op(self, op):
+        if self.accept_op(op) is None:
+            raise ExpressionCompileError("Expected '{}' in expression '{}'.".format(op, self.expression))
+
+    def enter(self):
+        self.depth += 1
+        if self.depth > MAX_NESTING:
+            raise ExpressionCompileError("Expression '{}' is nested deeper than {} levels.".format(self.expression[:50], MAX_NESTING))
+
+    def leave(self):
+        self.depth -= 1
+
+    # --- Grammar ---
+    def parse(self):
+        fn = self.parse_ternary()
+        if self.peek()[0] != TK_END:
+            raise ExpressionCompileError("Unexpected '{}' in expression '{}'.".format(self.peek()[1], self.expression))
+        return fn
+
+    def parse_ternary(self):
+        self.enter()
+        condition = self.parse_or()
+        if self.accept_op('?'):
+            if_true = self.parse_ternary()
+            self.expect_op(':')
+            if_false = self.parse_ternary()
+            self.leave()
+            return lambda ctx: if_true(ctx) if js_truthy(condition(ctx)) else if_false(ctx)
+        self.leave()
+        return condition
+
+    def parse_or(self):
+        left = self.parse_and()
+        while self.accept_op('||'):
+            right = self.parse_and()
+            left = (lambda l, r: lambda ctx: (lambda v: v if js_truthy(v) else r(ctx))(l(ctx)))(left, right)
+        return left
+
+    def parse_and(self):
+        left = self.parse_equality()
+        while self.accept_op('&&'):
+            right = self.parse_equality()
+            left = (lambda l, r: lambda ctx: (lambda v: r(ctx) if js_truthy(v) else v)(l(ctx)))(left, right)
+        return left
+
+    def _parse_binary(self, operators, parse_operand):
+        left = parse_operand()
+        while True:
+            op = self.accept_op(*operators)
+            if op is None:
+                return left
+            right = parse_operand()
+            left = (lambda l, r, f: lambda ctx: f(l(ctx), r(ctx)))(left, right, BINARY_OPERATORS[op])
+
+    def parse_equality(self):
+        return self._parse_binary(('===', '!==', '==', '!='), self.parse_relational)
+
+    def parse_relational(self):
+        return self._parse_binary(('<=', '>=', '<', '>'), self.parse_additive)
+
+    def parse_additive(self):
+        return self._parse_binary(('+', '-'), self.parse_multiplicative)
+
+    def parse_multiplicative(self):
+        return self._parse_binary(('*', '/', '%'), self.parse_unary)
+
+    def parse_unary(self):
+        op = self.accept_op('!', '-', '+')
+        if op is None:
+            return self.parse_primary()
+
+        self.enter()
+        operand = self.parse_unary()
+        self.leave()
+        if op == '!':
+            return lambda ctx: not js_truthy(operand(ctx))
+        elif op == '-':
+            return lambda ctx: (lambda v: -v if v is not None else None)(js_to_number(operand(ctx)))
+        else:
+            return lambda ctx: js_to_number(operand(ctx))
+
+    def parse_primary(self):
+        kind, value = self.next()
+
+        if kind in (TK_NUMBER, TK_STRING):
+            return lambda ctx: value
+        elif kind == TK_OP and value == '(':
+            fn = self.parse_ternary()
+            self.expect_op(')')
+            return fn
+        elif kind == TK_NAME:
+            if value in LITERALS:
+                literal = LITERALS[value]
+                return lambda ctx: literal
+            elif value in MATH_CONSTANTS:
+                constant = MATH_CONSTANTS[value]
+                return lambda ctx: constant
+            elif value in MATH_FUNCTIONS:
+                return self.parse_call(value)
+            else:
+                return self.parse_variable(value)
+        else:
+            raise ExpressionCompileError("Unexpected '{}' in expression '{}'.".format(value, self.expression))
+
+    def parse_call(self, name):
+        func = MATH_FUNCTIONS[name]
+        self.expect_op('(')
+        list_args = []
+        if not self.accept_op(')'):
+            list_args.append(self.parse_ternary())
+            while self.accept_op(','):
+                list_args.append(self.parse_ternary())
+            self.expect_op(')')
+
+        def call(ctx):
+            args = [js_to_number(arg(ctx)) for arg in list_args]
+            if None in args:
+                return None
+            return func(*args)
+        return call
+
+    def parse_variable(self, name):
+        parts = name.split('.')
+        if parts[0] == '$scope':
+            parts = parts[1:]
+
+        if len(parts) < 2 or parts[0] not in VARIABLE_SCOPES:
+            raise ExpressionCompileError("Unsupported variable '{}' in expression '{}'.".format(name, self.expression))
+
+        scope, label, attrs = parts[0], parts[1], tuple(parts[2:])
+        self.variables.add("{}.{}".format(scope, label))
+
+        def lookup(ctx):
+            value = (ctx.get(scope, None) or {}).get(label, None)
+            for attr in attrs:
+                if value is None:
+                    return None
+                if attr == 'length' and isinstance(value, (basestring, list)):
+                    value = len(value)
+                elif isinstance(value, dict):
+                    value = value.get(attr, None)
+                else:
+                    return None
+            return value
+        return lookup
+
+
+class CompiledExpression(object):
+    """
+    Javascript expression compiled into python callable. Use :func:`compile_expression`
+    to obtain cached instances.
+
+    **Attributes**:
+
+        - ``expression``: Source expression
+        - ``variables``: Set of variables used in the expression i.e ``{"data.<label>", "constants.<label>", ...}``
+
+    **Authors**: Gagandeep Singh
+    """
+
+    EVALUATION_ERRORS = (TypeError, ValueError, ZeroDivisionError, OverflowError, AttributeError)
+
+    def __init__(self, expression):
+        parser = ExpressionParser(expression)
+        self.expression = expression
+        try:
+            self._fn = parser.parse()
+        except RuntimeError:
+            # Maximum recursion depth exceeded
+            raise ExpressionCompileError("Expression '{}' is too complex.".format(expression[:50]))
+        self.variables = frozenset(parser.variables)
+
+    def __str__(self):
+        return "<{}: {}>".format(self.__class__.__name__, self.expression)
+
+    def evaluate(self, data=None, constants=None, calculated_fields=None):
+        """
+        Evaluate expression for a set of values. Any runtime error (such as applying math on text)
+        evaluates to None, which is analogous to ``NaN`` in javascript.
+
+        :param data: Dictionary of answers
+        :param constants: Dictionary of constants
+        :param calculated_fields: Dictionary of calculated fields
+        :return: Result
+
+        **Authors**: Gagandeep Singh
+        """
+        context = {
+            "data": data or {},
+            "constants": constants or {},
+            "calculated_fields": calculated_fields or {}
+        }
+        try:
+            return self._fn(context)
+        except self.EVALUATION_ERRORS:
+            return None
+
+    def has_null_variables(self, data=None, constants=None):
+        """
+        Returns True if any ``data`` or ``constants`` variable in the expression is null.
+        This is server side equivalent of :attr:`form_builder.conditions.BaseCondition.expression_validate_var`.
+
+        **Authors**: Gagandeep Singh
+        """
+        context = {"data": data or {}, "constants": constants or {}}
+        for var in self.variables:
+            scope, label = var.split('.', 1)
+            if scope in context and context[scope].get(label, None) is None:
+                return True
+        return False
+
+
+# Process-local cache of compiled expressions.
+# Format: { "<md5 of expression>": <CompiledExpression>, ... }
+compiled_expression_cache = LRUCache(max_size=getattr(settings, 'FORM_EXPRESSION_CACHE_SIZE', 1024))
+
+def compile_expression(expression):
+    """
+    Method to get compiled form of an expression. Compiled expressions are cached by hash of the expression.
+
+    :param expression: Javascript expression
+    :return: :class:`form_builder.expressions.CompiledExpression`
+
+    **Throws**: :class:`form_builder.form_exceptions.ExpressionCompileError`
+
+    **Authors**: Gagandeep Singh
+    """
+    if isinstance(expression, unicode):
+        key = hashlib.md5(expression.encode('utf-8')).hexdigest()
+    else:
+        key = hashlib.md5(expression).hexdigest()
+    return compiled_expression_cache.get_or_set(key, lambda: CompiledExpression(expression))
+
+
+# ---------- Form evaluator ----------
+class FormExpressionEvaluator(object):
+    """
+    Evaluates calculated fields & branch visibility of a form version on the server.
+    All expressions are compiled once when evaluator is created and hence a single
+    instance must be used for a batch of responses.
+
+    **Usage**:
+
+        >>> evaluator = form.get_expression_evaluator()
+        >>> for response in list_responses:
+        >>>     calculated_fields = evaluator.compute_calculated_fields(response.answers, response.constants)
+        >>>     visible_labels = evaluator.get_visible_labels(response.answers, response.constants)
+
+    **Authors**: Gagandeep Singh
+    """
+
+    def __init__(self, schema, constants_obj=None, calculated_fields_obj=None):
+        from form_builder import conditions
+
+        self.schema = schema or ()
+        self.constants = { str(const.label): const.value for const in (constants_obj or []) }
+        self.list_calculated_fields = tuple(
+            (str(calc_fld.label), compile_expression(calc_fld.expression)) for calc_fld in (calculated_fields_obj or [])
+        )
+
+        # Compile condition expressions
+        self.lookup_conditions = {}     # Format: { "<condition_id>": <CompiledExpression>, ... }
+        stack = list(self.schema)
+        while stack:
+            node = stack.pop()
+            if isinstance(node, conditions.BaseCondition):
+                self.lookup_conditions[node._id] = compile_expression(node.expression)
+                for branch in self._iterate_branches(node):
+                    stack.extend(branch.children_obj)
+            elif hasattr(node, 'children_obj'):
+                stack.extend(node.children_obj)
+
+    @staticmethod
+    def _iterate_branches(condition):
+        from form_builder import conditions
+
+        if isinstance(condition, conditions.BinaryCondition):
+            yield condition.true_branch
+            if condition.false_branch is not None:
+                yield condition.false_branch
+        elif isinstance(condition, conditions.SwitchCondition):
+            for branch in condition.list_branches:
+                yield branch
+            if condition.use_default:
+                yield condition.default_branch
+
+    def compute_calculated_fields(self, answers, constants=None):
+        """
+        Method to compute calculated fields for a response.
+
+        :param answers: Dictionary of answers
+        :param constants: Dictionary of constants; defaults to constants of the form
+        :return: Dictionary of calculated fields ``{ "<label>": <value>, ... }``
+
+        **Authors**: Gagandeep Singh
+        """
+        constants = constants if constants else self.constants
+
+        calculated_fields = {}
+        for label, expr in self.list_calculated_fields:
+            calculated_fields[label] = expr.evaluate(answers, constants, calculated_fields)
+        return calculated_fields
+
+    def get_visible_labels(self, answers, constants=None):
+        """
+        Method to get labels of the fields that were displayed for a response as per the conditions.
+        Evaluation rules are same as used in form template.
+
+        :param answers: Dictionary of answers
+        :param constants: Dictionary of constants; defaults to constants of the form
+        :return: Set of field labels
+
+        **Authors**: Gagandeep Singh
+        """
+        constants = constants if constants else self.constants
+        set_labels = set()
+        self._collect_visible(self.schema, answers, constants, set_labels)
+        return set_labels
+
+    def _collect_visible(self, schema, answers, constants, set_labels):
+        from form_builder import fields, conditions, layouts
+
+        for node in schema:
+            if isinstance(node, fields.BasicFormField):
+                set_labels.add(str(node.label))
+            elif isinstance(node, conditions.BaseCondition):
+                expr = self.lookup_conditions[node._id]
+                if isinstance(node, conditions.BinaryCondition):
+                    if node.validate_expr_var and expr.has_null_variables(answers, constants):
+                        continue
+                    if js_truthy(expr.evaluate(answers, constants)):
+                        self._collect_visible(node.true_branch.children_obj, answers, constants, set_labels)
+                    elif node.false_branch is not None:
+                        self._collect_visible(node.false_branch.children_obj, answers, constants, set_labels)
+                elif isinstance(node, conditions.SwitchCondition):
+                    # ng-switch compares string form of the value
+                    value = expr.evaluate(answers, constants)
+                    str_value = js_to_string(value)
+                    for case, branch in zip(node.list_cases, node.list_branches):
+                        if js_to_string(case) == str_value:
+                            self._collect_visible(branch.children_obj, answers, constants, set_labels)
+                            break
+                    else:
+                        if node.use_default and value is not None:
+                            self._collect_visible(node.default_branch.children_obj, answers, constants, set_labels)
+            elif isinstance(node, layouts.BaseLayout):
+                self._collect_visible(node.children_obj, answers, constants, set_labels)
+
+    def evaluate_batch(self, list_responses):
+        """
+        Method to evaluate calculated fields & visible fields for a batch of responses.
+
+        :param list_responses: List of response JSON containing ``answers`` & ``constants`` (optional)
+        :return: List of dict ``{ "calculated_fields": {...}, "visible_labels": set(...) }`` in same order
+
+        **Authors**: Gagandeep Singh
+        """
+        list_results = []
+        for response_json in list_responses:
+            answers = response_json.get('answers', None) or {}
+            constants = response_json.get('constants', None)
+            list_results.append({
+                "calculated_fields": self.compute_calculated_fields(answers, constants),
+                "visible_labels": self.get_visible_labels(answers, constants)
+            })
+        return list_results
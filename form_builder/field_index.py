@@ -0,0 +1,189 @@
+# Copyright (C) 2017 Feedvay (Gagandeep Singh: singh.gagan144@gmail.com) - All Rights Reserved
+# Content in this document can not be copied and/or distributed without the express
+# permission of Gagandeep Singh.
+from form_builder import fields
+from form_builder import conditions
+from form_builder import layouts
+
+
+class FieldIndexEntry(object):
+    """
+    An entry in :class:`form_builder.field_index.FormFieldIndex` describing a single field of the form.
+
+    **Attributes**:
+
+        - ``position``: Order of the field in the questionnaire (0 based).
+        - ``label``: Label of the field.
+        - ``field``: Field object (shared, read-only).
+        - ``field_class``: Field class name.
+        - ``data_type``: Answer data type as in :class:`form_builder.fields.DataType`.
+        - ``path``: Tuple of components enclosing the field from top of the schema. Each
+          component is ``'<component_id>'`` for layouts & ``'<condition_id>:<branch>'`` for conditions,
+          where branch is ``true``, ``false``, ``case_<idx>`` or ``default``.
+        - ``ai_directives``: Dictionary of enabled AI directives i.e. ``{ "<algo_key>": True }`` or None.
+
+    **Authors**: Gagandeep Singh
+    """
+    __slots__ = ('position', 'label', 'field', 'field_class', 'data_type', 'path', 'ai_directives')
+
+    def __init__(self, position, field, path):
+        self.position = position
+        self.label = str(field.label)
+        self.field = field
+        self.field_class = field._cls
+        self.data_type = field.get_data_type()
+        self.path = path
+        self.ai_directives = get_enabled_ai_directives(field)
+
+    def __str__(self):
+        return "<{}: {}>".format(self.__class__.__name__, self.label)
+
+    def to_json(self):
+        """
+        Returns json of this entry excluding field object.
+
+        **Authors**: Gagandeep Singh
+        """
+        return {
+            "position": self.position,
+            "label": self.label,
+            "field_class": self.field_class,
+            "data_type": self.data_type,
+            "text_translation_id": self.field.text_translation_id,
+            "path": list(self.path),
+            "ai_directives": self.ai_directives
+        }
+
+
+class FormFieldIndex(object):
+    """
+    Flat index of all fields in a compiled form schema. The index is built once per form version
+    (refer :class:`form_builder.schema_cache.CompiledFormSchema`) and provides ordered list of fields
+    and O(1) lookup by label without walking conditions & layouts.
+
+    **Usage**:
+
+        >>> field_index = form.get_field_index()
+        >>> for entry in field_index:
+        >>>     print entry.label, entry.data_type
+        >>> field = field_index.get_field('age')
+
+    **Authors**: Gagandeep Singh
+    """
+
+    def __init__(self, schema_obj):
+        list_entries = []
+        if schema_obj is not None:
+            for path, field in iterate_form_fields_with_path(schema_obj):
+                list_entries.append(FieldIndexEntry(len(list_entries), field, path))
+
+        self.entries = tuple(list_entries)
+        self.lookup = { entry.label: entry for entry in list_entries }
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, label):
+        return label in self.lookup
+
+    def get(self, label, default=None):
+        """
+        Returns index entry for a label.
+
+        :param label: Field label
+        :return: :class:`form_builder.field_index.FieldIndexEntry` or ``default``
+
+        **Authors**: Gagandeep Singh
+        """
+        return self.lookup.get(label, default)
+
+    def get_field(self, label):
+        """
+        Returns field object for a label or None if not found.
+
+        **Authors**: Gagandeep Singh
+        """
+        entry = self.lookup.get(label, None)
+        return entry.field if entry else None
+
+    def get_fields(self):
+        """
+        Returns ordered list of field objects.
+
+        **Authors**: Gagandeep Singh
+        """
+        return [entry.field for entry in self.entries]
+
+    def get_labels(self):
+        """
+        Returns ordered list of field labels.
+
+        **Authors**: Gagandeep Singh
+        """
+        return [entry.label for entry in self.entries]
+
+    def to_json(self):
+        """
+        Returns ordered list of index entries in json (excluding field objects).
+
+        **Authors**: Gagandeep Singh
+        """
+        return [entry.to_json() for entry in self.entries]
+
+
+# ---------- Methods ----------
+def get_enabled_ai_directives(field):
+    """
+    Method to get AI directives enabled on a field.
+
+    :param field: Form field object
+    :return: Dictionary ``{ "<algo_key>": True, ... }`` or None if no directive is enabled.
+
+    **Authors**: Gagandeep Singh
+    """
+    ai_directives = getattr(field, 'ai_directives', None)
+    if ai_directives is None:
+        return None
+
+    enabled = {}
+    for algo_key, val in ai_directives.to_json().iteritems():
+        if val is True:
+            enabled[str(algo_key)] = True
+
+    return enabled if len(enabled) else None
+
+def iterate_form_fields_with_path(schema, path=()):
+    """
+    Method to recursively iterate over fields in form schema along with their path.
+    Order of iteration is same as :func:`form_builder.models.iterate_form_fields`.
+
+    :param schema: Form schema
+    :param path: Path of the schema (used in recursion)
+    :return: Tuple (path, field)
+
+    **Authors**: Gagandeep Singh
+    """
+    for node in schema:
+        if isinstance(node, fields.BasicFormField):
+            yield path, node
+        elif isinstance(node, conditions.BaseCondition):
+            if isinstance(node, conditions.BinaryCondition):
+                for item in iterate_form_fields_with_path(node.true_branch.children_obj, path + ("{}:true".format(node._id),)):
+                    yield item
+                if node.false_branch is not None:
+                    for item in iterate_form_fields_with_path(node.false_branch.children_obj, path + ("{}:false".format(node._id),)):
+                        yield item
+            elif isinstance(node, conditions.SwitchCondition):
+                for idx, branch in enumerate(node.list_branches):
+                    for item in iterate_form_fields_with_path(branch.children_obj, path + ("{}:case_{}".format(node._id, idx),)):
+                        yield item
+                if node.use_default:
+                    for item in iterate_form_fields_with_path(node.default_branch.children_obj, path + ("{}:default".format(node._id),)):
+                        yield item
+        elif isinstance(node, layouts.BaseLayout):
+            if isinstance(node, layouts.SectionLayout):
+                for item in iterate_form_fields_with_path(node.children_obj, path + (node._id,)):
+                    yield item
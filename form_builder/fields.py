@@ -172,6 +172,7 @@ class AiImageDirectives(JsonObject):
 # Points:
 #   * Add new field:
 #       - Always extend  'BasicFormField' to define field type
+#       - Set 'data_type' (or override 'get_data_type()') as per the type of answer
 #       - Widget: Add widget(s) for this field in 'form_builder.widgets.py'
 #       - Form designer: create partial templates for this field:
 #           /static/templates/form_builder/
@@ -199,6 +200,8 @@ class BasicFormField(JsonObject):
     """
     _allow_dynamic_properties = False
 
+    data_type = DataType.STRING     # Data type of the answer; refer 'get_data_type()'
+
     _cls_base = StringProperty(default='BasicFormField', required=True)
     _cls = StringProperty(name='_cls', required=True)   # Name of this class
     label = StringProperty(required=True, validators=[validators.validate_label])       # Unique label within the form) of the field.
@@ -254,6 +257,16 @@ class BasicFormField(JsonObject):
     def get_classname(self):
         return self._cls
 
+    def get_data_type(self):
+        """
+        Returns data type of the answer to this field.
+
+        :return: Data type as in :class:`form_builder.fields.DataType`
+
+        **Authors**: Gagandeep Singh
+        """
+        return self.data_type
+
     def get_translation_ids(self):
         """
         Get all translations used in this field.
@@ -307,6 +320,27 @@ class BasicFormField(JsonObject):
 
         return super(BasicFormField, self).to_json()
 
+    def get_schema_json(self, text_ref=None):
+        """
+        Get detached json for this field with ``text_ref`` set. Unlike :func:`to_json`, this does not modify the
+        field or query its translation and hence is safe to be used on shared (cached) schema nodes.
+
+        :param text_ref: Question text to be set as ``text_ref``
+        :return: JSON
+
+        **Authors**: Gagandeep Singh
+        """
+        if hasattr(self._obj, '_wrapper'):
+            # Refer hack in 'to_json()'
+            self.validate()
+            field_dict = dict(self._obj)
+        else:
+            field_dict = super(BasicFormField, self).to_json()
+
+        field_dict = json.loads(json.dumps(field_dict))
+        field_dict['text_ref'] = text_ref
+        return field_dict
+
 # ---------- /Generic Field ----------
 
 # ---------- Fundamental FormFields ----------
@@ -415,6 +449,8 @@ class NumberFormField(BasicFormField):
 
     **Authors**: Gagandeep Singh
     """
+    data_type = DataType.INT
+
     min_length = IntegerProperty(default=0)                 # Minimum number of letters allowed.
     max_length = IntegerProperty(default=5)                 # Maximum number of letters allowed.
     allow_negative = BooleanProperty(required=True, default=True)          # Whether to allow any negative values
@@ -467,6 +503,8 @@ class DecimalFormField(BasicFormField):
 
     **Authors**: Gagandeep Singh
     """
+    data_type = DataType.FLOAT
+
     max_integer_length = IntegerProperty(required=True, default=5)         # Maximum length of integer part; Minimum is default 1 which is value 0
     max_decimal_length = IntegerProperty(required=True, default=2)         # Maximum precision of decimal part
     allow_negative = BooleanProperty(required=True, default=True)          # Whether to allow any negative values
@@ -520,6 +558,8 @@ class DateFormField(BasicFormField):
 
     **Authors**: Gagandeep Singh
     """
+    data_type = DataType.DATE
+
     widget = StringProperty(required=True, choices=FieldWidgets.choices_date, default=FieldWidgets.HTML_DATE)
 
 class TimeFormField(BasicFormField):
@@ -528,6 +568,8 @@ class TimeFormField(BasicFormField):
 
     **Authors**: Gagandeep Singh
     """
+    data_type = DataType.TIME
+
     widget = StringProperty(required=True, choices=FieldWidgets.choices_time, default=FieldWidgets.HTML_TIME)
 
 class DateTimeFormField(BasicFormField):
@@ -536,6 +578,8 @@ class DateTimeFormField(BasicFormField):
 
     **Authors**: Gagandeep Singh
     """
+    data_type = DataType.DATETIME
+
     widget = StringProperty(required=True, choices=FieldWidgets.choices_datetime, default=FieldWidgets.HTML_DATEIME_LOCAL)
 
 
@@ -626,6 +670,9 @@ class MCSSFormField(BasicFormField):
 
         return ordered_list_choices
 
+    def get_data_type(self):
+        return self.choice_type
+
     def get_all_choice_values(self):
         list_choices = [ch['value'] for ch in self.list_choices]
         if self.allow_other:
@@ -708,6 +755,9 @@ class MCMSFormField(BasicFormField):
 
         return ordered_list_choices
 
+    def get_data_type(self):
+        return self.choice_type
+
     def get_all_choice_values(self):
         list_choices = [ch['value'] for ch in self.list_choices]
         if self.allow_other:
@@ -724,6 +774,7 @@ class RatingFormField(BasicFormField):
     **Authors**: Gagandeep Singh
     """
     choice_type = MCQ_Types.INT
+    data_type = DataType.INT
 
     max_score = IntegerProperty(required=True, default=5, validators=[validators.validate_max_score])  # Maximum score
     widget = StringProperty(required=True, choices=FieldWidgets.choices_rating, default=FieldWidgets.RATING_STARS)
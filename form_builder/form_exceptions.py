@@ -124,4 +124,16 @@ class DuplicateVariableName(Exception):
     **Authors**: Gagandeep Singh
     """
     def __init__(self, message):
-        super(DuplicateVariableName, self).__init__(message)
\ No newline at end of file
+        super(DuplicateVariableName, self).__init__(message)
+
+# ---------- Response Exceptions ----------
+class ResponseValidationError(Exception):
+    """
+    Response answers do not comply with the form fields. List of errors
+    is available in ``errors``.
+
+    **Authors**: Gagandeep Singh
+    """
+    def __init__(self, message, errors=None):
+        super(ResponseValidationError, self).__init__(message)
+        self.errors = errors or []
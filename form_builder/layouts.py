@@ -15,6 +15,7 @@ from fields import create_field_obj
 #   - For naming use convention '<name>Layout'; It must contain word Layout in the end
 #   - Add check condition in following routine:
 #       - form_builder.models.iterate_form_fields()
+#       - form_builder.field_index.iterate_form_fields_with_path()
 #       - /form_builder/templates/form_builder/form_designer.html -> get_variable_with_id()
 #   - Form designer: create partial templates for this layout:
 #       /static/templates/form_builder/
@@ -23,7 +24,7 @@ from fields import create_field_obj
 #           |--- editor
 #                   |--- <class_name>.html
 #   - Form:
-#       /form_builder/templates/themes/form_base.html
+#       /form_builder/templates/themes/form_schema.html
 class BaseLayout(JsonObject):
     """
     A Layout defines an encapsulated arrangement of components (Fields, Conditions or even a layout).
@@ -42,6 +43,10 @@ class BaseLayout(JsonObject):
 
     @property
     def children_obj(self):
+        # Children are compiled only once per layout instance
+        if self._children_obj is not None:
+            return self._children_obj
+
         from conditions import create_condition_obj
         list_obj = []
         for node_dict in self.children:
@@ -67,7 +72,8 @@ class BaseLayout(JsonObject):
 
             list_obj.append(node_obj)
 
-        return list_obj
+        self._children_obj = tuple(list_obj)
+        return self._children_obj
 
 
     def __init__(self, _obj=None, **kwargs):
@@ -102,6 +108,8 @@ class BaseLayout(JsonObject):
         })
         super(BaseLayout, self).__init__(_obj=_obj, **kwargs)
 
+        self._children_obj = None   # Compiled children; populated on first access of 'children_obj'
+
         # Check 'children'
         # import form_schema
 
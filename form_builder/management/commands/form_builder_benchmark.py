@@ -0,0 +1,105 @@
+# Copyright (C) 2017 Feedvay (Gagandeep Singh: singh.gagan144@gmail.com) - All Rights Reserved
+# Content in this document can not be copied and/or distributed without the express
+# permission of Gagandeep Singh.
+from django.core.management.base import BaseCommand, CommandError
+import json
+
+from form_builder import benchmarks
+
+class Command(BaseCommand):
+    """
+    Django management command to benchmark form builder on synthetic forms.
+    No database is used.
+
+    **Parameters:**
+
+        - ``suite``: Benchmark suite to run. Choices: ``validation``, ``schema``.
+        - ``fields``: (Default 100) Number of fields in the synthetic form (``validation`` suite).
+        - ``responses``: (Default 10000) Number of responses to be validated (``validation`` suite).
+        - ``sizes``: (Default 10,100,1000,5000) Comma separated form sizes (``schema`` suite).
+        - ``repeat``: (Default 3) Number of calls per measurement (``schema`` suite).
+        - ``seed``: (Default 0) Random seed of synthetic responses (both suites).
+
+    Command::
+
+        python manage.py form_builder_benchmark --suite validation --fields 100 --responses 10000
+        python manage.py form_builder_benchmark --suite schema --sizes 10,100,1000,5000 > schema_bench.json
+
+    **Authors**: Gagandeep Singh
+    """
+    help = "Command to benchmark form builder on synthetic forms."
+    requires_system_checks = False
+    can_import_settings = True
+
+    SUITES = ('validation', 'schema')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--suite",
+            dest = "suite",
+            help = "Benchmark suite to run. Choices: {}".format(", ".join(self.SUITES)),
+            choices = self.SUITES,
+            default = 'validation'
+        )
+        parser.add_argument(
+            "--fields",
+            dest = "fields",
+            help = "Number of fields in the synthetic form. Default: 100",
+            type = int,
+            default = 100
+        )
+        parser.add_argument(
+            "--responses",
+            dest = "responses",
+            help = "Number of responses to be validated. Default: 10000",
+            type = int,
+            default = 10000
+        )
+        parser.add_argument(
+            "--sizes",
+            dest = "sizes",
+            help = "Comma separated number of fields of synthetic forms. Default: 10,100,1000,5000",
+            default = ",".join(str(size) for size in benchmarks.SCHEMA_SUITE_SIZES)
+        )
+        parser.add_argument(
+            "--repeat",
+            dest = "repeat",
+            help = "Number of calls per measurement. Default: 3",
+            type = int,
+            default = 3
+        )
+        parser.add_argument(
+            "--seed",
+            dest = "seed",
+            help = "Random seed of synthetic responses. Default: 0",
+            type = int,
+            default = 0
+        )
+
+    # ----- Main executor -----
+    def handle(self, *args, **options):
+        suite = options['suite']
+
+        self.stderr.write('Running benchmark suite "{}"...'.format(suite))
+
+        if suite == 'validation':
+            result = benchmarks.benchmark_validation(
+                num_fields = int(options['fields']),
+                num_responses = int(options['responses']),
+                seed = int(options['seed'])
+            )
+        elif suite == 'schema':
+            try:
+                sizes = [int(size) for size in options['sizes'].split(',')]
+            except ValueError:
+                raise CommandError("Invalid sizes '{}'.".format(options['sizes']))
+
+            result = benchmarks.benchmark_schema(
+                sizes = sizes,
+                repeat = int(options['repeat']),
+                seed = int(options['seed'])
+            )
+        else:
+            raise CommandError("Unknown suite '{}'.".format(suite))
+
+        self.stdout.write(json.dumps(result, indent=4))
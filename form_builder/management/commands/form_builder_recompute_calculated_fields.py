@@ -0,0 +1,77 @@
+# Copyright (C) 2017 Feedvay (Gagandeep Singh: singh.gagan144@gmail.com) - All Rights Reserved
+# Content in this document can not be copied and/or distributed without the express
+# permission of Gagandeep Singh.
+from django.core.management.base import BaseCommand, CommandError
+
+from form_builder.models import Form
+from form_builder.operations import recompute_calculated_fields
+
+class Command(BaseCommand):
+    """
+    Django management command to recompute calculated fields of all responses of a form
+    (current version only) on the server.
+
+    **Parameters:**
+
+        - ``form_id``: Id of the form (survey phase form or BSP feedback form).
+        - ``batch_size``: (Default 500) Number of updates written together.
+        - ``dry_run``: If set, only reports number of responses that will change.
+
+    Command::
+
+        python manage.py form_builder_recompute_calculated_fields --form_id 12 --dry_run
+
+    **Authors**: Gagandeep Singh
+    """
+    help = "Command to recompute calculated fields of all responses of a form."
+    requires_system_checks = True
+    can_import_settings = True
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--form_id",
+            dest = "form_id",
+            help = "Id of the form.",
+            type = int,
+            required = True
+        )
+        parser.add_argument(
+            "--batch_size",
+            dest = "batch_size",
+            help = "Number of updates written together. Default: 500",
+            type = int,
+            default = 500
+        )
+        parser.add_argument(
+            "--dry_run",
+            dest = "dry_run",
+            help = "Do not write changes.",
+            action = "store_true",
+            default = False
+        )
+
+    # ----- Main executor -----
+    def handle(self, *args, **options):
+        from feedback.models import BspFeedbackForm, BspFeedbackResponse
+        from surveys.models import SurveyResponse
+
+        try:
+            form = Form.objects.get(id=options['form_id'])
+        except Form.DoesNotExist:
+            raise CommandError("Form '{}' does not exist.".format(options['form_id']))
+
+        if BspFeedbackForm.objects.filter(form_ptr_id=form.id).exists():
+            response_class = BspFeedbackResponse
+        else:
+            response_class = SurveyResponse
+
+        self.stdout.write(self.style.SUCCESS('Recomputing calculated fields for "{}" ({})...'.format(form.title, response_class.__name__)))
+
+        stats = recompute_calculated_fields(
+            form,
+            response_class,
+            batch_size = int(options['batch_size']),
+            dry_run = options['dry_run']
+        )
+
+        self.stdout.write(self.style.SUCCESS('\nCompleted! {}'.format(stats)))
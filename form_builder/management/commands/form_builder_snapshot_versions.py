@@ -0,0 +1,48 @@
+# Copyright (C) 2017 Feedvay (Gagandeep Singh: singh.gagan144@gmail.com) - All Rights Reserved
+# Content in this document can not be copied and/or distributed without the express
+# permission of Gagandeep Singh.
+from django.core.management.base import BaseCommand
+
+from form_builder.models import Form, FormVersion
+
+class Command(BaseCommand):
+    """
+    Django management command to create :class:`form_builder.models.FormVersion` snapshots
+    of current version of all forms. Forms whose snapshot already exists are left untouched.
+    Snapshots of older versions cannot be created since their schema is no longer available.
+
+    **Parameters:**
+
+        - ``form_id``: (Optional) Id of the form; if not provided, all forms are processed.
+
+    Command::
+
+        python manage.py form_builder_snapshot_versions
+
+    **Authors**: Gagandeep Singh
+    """
+    help = "Command to create snapshots of current version of forms."
+    requires_system_checks = True
+    can_import_settings = True
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--form_id",
+            dest = "form_id",
+            help = "Id of the form.",
+            type = int,
+            default = None
+        )
+
+    # ----- Main executor -----
+    def handle(self, *args, **options):
+        qry = Form.objects.all()
+        if options['form_id']:
+            qry = qry.filter(id=options['form_id'])
+
+        count = 0
+        for form in qry.iterator():
+            FormVersion.create_snapshot(form)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS('Completed! {} form(s) snapshotted.'.format(count)))
@@ -19,6 +19,8 @@ from mongoengine.base.fields import BaseField
 
 from django.core.exceptions import ValidationError
 import uuid
+import hashlib
+import json
 from datetime import datetime, time, timedelta
 from django.template.defaultfilters import slugify
 from django.conf import settings
@@ -29,9 +31,11 @@ from django.contrib.auth.models import User
 
 from accounts.models import RegisteredUser
 from form_builder import form_schema
+from form_builder import schema_cache
 from form_builder.form_exceptions import DuplicateVariableName, ExpressionCompileError
 from form_builder.utils import GeoLocation
 from languages.models import Language, Translation
+from utilities.cache_utils import LRUCache
 from utilities.timezone_utils import validate_timezone_offset_string
 
 # ---------- Themes ----------
@@ -53,6 +57,7 @@ class Theme(models.Model):
         - /form_builder/templates/themes/[code]/
 
             - form_base.html
+            - form_schema.html        # Questionnaire; cached by 'form_base.html' using key 'form_render_key'
             - fields
 
                   - html_text.html
@@ -203,8 +208,10 @@ class Form(models57.Model):
 
     @property
     def schema_obj(self):
-        sc_obj = form_schema.load_form_schema(self.schema)
-        if self.randomize:
+        sc_obj = self.get_compiled_schema().schema
+        if sc_obj is not None and self.randomize:
+            # Compiled schema is shared; shuffle a shallow copy
+            sc_obj = list(sc_obj)
             random.shuffle(sc_obj)
 
         return sc_obj
@@ -226,6 +233,121 @@ class Form(models57.Model):
     def __unicode__(self):
         return self.title
 
+    # ---- Compiled schema ----
+    def get_compiled_schema(self):
+        """
+        Method to get compiled schema for current version of this form. Compiled schema is looked-up
+        in process-local cache keyed by ``(form.id, form.version)`` and compiled only in case of a miss.
+        Unsaved forms are always compiled.
+
+        .. warning::
+            Compiled schema is shared and must be treated as read-only.
+
+        :return: :class:`form_builder.schema_cache.CompiledFormSchema`
+
+        **Authors**: Gagandeep Singh
+        """
+        if self.id is None:
+            return schema_cache.CompiledFormSchema(None, self.version, self.schema)
+        else:
+            return schema_cache.get_compiled_schema(self.id, self.version, self.schema)
+
+    def get_field_index(self):
+        """
+        Method to get flat index of fields for current version of this form. Index is built once per
+        form version along with its compiled schema.
+
+        :return: :class:`form_builder.field_index.FormFieldIndex`
+
+        **Authors**: Gagandeep Singh
+        """
+        return self.get_compiled_schema().field_index
+
+    def get_response_validator(self):
+        """
+        Method to get validator of responses for current version of this form.
+
+        :return: :class:`form_builder.response_validation.ResponseValidator`
+
+        **Authors**: Gagandeep Singh
+        """
+        return self.get_compiled_schema().response_validator
+
+    def get_ai_directives(self):
+        """
+        Method to get enabled AI directives of fields for current version of this form. Lookup is
+        built once per form version along with its compiled schema.
+
+        :return: Dictionary of format ``{ "<label>": { "<algo_key>": True, ... }, ... }``
+
+        **Authors**: Gagandeep Singh
+        """
+        return self.get_compiled_schema().ai_directives
+
+    def get_expression_evaluator(self):
+        """
+        Method to get server side evaluator of calculated fields & conditions for current version of this form.
+        Use same evaluator for a batch of responses.
+
+        :return: :class:`form_builder.expressions.FormExpressionEvaluator`
+
+        **Authors**: Gagandeep Singh
+        """
+        from form_builder.expressions import FormExpressionEvaluator
+        return FormExpressionEvaluator(self.get_compiled_schema().schema, self.constants_obj, self.calculated_fields_obj)
+
+    def get_version_snapshot(self, version=None):
+        """
+        Method to get immutable snapshot of a version of this form.
+
+        :param version: (Optional) Form version; defaults to current version
+        :return: :class:`form_builder.models.FormVersion` or None if snapshot does not exist
+
+        **Authors**: Gagandeep Singh
+        """
+        return FormVersion.get_snapshot(self.id, version if version is not None else self.version)
+
+    # ---- Render cache ----
+    def is_render_cacheable(self):
+        """
+        Returns True if rendered questionnaire of this form is same for every request and hence can be cached.
+        Questionnaire with randomized questions or choices cannot be cached.
+
+        :return: bool
+
+        **Authors**: Gagandeep Singh
+        """
+        from form_builder.fields import ChoiceOrder
+
+        if self.randomize:
+            return False
+
+        for entry in self.get_field_index():
+            if getattr(entry.field, 'choice_ordering', None) == ChoiceOrder.RANDOM:
+                return False
+        return True
+
+    def get_render_cache_key(self):
+        """
+        Method to get key for caching rendered questionnaire of this form. Key is composed of
+        ``(form.id, form.version, theme_skin.id, translation digest)`` where translation digest changes
+        with translations of the form as well as translation generation (refer :func:`languages.models.Translation.get_generation`).
+        Since version changes on every save, saving the form invalidates the rendered questionnaire.
+
+        :return: Cache key or None if form cannot be cached.
+
+        **Authors**: Gagandeep Singh
+        """
+        if self.id is None or not self.is_render_cacheable():
+            return None
+
+        trans_digest = hashlib.md5("{}:{}".format(
+            Translation.get_generation(),
+            ",".join(sorted(self.translations or []))
+        ).encode('utf-8')).hexdigest()
+
+        return "{}:{}:{}:{}".format(self.id, self.version, self.theme_skin_id, trans_digest)
+
     # ---- constants ----
     def get_constants_displayable(self):
         constants_obj = self.constants_obj
@@ -280,12 +402,12 @@ class Form(models57.Model):
         if self.instructions:
             set_translation_ids.add(self.instructions)
 
-        list_varnames = []
+        set_varnames = set()
         def push_list_varnames(varname):
-            if list_varnames.__contains__(varname):
+            if varname in set_varnames:
                 raise DuplicateVariableName("Duplicate variable with label '{}'.".format(varname))
             else:
-                list_varnames.append(varname)
+                set_varnames.add(varname)
 
         # (1) Parse constants JSON & obtain object form.
         constants = self.constants_obj
@@ -296,7 +418,10 @@ class Form(models57.Model):
                     set_translation_ids.add(const.text_translation_id)
 
         # (2) Parse schema JSON & obtain schema obj. This will check any schema errors.
-        schema_obj = self.schema_obj
+        # Schema is compiled afresh (bypassing cache) since it may have been changed but not saved yet.
+        compiled = schema_cache.CompiledFormSchema(self.id, self.version, self.schema)
+        self._compiled_schema = compiled
+        schema_obj = compiled.schema
         if schema_obj is not None and len(schema_obj) != 0:
             # Check if randomization is allowed: There must be no component other than 'fields' if randomize is true
             if self.randomize:
@@ -304,13 +429,10 @@ class Form(models57.Model):
                     if not isinstance(comp, BasicFormField):
                         raise ValidationError("You cannot use randomize since the form contains conditions & layouts.")
 
-            # Prepare field lookup for further use
-            lookupDict_fields = {}      # { "<label>": <Field Object>, "<label>":<Field Object>, ...}
-            for field in iterate_form_fields(schema_obj):
-                label = str(field.label)
-                push_list_varnames(label)
-                lookupDict_fields[label] = field
-                set_translation_ids.update(field.get_translation_ids())
+            # Field index is used as field lookup for further use
+            for entry in compiled.field_index:
+                push_list_varnames(entry.label)
+                set_translation_ids.update(entry.field.get_translation_ids())
 
                 self.is_ready = True
         else:
@@ -328,14 +450,14 @@ class Form(models57.Model):
 
                 for absolute_var in list_vars_in_expr:
                     varname = absolute_var.replace("$scope.", "").replace("data.", "").replace("constants.", "")
-                    if not list_varnames.__contains__(varname):
+                    if varname not in set_varnames:
                         # Check variable was declared or not
                         raise ExpressionCompileError("Undefined variable '{}' in the expression for calculated field '{}'.".format(varname, calcfld.label))
                     else:
                         # Chech if this variable is data field
                         if absolute_var.__contains__("data."):
                             # check if this field is mandatory
-                            if lookupDict_fields[varname].required == False:
+                            if compiled.field_index.get_field(varname).required == False:
                                 raise ExpressionCompileError("Field '{}' must be mandatory in order to be used in the expression for calculated field '{}'.".format(varname, calcfld.label))
 
         return list(set_translation_ids)
@@ -420,35 +542,35 @@ class Form(models57.Model):
 
     @classmethod
     def post_save(cls, sender, instance, **kwargs):
-        schema_obj = instance.schema_obj
-        if schema_obj is not None and len(schema_obj) != 0:
-            for fld in iterate_form_fields(schema_obj):
-                # print "\tPushing :" , fld.label
-                FormQuestion.objects.update_or_create(
-                    form_id = instance.id,
-                    label = fld.label,
-                    field_class = fld._cls,
-                    defaults = {
-                        "form_version": instance.version,
-                        "text_translation_id": fld.text_translation_id,
-                        "schema_json": fld.to_json(),
-                        "dated": timezone.now()
-                    }
-                )
-
-                # FormFieldMetaData.objects(
-                #     form_id = str(instance.id),
-                #     label = fld.label,
-                #     field_class = fld._cls
-                # ).update_one(
-                #     form_version = str(instance.version),
-                #     text_ref = fld.text_ref,
-                #     text_translation_id = fld.text_translation_id,
-                #     required = fld.required,
-                #     request_response = fld.request_response,
-                #     dated = timezone.now(),
-                #     upsert = True
-                # )
+        # Drop compiled schemas of previous versions & cache the one validated during save
+        schema_cache.invalidate_form(instance.id)
+        compiled = getattr(instance, '_compiled_schema', None)
+        if compiled is not None:
+            compiled.form_id = instance.id
+            compiled.version = instance.version
+            schema_cache.set_compiled_schema(compiled)
+            instance._compiled_schema = None
+
+        # Synchronize form questions with this version of the form
+        from form_builder.operations import sync_form_questions
+        sync_form_questions(instance, instance.get_field_index())
+
+        # Immutable snapshot of this version
+        FormVersion.create_snapshot(instance)
+
+        # FormFieldMetaData.objects(
+        #     form_id = str(instance.id),
+        #     label = fld.label,
+        #     field_class = fld._cls
+        # ).update_one(
+        #     form_version = str(instance.version),
+        #     text_ref = fld.text_ref,
+        #     text_translation_id = fld.text_translation_id,
+        #     required = fld.required,
+        #     request_response = fld.request_response,
+        #     dated = timezone.now(),
+        #     upsert = True
+        # )
 post_save.connect(Form.post_save, sender=Form)
 
 class FormQuestion(models57.Model):
@@ -560,6 +682,139 @@ class FormFieldMetaData(Document):
         return "{}: {}".format(self.form_id, self.label)
 '''
 
+class FormVersion(Document):
+    """
+    Immutable snapshot of a form version. A snapshot is written once, on save of the form,
+    and is never modified thereafter. It contains everything required to interpret responses
+    of that version i.e. schema, constants, calculated fields, flat field index and translation ids.
+
+    **Uniqueness:**
+
+        ``form_id``, ``version``
+
+    **Points**:
+
+        - Schema, constants & calculated fields are stored as json strings since mongo does not
+          allow '.' or '$' in keys.
+        - ``field_index`` is the json of :class:`form_builder.field_index.FormFieldIndex` which
+          provides label, class, data type & translation id of every field.
+        - Use :func:`get_snapshot` to read snapshots. These are cached in process by ``(form_id, version)``
+          since they never change.
+        - Snapshots of versions saved before this model was introduced can be created using
+          ``form_builder_snapshot_versions`` command (current versions only).
+
+    **Authors**: Gagandeep Singh
+    """
+
+    form_id         = IntField(required=True, help_text='Primary key of the form.')
+    version         = StringField(required=True, help_text='Form version.')
+
+    title           = StringField(help_text='Title of the form in this version.')
+    schema_json     = StringField(required=True, help_text='Form schema (json string).')
+    constants_json  = StringField(help_text='Form constants (json string).')
+    calculated_fields_json = StringField(help_text='Form calculated fields (json string).')
+    field_index     = ListField(DictField(), help_text='Flat index of fields in questionnaire order. Refer FormFieldIndex.to_json().')
+    translation_ids = ListField(StringField(), help_text='List of translation ids used in this version.')
+
+    created_on      = DateTimeField(default=timezone.now, required=True, help_text='Date on which this version was saved.')
+
+    meta = {
+        'indexes':[
+            { 'fields':['form_id', 'version'], 'cls':False, 'unique': True },
+            '-created_on',
+        ]
+    }
+
+    # Process-local cache of snapshots.
+    # Format: { (<form_id>, "<version>"): <FormVersion>, ... }
+    snapshot_cache = LRUCache(max_size=getattr(settings, 'FORM_SCHEMA_CACHE_SIZE', 256))
+
+    def __unicode__(self):
+        return "{}: {}".format(self.form_id, self.version)
+
+    @property
+    def schema(self):
+        return json.loads(self.schema_json)
+
+    @property
+    def constants(self):
+        return json.loads(self.constants_json) if self.constants_json else None
+
+    @property
+    def calculated_fields(self):
+        return json.loads(self.calculated_fields_json) if self.calculated_fields_json else None
+
+    def get_compiled_schema(self):
+        """
+        Method to get compiled schema of this version. Compiled schema is shared with
+        :func:`form_builder.models.Form.get_compiled_schema` via same cache.
+
+        :return: :class:`form_builder.schema_cache.CompiledFormSchema`
+
+        **Authors**: Gagandeep Singh
+        """
+        return schema_cache.get_compiled_schema(self.form_id, self.version, self.schema)
+
+    def get_field_lookup(self):
+        """
+        Returns lookup of field index entries by label i.e. ``{ "<label>": <entry json>, ... }``.
+
+        **Authors**: Gagandeep Singh
+        """
+        return { entry['label']: entry for entry in self.field_index }
+
+    def save(self, *args, **kwargs):
+        if self.pk:
+            raise ValidationError("Form version snapshot is immutable and cannot be modified.")
+        return super(FormVersion, self).save(*args, **kwargs)
+
+    @classmethod
+    def create_snapshot(cls, form):
+        """
+        Method to write snapshot of current version of a form. Write is idempotent; if snapshot of
+        this version already exists, it is left untouched.
+
+        :param form: Saved instance of :class:`form_builder.models.Form`
+
+        **Authors**: Gagandeep Singh
+        """
+        version = str(form.version)
+        cls._get_collection().update_one(
+            { 'form_id': form.id, 'version': version },
+            {
+                '$setOnInsert': {
+                    'title': form.title,
+                    'schema_json': json.dumps(form.schema),
+                    'constants_json': json.dumps(form.constants) if form.constants else None,
+                    'calculated_fields_json': json.dumps(form.calculated_fields) if form.calculated_fields else None,
+                    'field_index': form.get_field_index().to_json(),
+                    'translation_ids': [str(trans_id) for trans_id in (form.translations or [])],
+                    'created_on': timezone.now()
+                }
+            },
+            upsert = True
+        )
+
+    @classmethod
+    def get_snapshot(cls, form_id, version):
+        """
+        Method to get snapshot of a form version. Snapshots are looked up in process-local cache first;
+        missing snapshots are not cached.
+
+        :param form_id: Form id
+        :param version: Form version
+        :return: :class:`form_builder.models.FormVersion` or None if snapshot does not exist
+
+        **Authors**: Gagandeep Singh
+        """
+        key = (int(form_id), str(version))
+        snapshot = cls.snapshot_cache.get(key)
+        if snapshot is None:
+            snapshot = cls.objects(form_id=key[0], version=key[1]).first()
+            if snapshot is not None:
+                cls.snapshot_cache.set(key, snapshot)
+        return snapshot
+
 # ------------ Form Response -----------
 class BaseResponse(Document):
     """
@@ -821,6 +1076,16 @@ class BaseResponse(Document):
     #     """
     #     return Form.objects.get(id=self.form_id)
 
+    def get_form_snapshot(self):
+        """
+        Method to get immutable snapshot of the form version to which this response belongs.
+
+        :return: :class:`form_builder.models.FormVersion` or None if snapshot does not exist
+
+        **Authors**: Gagandeep Singh
+        """
+        return FormVersion.get_snapshot(self.form_id, self.form_version)
+
     def get_duration_time(self):
         """
         Method to return duration in time format HH:MM:SS.
@@ -887,11 +1152,15 @@ class BaseResponse(Document):
         return success
 
 
-    def get_answer_sheet_data(self):
+    def get_answer_sheet_data(self, form=None, lookup_translation=None):
         """
         Method to create answer sheet for this response for display. The order of the question is
         as per the order in the questionnaire.
 
+        :param form: (Optional) Instance of :class:`form_builder.models.Form` to which this response belongs.
+            Pass it to avoid query when building answer sheets of many responses of same form.
+        :param lookup_translation: (Optional) Translation lookup of the form as returned by
+            :func:`form_builder.models.Form.get_translation_lookup`.
         :return: JSON Answer sheet.
 
 
@@ -952,14 +1221,17 @@ class BaseResponse(Document):
             "calculated_fields":[]
         }
 
-        form = self.form
-        lookup_translation = form.get_translation_lookup()
+        if form is None:
+            form = self.form
+        if lookup_translation is None:
+            lookup_translation = form.get_translation_lookup()
         lookup_answers = self.get_answers_lookup() # Detailed answer data
 
         response_ans_done = []
 
         # Set answers that are currently in the questionnaire
-        for node in iterate_form_fields(form.schema_obj):
+        field_index = form.get_field_index()
+        for node in field_index.get_fields():
             data = {
                 "question_text": lookup_translation[node.text_translation_id].sentence,
                 "answer": self.answers.get(node.label, None)
@@ -979,28 +1251,49 @@ class BaseResponse(Document):
             response_ans_done.append(node.label)
 
         # Set answers that have been removed
-        for label in self.answers.iteritems():
+        # Translation ids are resolved from snapshot of the response version; FormQuestion is only
+        # used for versions without snapshot.
+        list_obsolete_labels = [label for label in self.answers.iterkeys() if label not in field_index]
+        lookup_obsolete_trans_ids = {}
+        lookup_obsolete_trans = {}
+        if len(list_obsolete_labels):
+            snapshot = self.get_form_snapshot()
+            if snapshot is not None:
+                lookup_snapshot_fields = snapshot.get_field_lookup()
+                for label in list_obsolete_labels:
+                    entry = lookup_snapshot_fields.get(label, None)
+                    if entry and entry.get('text_translation_id', None):
+                        lookup_obsolete_trans_ids[label] = entry['text_translation_id']
+
+            list_missing_labels = [label for label in list_obsolete_labels if label not in lookup_obsolete_trans_ids]
+            if len(list_missing_labels):
+                for fq in form.get_formquestions(only_current=False).filter(label__in=list_missing_labels).order_by('-dated'):
+                    lookup_obsolete_trans_ids.setdefault(fq.label, fq.text_translation_id)
+
+            lookup_obsolete_trans = {
+                str(trans.pk): trans for trans in Translation.objects.filter(pk__in=list(set(lookup_obsolete_trans_ids.values()))).only('sentence')
+            }
+
+        for label in list_obsolete_labels:
             if label not in response_ans_done:
                 try:
-                    node = form.get_formquestions(only_current=False).filter(label=label)[0]
-
                     data = {
-                        "question_text": Translation.objects.get(pk=node.text_translation_id).sentence,
-                        "answer": self.answers.get(node.label, None)
+                        "question_text": lookup_obsolete_trans[lookup_obsolete_trans_ids[label]].sentence,
+                        "answer": self.answers.get(label, None)
                     }
-                    other_answer = self.answers_other.get(node.label)
+                    other_answer = self.answers_other.get(label)
                     if other_answer:
                         data['other_answer'] = {
                             "question_text": "Response for other option:",
                             "answer": other_answer
                         }
                     # AI
-                    ans = lookup_answers.get(node.label, None)  # None because, schema might contain new question that was not earlier present
+                    ans = lookup_answers.get(label, None)
                     if ans and ans.ai:
                         data["ai"] = ans.ai
 
                     answer_sheet["obsolete_answers"].append(data)
-                except IndexError:
+                except KeyError:
                     pass
 
         # Set Constants
@@ -1023,13 +1316,17 @@ class BaseResponse(Document):
         return answer_sheet
 
 
-    def save(self, *args, **kwargs):
+    def prepare_for_save(self, form=None):
         """
-        Save method for a response.
+        Method to validate this response and, for a new response, populate ``list_answers`` & process flags.
+        This is called by :func:`save`; call it directly only when response is written in bulk without ``save()``.
+
+        :param form: (Optional) Instance of :class:`form_builder.models.Form` to which this response belongs.
+            Used only for new response; pass it when preparing many responses of same form to
+            avoid query per response.
 
         **Authors**: Gagandeep Singh
         """
-
         if self.pk:
             self.updated_on = timezone.now()
 
@@ -1042,16 +1339,11 @@ class BaseResponse(Document):
             raise Exception('Please specify atleast one reason is to why this response is a suspect.')
 
         if self.pk is None:
-            # Cache all current form questions
-            cache_curr_questions = {}
-            # form = self.get_form()
-            form = self.form
-            for fq in form.get_formquestions(only_current=True): # Current questions
-                cache_curr_questions[fq.label] = fq
+            # AI directives of current form version (shared, built once per version).
             # Old questions must not be included since processing for them has now been turned off.
-            # if str(form.version) != self.form_version:
-            #     for fq in form.formquestion_set.filter(form_version=self.form_version): # Replace, as per this response form version
-            #         cache_curr_questions[fq.label] = fq
+            if form is None:
+                form = self.form
+            lookup_ai_directives = form.get_ai_directives()
 
             # Process flags
             text_analysis = False
@@ -1060,20 +1352,19 @@ class BaseResponse(Document):
 
             # (a) Add answers to list_answers
             for ques_label,answer in self.answers.iteritems():
-                fq = cache_curr_questions.get(ques_label, None)  # None in case contants or calculated_fields were included in the answers
-
                 # Check all AI that are to be applied on this field.
                 # This is completely based on current questions only.
+                # None in case constants or calculated_fields were included in the answers
                 has_ai = False
-                if fq and fq.schema_json.get('ai_directives', None):
+                ai_directives = lookup_ai_directives.get(ques_label, None)
+                if ai_directives:
                     ai = {}
-                    for algo_key, val in fq.schema_json['ai_directives'].iteritems():
-                        if val is True:
-                            ai[algo_key] = {
-                                "pending": True
-                            }
-                            has_ai = True
-                            text_analysis = True    # TODO: Check process type (text/image) before setting this
+                    for algo_key in ai_directives.iterkeys():
+                        ai[algo_key] = {
+                            "pending": True
+                        }
+                        has_ai = True
+                        text_analysis = True    # TODO: Check process type (text/image) before setting this
 
                 if isinstance(answer, list):
                     # Answer is an arra of value
@@ -1118,6 +1409,17 @@ class BaseResponse(Document):
 
                 self.flags.has_ai = True
 
+    def save(self, *args, **kwargs):
+        """
+        Save method for a response.
+
+        :param form: (Optional, keyword only) Instance of :class:`form_builder.models.Form` to which this response belongs.
+            Refer :func:`prepare_for_save`.
+
+        **Authors**: Gagandeep Singh
+        """
+        self.prepare_for_save(form=kwargs.pop('form', None))
+
         return super(BaseResponse, self).save(*args, **kwargs)
 
 
@@ -2,11 +2,19 @@
 # Content in this document can not be copied and/or distributed without the express
 # permission of Gagandeep Singh.
 from django.db import transaction
+from django.db.models import Case, When, Value
+from django.utils import timezone
 import json
+import re
+from bson.objectid import ObjectId
+from pymongo import UpdateOne
 
 from languages.models import Language, Translation
 from form_builder.utils import GeoLocation
 
+# Placeholder translation ids generated by form designer for new translations. Format: 'NEW<timestamp>'
+RE_NEW_TRANSLATION_ID = re.compile(r'\bNEW\d+\b')
+
 def create_update_form(form, form_data, translation):
     """
     Method to create new form or update existing one. This method encapsulates
@@ -17,34 +25,75 @@ def create_update_form(form, form_data, translation):
     :param form_data: Heavy JSON form data as generated by form_builder tool.
     :param translation: Translation JSON containing all new or old translations.
     :return: Save form instance
+
+    **Points**:
+
+        - All new translations are inserted together using single ``insert_many`` and existing
+          translations are updated using single ``bulk_write``.
+        - Placeholder translation ids in schema, constants & calculated fields are replaced with
+          database ids in a single pass.
     """
     with transaction.atomic():
-        schema_str = json.dumps(form_data.get('schema', []))
-
         # --- Translation ---
         lookup_trans_id = {}    # Lookup for UI id to actual db id
+        list_new_trans = []
+        list_update_ops = []
+        set_lang_codes = set()
         for tid, trans_data in translation.iteritems():
+            translations = trans_data.get('translations', {})
             if tid.startswith('NEW'):
-                new_trans = Translation.objects.create(
-                    is_paragraph = trans_data.get('is_paragraph', False),
-                    sentence = trans_data['sentence'],
-                    translations = trans_data.get('translations', {})
+                # NOTE: Bulk insert bypasses 'Translation.save()', hence set 'unique_id' & 'list_language_codes' here
+                trans_pk = ObjectId()
+                list_new_trans.append(
+                    Translation(
+                        id = trans_pk,
+                        unique_id = str(trans_pk),
+                        is_paragraph = trans_data.get('is_paragraph', False),
+                        sentence = trans_data['sentence'],
+                        translations = translations,
+                        list_language_codes = translations.keys()
+                    )
                 )
-                lookup_trans_id[tid] = str(new_trans.pk)
-
-                # Replace translationIDs in schema with db IDs
-                schema_str = schema_str.replace(tid, str(new_trans.pk))
+                set_lang_codes.update(translations.keys())
+                lookup_trans_id[tid] = str(trans_pk)
             else:
                 lookup_trans_id[tid] = tid
-                Translation.objects(
-                    id = tid
-                ).update_one(
-                    set__is_paragraph = trans_data.get('is_paragraph', False),
-                    set__sentence = trans_data['sentence'],
-                    set__translations = trans_data.get('translations', {}),
-                    upsert=True
+                list_update_ops.append(
+                    UpdateOne(
+                        {'_id': ObjectId(tid)},
+                        {'$set': {
+                            'is_paragraph': trans_data.get('is_paragraph', False),
+                            'sentence': trans_data['sentence'],
+                            'translations': translations
+                        }},
+                        upsert = True
+                    )
                 )
 
+        if len(list_new_trans):
+            # Check languages of new translations
+            set_missing = set_lang_codes - set(Language.objects.filter(code__in=set_lang_codes).values_list('code', flat=True))
+            if len(set_missing):
+                raise Language.DoesNotExist("Invalid language code(s): {}".format(", ".join(set_missing)))
+
+            for trans in list_new_trans:
+                trans.validate()
+            Translation._get_collection().insert_many([trans.to_mongo() for trans in list_new_trans])
+
+        if len(list_update_ops):
+            Translation._get_collection().bulk_write(list_update_ops, ordered=False)
+            Translation.bump_generation()
+
+        # Replace translation ids in schema, constants & calculated fields with db IDs
+        payload_str = json.dumps({
+            "schema": form_data.get('schema', []),
+            "constants": form_data.get('constants', []),
+            "calculated_fields": form_data.get('calculated_fields', []),
+        })
+        payload_str = RE_NEW_TRANSLATION_ID.sub(lambda match: lookup_trans_id.get(match.group(0), match.group(0)), payload_str)
+        payload = json.loads(payload_str)
+        set_db_trans_ids = set(lookup_trans_id.values())
+
         # --- Form save ---
         form.title = form_data['title']
         form.description = lookup_trans_id.get(form_data.get('description', None), None)
@@ -63,21 +112,20 @@ def create_update_form(form, form_data, translation):
             form.languages.clear()
 
         # -- Constants --
-        constants_corrected =  form_data.get('constants', [])
+        constants_corrected =  payload['constants']
         for cons in constants_corrected:
-            if cons.has_key('text_translation_id'):
-                cons['text_translation_id'] = lookup_trans_id.get(cons['text_translation_id'], None)
+            if cons.has_key('text_translation_id') and cons['text_translation_id'] not in set_db_trans_ids:
+                cons['text_translation_id'] = None
         form.constants = constants_corrected
 
         # -- Schema --
-        schema_json = json.loads(schema_str)
-        form.schema = schema_json
+        form.schema = payload['schema']
 
         # -- CalculatedFields --
-        calc_flds_corrected =  form_data.get('calculated_fields', [])
+        calc_flds_corrected =  payload['calculated_fields']
         for calFld in calc_flds_corrected:
-            if calFld.has_key('text_translation_id'):
-                calFld['text_translation_id'] = lookup_trans_id.get(calFld['text_translation_id'], None)
+            if calFld.has_key('text_translation_id') and calFld['text_translation_id'] not in set_db_trans_ids:
+                calFld['text_translation_id'] = None
         form.calculated_fields = calc_flds_corrected
 
         timeout = form_data.get('timeout', None)
@@ -93,3 +141,170 @@ def create_update_form(form, form_data, translation):
         form.save()
 
     return form
+
+
+def sync_form_questions(form, field_index, batch_size=500):
+    """
+    Method to synchronize :class:`form_builder.models.FormQuestion` with the fields in the schema of current form version.
+    Existing questions are loaded once and compared with the schema fields to determine which questions are to be
+    inserted, updated or are unchanged. Changes are then applied in bulk.
+
+    :param form: Saved instance of :class:`form_builder.models.Form`
+    :param field_index: Field index (:class:`form_builder.field_index.FormFieldIndex`) of current form version
+    :param batch_size: Batch size for bulk inserts & updates
+    :return: JSON dict of format ``{ "created": <int>, "updated": <int>, "unchanged": <int> }``
+
+    **Points**:
+
+        - Question texts (``text_ref``) for all fields are fetched with single query.
+        - New questions are inserted using single ``bulk_create``.
+        - Unchanged questions only need to move to new form version and are updated together.
+        - Changed questions are updated in batches using single ``UPDATE`` with ``CASE`` per batch without fetching them again.
+        - Questions no more in the schema are left as it is since they belong to older versions.
+
+    **Authors**: Gagandeep Singh
+    """
+    from form_builder.models import FormQuestion
+
+    stats = {
+        "created": 0,
+        "updated": 0,
+        "unchanged": 0
+    }
+
+    if field_index is None or len(field_index) == 0:
+        return stats
+
+    list_fields = field_index.get_fields()
+    now = timezone.now()
+
+    # Prefetch question texts
+    set_trans_ids = set(fld.text_translation_id for fld in list_fields if fld.text_translation_id)
+    lookup_text = {}
+    for trans in Translation.objects.filter(pk__in=list(set_trans_ids)).only('sentence'):
+        lookup_text[str(trans.pk)] = trans.sentence
+
+    # Existing questions
+    lookup_existing = {}     # Format: { ("<label>", "<field_class>"): <FormQuestion>, ... }
+    for fq in FormQuestion.objects.filter(form_id=form.id):
+        lookup_existing[(fq.label, fq.field_class)] = fq
+
+    # Compute difference
+    list_new = []
+    list_changed = []
+    list_unchanged_ids = []
+    for fld in list_fields:
+        schema_json = fld.get_schema_json(text_ref=lookup_text.get(fld.text_translation_id, None))
+
+        fq = lookup_existing.get((fld.label, fld._cls), None)
+        if fq is None:
+            list_new.append(
+                FormQuestion(
+                    form_id = form.id,
+                    form_version = form.version,
+                    label = fld.label,
+                    field_class = fld._cls,
+                    text_translation_id = fld.text_translation_id,
+                    schema_json = schema_json,
+                    dated = now
+                )
+            )
+        elif fq.text_translation_id != fld.text_translation_id or fq.schema_json != schema_json:
+            fq.text_translation_id = fld.text_translation_id
+            fq.schema_json = schema_json
+            list_changed.append(fq)
+        else:
+            list_unchanged_ids.append(fq.id)
+
+    # Apply changes
+    with transaction.atomic():
+        if len(list_new):
+            FormQuestion.objects.bulk_create(list_new, batch_size=batch_size)
+
+        field_trans_id = FormQuestion._meta.get_field('text_translation_id')
+        field_schema = FormQuestion._meta.get_field('schema_json')
+        for i in range(0, len(list_changed), batch_size):
+            list_batch = list_changed[i:i+batch_size]
+            FormQuestion.objects.filter(id__in=[fq.id for fq in list_batch]).update(
+                form_version = form.version,
+                text_translation_id = Case(
+                    *[When(id=fq.id, then=Value(fq.text_translation_id, output_field=field_trans_id)) for fq in list_batch],
+                    output_field = field_trans_id
+                ),
+                schema_json = Case(
+                    *[When(id=fq.id, then=Value(fq.schema_json, output_field=field_schema)) for fq in list_batch],
+                    output_field = field_schema
+                ),
+                dated = now
+            )
+
+        for i in range(0, len(list_unchanged_ids), batch_size):
+            FormQuestion.objects.filter(id__in=list_unchanged_ids[i:i+batch_size]).update(
+                form_version = form.version,
+                dated = now
+            )
+
+    stats["created"] = len(list_new)
+    stats["updated"] = len(list_changed)
+    stats["unchanged"] = len(list_unchanged_ids)
+
+    return stats
+
+def recompute_calculated_fields(form, response_class, batch_size=500, dry_run=False):
+    """
+    Method to recompute calculated fields of all stored responses for current version of a form on
+    the server using :class:`form_builder.expressions.FormExpressionEvaluator`. This is used to backfill
+    responses after a calculated field expression has been fixed.
+
+    :param form: Instance of :class:`form_builder.models.Form` or any inherited model.
+    :param response_class: Response document class inherited from :class:`form_builder.models.BaseResponse`
+        that stores responses of this form.
+    :param batch_size: Number of updates sent to database together
+    :param dry_run: If True, nothing is written to database
+    :return: JSON dict of format ``{ "processed": <int>, "changed": <int> }``
+
+    **Points**:
+
+        - Only responses of current form version are processed since expressions of older versions
+          might be different.
+        - Responses are read using raw cursor with required fields only and changes are written
+          using ``bulk_write``.
+        - Calculated fields that were copied into answers (``include_in_answers``) are not altered.
+
+    **Authors**: Gagandeep Singh
+    """
+    evaluator = form.get_expression_evaluator()
+    collection = response_class._get_collection()
+    now = timezone.now()
+
+    stats = {
+        "processed": 0,
+        "changed": 0
+    }
+
+    cursor = collection.find(
+        { "form_id": str(form.id), "form_version": str(form.version) },
+        { "answers": 1, "constants": 1, "calculated_fields": 1 }
+    ).batch_size(batch_size)
+
+    list_ops = []
+    for doc in cursor:
+        stats['processed'] += 1
+
+        calculated_fields = evaluator.compute_calculated_fields(doc.get('answers', None) or {}, doc.get('constants', None))
+        if calculated_fields != (doc.get('calculated_fields', None) or {}):
+            stats['changed'] += 1
+            list_ops.append(UpdateOne(
+                { "_id": doc['_id'] },
+                { "$set": { "calculated_fields": calculated_fields, "updated_on": now } }
+            ))
+
+        if len(list_ops) >= batch_size:
+            if not dry_run:
+                collection.bulk_write(list_ops, ordered=False)
+            list_ops = []
+
+    if len(list_ops) and not dry_run:
+        collection.bulk_write(list_ops, ordered=False)
+
+    return stats
@@ -0,0 +1,331 @@
+# Copyright (C) 2017 Feedvay (Gagandeep Singh: singh.gagan144@gmail.com) - All Rights Reserved
+# Content in this document can not be copied and/or distributed without the express
+# permission of Gagandeep Singh.
+from form_builder.fields import DataType
+from form_builder.validators import RE_NO_SPECIAL_CHAR, RE_EMAIL
+
+# ---------- Messages ----------
+MSG_REQUIRED = "Value cannot be empty."
+MSG_INVALID_TYPE = "Invalid value '{}'; expected {}."
+MSG_MIN_LENGTH = "Value must have atleast {} characters."
+MSG_MAX_LENGTH = "Value cannot have more than {} characters."
+MSG_MIN_VALUE = "Value cannot be less than {}."
+MSG_MAX_VALUE = "Value cannot be greater than {}."
+MSG_NEGATIVE = "Negative values are not allowed."
+MSG_SPECIAL_CHARS = "Value cannot have special characters."
+MSG_EMAIL = "Invalid email '{}'."
+MSG_CHOICE = "Invalid choice '{}'."
+MSG_MIN_SELECTION = "Atleast {} choices must be selected."
+MSG_MAX_SELECTION = "Atmost {} choices can be selected."
+MSG_OTHER_MISSING = "Value for other option is missing."
+MSG_UNKNOWN_FIELD = "Unknown field."
+
+# ---------- Validator ----------
+class ResponseValidator(object):
+    """
+    Server side validator of form responses for a particular form version. Every field in the
+    :class:`form_builder.field_index.FormFieldIndex` is compiled once into a validator function
+    which is then applied on answers of each response.
+
+    **Points**:
+
+        - Following are checked as per field configuration: required, data type, min/max value,
+          min/max length, choices (including other option) and selection count.
+        - ``required`` is enforced only on fields that are not inside a condition or a layout since
+          such fields might not have been displayed to the user.
+        - Answers for labels not in the form are ignored unless ``strict`` is True. For example,
+          BSP feedback responses contain ``rating`` & ``review`` which are not part of the schema.
+        - Validators are compiled for a form version and hence must only be used on responses
+          for same version.
+
+    **Usage**:
+
+        >>> validator = form.get_response_validator()
+        >>> list_errors = validator.validate(response_json)
+        >>> list_batch_errors = validator.validate_batch([response_json_1, response_json_2])
+
+    **Error format**:
+
+    .. code-block:: json
+
+        [
+            {"label": "<field label>", "message": "<error message>"},
+            ...
+        ]
+
+    **Authors**: Gagandeep Singh
+    """
+
+    def __init__(self, field_index, strict=False):
+        self.strict = strict
+        self.list_validators = tuple(
+            (entry.label, compile_field_validator(entry.field, enforce_required=(len(entry.path) == 0)))
+            for entry in field_index
+        )
+        self.set_labels = frozenset(entry.label for entry in field_index)
+
+    def validate(self, response_json):
+        """
+        Method to validate a response.
+
+        :param response_json: Response JSON containing ``answers`` and ``answers_other`` (optional)
+        :return: List of errors; empty if response is valid
+
+        **Authors**: Gagandeep Singh
+        """
+        answers = response_json.get('answers', None) or {}
+        answers_other = response_json.get('answers_other', None) or {}
+
+        list_errors = []
+        for label, validator in self.list_validators:
+            message = validator(answers.get(label, None), answers_other.get(label, None))
+            if message is not None:
+                list_errors.append({"label": label, "message": message})
+
+        if self.strict:
+            for label in answers.iterkeys():
+                if label not in self.set_labels:
+                    list_errors.append({"label": label, "message": MSG_UNKNOWN_FIELD})
+
+        return list_errors
+
+    def validate_batch(self, list_responses):
+        """
+        Method to validate a list of responses in one call.
+
+        :param list_responses: List of response JSON
+        :return: List of error lists in same order as ``list_responses``
+
+        **Authors**: Gagandeep Singh
+        """
+        validate = self.validate
+        return [validate(response_json) for response_json in list_responses]
+
+
+# ---------- Compilers ----------
+def is_empty(value):
+    return value is None or value == '' or value == []
+
+def compile_field_validator(field, enforce_required=True):
+    """
+    Method to compile a form field into a validator function.
+
+    :param field: Form field object
+    :param enforce_required: If False, empty value is always accepted.
+    :return: Function ``validator(value, other_value)`` that returns error message or None if value is valid.
+
+    **Authors**: Gagandeep Singh
+    """
+    required = field.required and enforce_required
+    compiler = MAPPING_FIELD_COMPILER.get(field._cls, None)
+    check = compiler(field) if compiler is not None else None
+
+    def validator(value, other_value):
+        if is_empty(value):
+            return MSG_REQUIRED if required else None
+        if check is not None:
+            return check(value, other_value)
+        return None
+
+    return validator
+
+def _compile_length_check(min_length, max_length):
+    min_length = min_length or None
+    max_length = max_length or None
+
+    def check_length(value):
+        length = len(value)
+        if min_length is not None and length < min_length:
+            return MSG_MIN_LENGTH.format(min_length)
+        if max_length is not None and length > max_length:
+            return MSG_MAX_LENGTH.format(max_length)
+        return None
+
+    return check_length
+
+def _compile_range_check(min_value, max_value, allow_negative, cast):
+    min_value = cast(min_value) if min_value is not None else None
+    max_value = cast(max_value) if max_value is not None else None
+
+    def check_range(num):
+        if not allow_negative and num < 0:
+            return MSG_NEGATIVE
+        if min_value is not None and num < min_value:
+            return MSG_MIN_VALUE.format(min_value)
+        if max_value is not None and num > max_value:
+            return MSG_MAX_VALUE.format(max_value)
+        return None
+
+    return check_range
+
+def _to_number(value, cast):
+    """
+    Converts an answer to number. Booleans are not considered numbers.
+
+    :return: Number or None if value cannot be converted
+    """
+    if isinstance(value, bool):
+        return None
+    try:
+        num = cast(value)
+    except (ValueError, TypeError):
+        return None
+    if cast is int and isinstance(value, float) and num != value:
+        return None
+    return num
+
+def _compile_text(field):
+    check_length = _compile_length_check(field.min_length, field.max_length)
+    allow_special_chars = field.allow_special_chars
+
+    def check(value, other_value):
+        if not isinstance(value, basestring):
+            return MSG_INVALID_TYPE.format(value, DataType.STRING)
+        if not allow_special_chars and RE_NO_SPECIAL_CHAR.match(value) is None:
+            return MSG_SPECIAL_CHARS
+        return check_length(value)
+
+    return check
+
+def _compile_email(field):
+    check_text = _compile_text(field)
+
+    def check(value, other_value):
+        message = check_text(value, other_value)
+        if message is not None:
+            return message
+        if RE_EMAIL.match(value) is None:
+            return MSG_EMAIL.format(value)
+        return None
+
+    return check
+
+def _compile_textarea(field):
+    check_length = _compile_length_check(field.min_length, field.max_length)
+
+    def check(value, other_value):
+        if not isinstance(value, basestring):
+            return MSG_INVALID_TYPE.format(value, DataType.STRING)
+        return check_length(value)
+
+    return check
+
+def _compile_number(field):
+    check_range = _compile_range_check(field.min_value, field.max_value, field.allow_negative, int)
+    max_length = field.max_length or None
+
+    def check(value, other_value):
+        num = _to_number(value, int)
+        if num is None:
+            return MSG_INVALID_TYPE.format(value, DataType.INT)
+        if max_length is not None and len(str(abs(num))) > max_length:
+            return MSG_MAX_LENGTH.format(max_length)
+        return check_range(num)
+
+    return check
+
+def _compile_decimal(field):
+    check_range = _compile_range_check(field.min_value, field.max_value, field.allow_negative, float)
+
+    def check(value, other_value):
+        num = _to_number(value, float)
+        if num is None:
+            return MSG_INVALID_TYPE.format(value, DataType.FLOAT)
+        return check_range(num)
+
+    return check
+
+def _compile_datetime(field):
+    data_type = field.get_data_type()
+
+    def check(value, other_value):
+        if not isinstance(value, basestring):
+            return MSG_INVALID_TYPE.format(value, data_type)
+        return None
+
+    return check
+
+def _compile_choices(field):
+    """
+    Returns set of allowed choice values (as unicode) and other option value if allowed.
+    """
+    set_choices = frozenset(unicode(val) for val in field.get_all_choice_values())
+    other_value = unicode(field.other_value) if getattr(field, 'allow_other', False) else None
+    return set_choices, other_value
+
+def _compile_binary(field):
+    set_choices = frozenset([unicode(field.true_value), unicode(field.false_value)])
+
+    def check(value, other_value):
+        if unicode(value) not in set_choices:
+            return MSG_CHOICE.format(value)
+        return None
+
+    return check
+
+def _compile_mcss(field):
+    set_choices, allowed_other = _compile_choices(field)
+
+    def check(value, other_value):
+        value = unicode(value)
+        if value not in set_choices:
+            return MSG_CHOICE.format(value)
+        if allowed_other is not None and value == allowed_other and is_empty(other_value):
+            return MSG_OTHER_MISSING
+        return None
+
+    return check
+
+def _compile_mcms(field):
+    set_choices, allowed_other = _compile_choices(field)
+    min_selection = field.min_selection
+    max_selection = field.max_selection
+
+    def check(value, other_value):
+        if not isinstance(value, list):
+            value = [value]
+
+        for val in value:
+            if unicode(val) not in set_choices:
+                return MSG_CHOICE.format(val)
+
+        count = len(value)
+        if min_selection is not None and count < min_selection:
+            return MSG_MIN_SELECTION.format(min_selection)
+        if max_selection is not None and count > max_selection:
+            return MSG_MAX_SELECTION.format(max_selection)
+
+        if allowed_other is not None and allowed_other in [unicode(val) for val in value] and is_empty(other_value):
+            return MSG_OTHER_MISSING
+        return None
+
+    return check
+
+def _compile_rating(field):
+    check_range = _compile_range_check(1, field.max_score, False, int)
+
+    def check(value, other_value):
+        num = _to_number(value, int)
+        if num is None:
+            return MSG_INVALID_TYPE.format(value, DataType.INT)
+        return check_range(num)
+
+    return check
+
+
+# Compiler for each field class. Fields not present here are only checked for 'required'.
+MAPPING_FIELD_COMPILER = {
+    'TextFormField': _compile_text,
+    'EmailFormField': _compile_email,
+    'PasswordFormField': _compile_text,
+    'TextAreaFormField': _compile_textarea,
+    'NumberFormField': _compile_number,
+    'DecimalFormField': _compile_decimal,
+    'DateFormField': _compile_datetime,
+    'TimeFormField': _compile_datetime,
+    'DateTimeFormField': _compile_datetime,
+    'BinaryFormField': _compile_binary,
+    'MCSSFormField': _compile_mcss,
+    'MCMSFormField': _compile_mcms,
+    'RatingFormField': _compile_rating,
+}
@@ -0,0 +1,124 @@
+# Copyright (C) 2017 Feedvay (Gagandeep Singh: singh.gagan144@gmail.com) - All Rights Reserved
+# Content in this document can not be copied and/or distributed without the express
+# permission of Gagandeep Singh.
+from django.conf import settings
+
+from form_builder import form_schema
+from form_builder.field_index import FormFieldIndex
+from form_builder.response_validation import ResponseValidator
+from utilities.cache_utils import LRUCache
+
+class CompiledFormSchema(object):
+    """
+    Compiled (object) form of a form schema for a particular form version. Compiled schemas
+    are shared across requests via :data:`compiled_schema_cache` and hence are read-only.
+
+    **Points**:
+
+        - ``schema`` is a tuple of schema nodes (fields, conditions & layouts) as returned
+          by :func:`form_builder.form_schema.load_form_schema` or None if schema is empty.
+        - Never mutate nodes of a compiled schema. If ordering has to be changed (for example
+          in case of randomization), make a shallow copy first.
+        - ``field_index`` (:class:`form_builder.field_index.FormFieldIndex`) is built lazily on first
+          access and lives as long as the compiled schema. Same applies to ``response_validator``
+          (:class:`form_builder.response_validation.ResponseValidator`) and ``ai_directives``.
+
+    **Authors**: Gagandeep Singh
+    """
+
+    def __init__(self, form_id, version, schema):
+        self.form_id = form_id
+        self.version = version
+
+        schema_obj = form_schema.load_form_schema(schema)
+        self.schema = tuple(schema_obj) if schema_obj is not None else None
+
+        self._field_index = None
+        self._response_validator = None
+        self._ai_directives = None
+
+    def __str__(self):
+        return "<{}: {} - {}>".format(self.__class__.__name__, self.form_id, self.version)
+
+    @property
+    def field_index(self):
+        """
+        Returns flat index of fields in this schema.
+
+        :return: :class:`form_builder.field_index.FormFieldIndex`
+
+        **Authors**: Gagandeep Singh
+        """
+        if self._field_index is None:
+            self._field_index = FormFieldIndex(self.schema)
+        return self._field_index
+
+    @property
+    def response_validator(self):
+        """
+        Returns validator of responses for this schema.
+
+        :return: :class:`form_builder.response_validation.ResponseValidator`
+
+        **Authors**: Gagandeep Singh
+        """
+        if self._response_validator is None:
+            self._response_validator = ResponseValidator(self.field_index)
+        return self._response_validator
+
+    @property
+    def ai_directives(self):
+        """
+        Returns lookup of enabled AI directives for fields having atleast one directive enabled.
+
+        :return: Dictionary of format ``{ "<label>": { "<algo_key>": True, ... }, ... }``
+
+        **Authors**: Gagandeep Singh
+        """
+        if self._ai_directives is None:
+            self._ai_directives = {
+                entry.label: entry.ai_directives for entry in self.field_index if entry.ai_directives
+            }
+        return self._ai_directives
+
+
+# Process-local cache of compiled schemas.
+# Format: { (<form_id>, "<form_version>"): <CompiledFormSchema>, ... }
+compiled_schema_cache = LRUCache(max_size=getattr(settings, 'FORM_SCHEMA_CACHE_SIZE', 256))
+
+def get_compiled_schema(form_id, version, schema):
+    """
+    Method to get compiled schema for a form version from the cache. In case of a miss, schema is compiled
+    and cached.
+
+    :param form_id: Form id
+    :param version: Form version
+    :param schema: Form schema json to be compiled in case of cache miss
+    :return: :class:`form_builder.schema_cache.CompiledFormSchema`
+
+    **Authors**: Gagandeep Singh
+    """
+    key = (int(form_id), str(version))
+    return compiled_schema_cache.get_or_set(key, lambda: CompiledFormSchema(form_id, version, schema))
+
+def set_compiled_schema(compiled):
+    """
+    Method to put an already compiled schema into the cache.
+
+    :param compiled: :class:`form_builder.schema_cache.CompiledFormSchema` instance
+
+    **Authors**: Gagandeep Singh
+    """
+    compiled_schema_cache.set((int(compiled.form_id), str(compiled.version)), compiled)
+
+def invalidate_form(form_id):
+    """
+    Method to remove all cached versions of a form.
+
+    :param form_id: Form id
+    :return: Number of versions removed
+
+    **Authors**: Gagandeep Singh
+    """
+    form_id = int(form_id)
+    return compiled_schema_cache.delete_where(lambda key: key[0] == form_id)
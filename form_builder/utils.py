@@ -3,6 +3,8 @@
 # permission of Gagandeep Singh.
 import re
 
+RE_JS_VARIABLE = re.compile(r'[$a-z_][a-z0-9_.]+', re.IGNORECASE+re.DOTALL)
+
 class JsCompilerTool(object):
     """
     Class for compiler analysis of javascript code.
@@ -14,8 +16,7 @@ class JsCompilerTool(object):
         self.code = code
 
     def extract_variables(self):
-        pattern = re.compile(r'[$a-z_][a-z0-9_.]+', re.IGNORECASE+re.DOTALL)
-        matches = pattern.findall(self.code)
+        matches = RE_JS_VARIABLE.findall(self.code)
         return matches
 
 class GeoLocation:
@@ -6,6 +6,10 @@ import re
 from form_builder.form_exceptions import *
 from form_builder.utils import JsCompilerTool
 
+# Patterns shared with server side response validation (refer :mod:`form_builder.response_validation`)
+RE_NO_SPECIAL_CHAR = re.compile(r'^[A-Za-z0-9]+$')
+RE_EMAIL = re.compile(r'^[_a-z0-9-]+(\.[_a-z0-9-]+)*@[a-z0-9-]+(\.[a-z0-9-]+)*(\.[a-z]{2,4})$')
+
 # ---------- General use validations ----------
 def validate_label(label):
     """
@@ -34,7 +38,7 @@ def validate_no_special_char(value):
 
     **Authors**: Gagandeep Singh
     """
-    if re.match('^[A-Za-z0-9]+$', value) is None:
+    if RE_NO_SPECIAL_CHAR.match(value) is None:
         raise FieldValueError("Value cannot have special characters.")
 
 def validate_email(email_addr):
@@ -47,7 +51,7 @@ def validate_email(email_addr):
 
     **Authors**: Gagandeep Singh
     """
-    match = re.match('^[_a-z0-9-]+(\.[_a-z0-9-]+)*@[a-z0-9-]+(\.[a-z0-9-]+)*(\.[a-z]{2,4})$', email_addr)
+    match = RE_EMAIL.match(email_addr)
     if match is None:
         raise FieldValueError("Invalid email '{}'.".format(email_addr))
 
@@ -14,8 +14,10 @@ from bson.objectid import ObjectId
 from bson import json_util
 
 from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from datetime import datetime
+import time
 from django.template.defaultfilters import slugify
 
 
@@ -116,9 +118,43 @@ class Translation(Document):
         ]
     }
 
+    # Cache key of translation generation; refer 'get_generation()'
+    GENERATION_CACHE_KEY = 'languages:translation_generation'
+
     def __unicode__(self):
         return str(self.pk)
 
+    @staticmethod
+    def get_generation():
+        """
+        Returns current translation generation. Generation changes whenever any existing translation
+        is updated and is used to version caches that contain translated text (such as rendered forms).
+
+        :return: Generation number
+
+        **Authors**: Gagandeep Singh
+        """
+        generation = cache.get(Translation.GENERATION_CACHE_KEY)
+        if generation is None:
+            # Timestamp is used so that a lost counter never repeats an older generation
+            cache.add(Translation.GENERATION_CACHE_KEY, int(time.time()), None)
+            generation = cache.get(Translation.GENERATION_CACHE_KEY)
+        return generation
+
+    @staticmethod
+    def bump_generation():
+        """
+        Method to move translations to next generation. Call this whenever translations are updated
+        without using :func:`save` (for example, raw bulk updates).
+
+        **Authors**: Gagandeep Singh
+        """
+        try:
+            cache.incr(Translation.GENERATION_CACHE_KEY)
+        except ValueError:
+            # Key does not exists
+            Translation.get_generation()
+
     def to_js_json(self):
         data = self.to_mongo()
         data["id"] = str(self.pk)
@@ -155,6 +191,9 @@ class Translation(Document):
 
         **Authors**: Gagandeep Singh
         """
+        if not kwargs.get('created', False) or document.always_include_in_form:
+            Translation.bump_generation()
+
         id = str(document.pk)
         if document.unique_id == 'none':
             Translation._get_collection().find_one_and_update(
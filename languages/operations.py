@@ -0,0 +1,110 @@
+# Copyright (C) 2017 Feedvay (Gagandeep Singh: singh.gagan144@gmail.com) - All Rights Reserved
+# Content in this document can not be copied and/or distributed without the express
+# permission of Gagandeep Singh.
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+import hashlib
+
+from languages.models import Language, Translation
+from utilities.decorators import minify_content
+
+# Namespace of translations that are included in every form
+NM_IMPLICIT = "IMPLICIT"
+
+def get_form_translation_bundle_version(form):
+    """
+    Method to get version of translation bundle of a form. Version changes with form version
+    as well as translation generation (refer :func:`languages.models.Translation.get_generation`).
+
+    :param form: Instance of :class:`form_builder.models.Form`
+    :return: Version string
+
+    **Authors**: Gagandeep Singh
+    """
+    return hashlib.md5("{}:{}".format(form.version, Translation.get_generation())).hexdigest()[:16]
+
+def build_form_translations(form):
+    """
+    Method to build translations of a form for all languages. This includes form translations
+    and all translations marked ``always_include_in_form`` (under namespace ``IMPLICIT``).
+
+    :param form: Instance of :class:`form_builder.models.Form`
+    :return: JSON dict of format ``{ "<lang_code>": { "<translation_id>": "<text>", ..., "IMPLICIT": {...} }, ... }``
+
+    **Authors**: Gagandeep Singh
+    """
+    list_translations = []
+    list_translations += form.get_translations()
+    list_translations += Translation.objects.filter(always_include_in_form=True)
+
+    # Create language set
+    translations = {
+        "eng" : {
+            NM_IMPLICIT: {}
+        }
+    }
+
+    for trans_obj in list_translations:
+        id = str(trans_obj.unique_id)
+
+        # Add default english
+        if trans_obj.always_include_in_form:
+            translations["eng"][NM_IMPLICIT][trans_obj.unique_id] = trans_obj.sentence
+        else:
+            translations["eng"][id] = trans_obj.sentence
+
+        # Loop over other languages and add them
+        for lang_code, text in trans_obj.translations.iteritems():
+            lang_code = str(lang_code)
+            if not translations.has_key(lang_code):
+                translations[lang_code] = {
+                    NM_IMPLICIT: {}
+                }
+
+            if trans_obj.always_include_in_form:
+                translations[lang_code][NM_IMPLICIT][trans_obj.unique_id] = text
+            else:
+                translations[lang_code][id] = text
+
+    return translations
+
+def get_form_translation_bundle(form, lang_codes=None):
+    """
+    Method to get minified javascript translation bundle of a form. Bundles are precomputed
+    per ``(form, bundle version, language set)`` and stored in cache along with hash of the content
+    to be used as ETag.
+
+    :param form: Instance of :class:`form_builder.models.Form`
+    :param lang_codes: (Optional) List of language codes to be included. If None, all languages are included.
+        Codes that are not a known :class:`languages.models.Language` (except ``eng``) are ignored.
+    :return: JSON dict of format ``{"version": "<bundle version>", "content": "<javascript>", "etag": "<content hash>"}``
+
+    **Authors**: Gagandeep Singh
+    """
+    version = get_form_translation_bundle_version(form)
+    if lang_codes:
+        # Only known languages; codes come from clients and must not mint cache keys
+        set_known = set(Language.objects.filter(code__in=list(set(lang_codes))).values_list('code', flat=True))
+        if 'eng' in lang_codes:
+            set_known.add('eng')
+        lang_codes = sorted(set_known)
+    else:
+        lang_codes = None
+
+    cache_key = "languages:form_translations:{}:{}:{}".format(form.id, version, ",".join(lang_codes) if lang_codes is not None else '*')
+    bundle = cache.get(cache_key)
+    if bundle is None:
+        translations = build_form_translations(form)
+        if lang_codes is not None:
+            translations = { code: trans for code, trans in translations.iteritems() if code in lang_codes }
+
+        content = minify_content(render_to_string('languages/translations_js.html', { "translations": translations }))
+        bundle = {
+            "version": version,
+            "content": content,
+            "etag": hashlib.md5(content.encode('utf-8') if isinstance(content, unicode) else content).hexdigest()
+        }
+        cache.set(cache_key, bundle, settings.FORM_TRANSLATIONS_CACHE_TIMEOUT)
+
+    return bundle
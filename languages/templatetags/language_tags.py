@@ -33,4 +33,18 @@ def to_js_json_unicode(trans_json):
 
     **Authors**: Gagandeep Singh
     """
-    return json.dumps(trans_json, ensure_ascii=False).encode('utf8')
\ No newline at end of file
+    return json.dumps(trans_json, ensure_ascii=False).encode('utf8')
+
+@register.filter
+def translation_bundle_version(form):
+    """
+    Django template filter to obtain version of translation bundle of a form.
+    Use this as query parameter ``v`` in translation bundle url for long term client caching.
+
+    :param form: Instance of :class:`form_builder.models.Form`
+    :return: Bundle version
+
+    **Authors**: Gagandeep Singh
+    """
+    from languages.operations import get_form_translation_bundle_version
+    return get_form_translation_bundle_version(form)
@@ -2,70 +2,61 @@
 # Content in this document can not be copied and/or distributed without the express
 # permission of Gagandeep Singh.
 from django.shortcuts import render_to_response
-from django.http.response import HttpResponse, HttpResponseForbidden
+from django.http.response import HttpResponse, HttpResponseForbidden, HttpResponseNotModified
 from django.contrib.auth.decorators import login_required
+from django.utils.cache import patch_cache_control
+from django.conf import settings
 
 # from form_builder.models import Form
 from languages.models import *
-from utilities.decorators import minified_response
+from languages import operations as ops
 from utilities.api_utils import ApiResponse
 
 import ujson
 
 from form_builder.models import Form
 
-@minified_response
 def form_translations(request, form_id):
     """
     A view to server translation javascript file for a form.
 
     **Type**: GET
 
+    **Query parameters**:
+
+        - ``lang``: (Optional) Comma separated language codes to be included. Default all languages.
+        - ``v``: (Optional) Bundle version as in :func:`languages.operations.get_form_translation_bundle_version`.
+          If current version is requested, response is cached by the client for long period.
+
+    **Points**:
+
+        - Bundle is served from cache (refer :func:`languages.operations.get_form_translation_bundle`).
+        - Response contains ``ETag``; request with matching ``If-None-Match`` receives ``304 Not Modified``.
+
     **Authors**: Gagandeep Singh
     """
 
-    form = Form.objects.get(id=form_id)
-    NM_IMPLICIT = "IMPLICIT"
-
-    set_languages = set()
-    list_translations = []
-    list_translations += form.get_translations()
-    list_translations += Translation.objects.filter(always_include_in_form=True)
-
-    # Create language set
-    translations = {
-        "eng" : {
-            NM_IMPLICIT: {}
-        }
-    }
-
-    for trans_obj in list_translations:
-        id = str(trans_obj.unique_id)
-
-        # Add default english
-        if trans_obj.always_include_in_form:
-            translations["eng"][NM_IMPLICIT][trans_obj.unique_id] = trans_obj.sentence
-        else:
-            translations["eng"][id] = trans_obj.sentence
-
-        # Loop over other languages and add them
-        for lang_code, text in trans_obj.translations.iteritems():
-            lang_code = str(lang_code)
-            if not translations.has_key(lang_code):
-                translations[lang_code] = {
-                    NM_IMPLICIT: {}
-                }
-
-            if trans_obj.always_include_in_form:
-                translations[lang_code][NM_IMPLICIT][trans_obj.unique_id] = text
-            else:
-                translations[lang_code][id] = text
-
-    data = {
-        "translations": translations
-    }
-
-    return render_to_response('languages/translations_js.html', data, content_type="application/javascript; charset=utf-8")
+    form = Form.objects.only('id', 'version', 'translations').get(id=form_id)
+
+    lang_codes = request.GET.get('lang', None)
+    lang_codes = [code.strip() for code in lang_codes.split(',') if code.strip()] if lang_codes else None
+
+    bundle = ops.get_form_translation_bundle(form, lang_codes)
+    etag = '"{}"'.format(bundle['etag'])
+
+    if etag in [tag.strip() for tag in request.META.get('HTTP_IF_NONE_MATCH', '').split(',')]:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(bundle['content'], content_type="application/javascript; charset=utf-8")
+
+    response['ETag'] = etag
+    if request.GET.get('v', None) == bundle['version']:
+        # Versioned url changes with content; can be cached by the client
+        patch_cache_control(response, public=True, max_age=settings.FORM_TRANSLATIONS_MAX_AGE)
+    else:
+        patch_cache_control(response, public=True, max_age=0, must_revalidate=True)
+
+    return response
 
 # # ==================== Staff admin ====================
 # @login_required
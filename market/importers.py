@@ -1,65 +1,256 @@
 # Copyright (C) 2017 Feedvay (Gagandeep Singh: singh.gagan144@gmail.com) - All Rights Reserved
 # Content in this document can not be copied and/or distributed without the express
 # permission of Gagandeep Singh.
+from django.core.cache import cache
 from openpyxl import load_workbook
+from datetime import date, datetime
+import csv
 import json, uuid
 
 from storeroom.models import ImportRecord
 
-def dump_bsp_bulk_upload(file_excel, bsp_type, org, creator_user):
+# Number of records inserted per bulk insert
+IMPORT_CHUNK_SIZE = 1000
+
+# Maximum number of bad rows whose details are kept in progress
+IMPORT_MAX_BAD_ROWS = 500
+
+# Seconds for which import progress is kept in cache
+IMPORT_PROGRESS_TIMEOUT = 24*60*60
+
+
+class ImportProgress(object):
+    """
+    Progress of a bulk upload stored in cache against its ``batch_id`` so that it can be polled
+    while the upload is being processed.
+
+    Progress json::
+
+        {
+            "batch_id": "<batch_id>",
+            "organization_id": <organization id>,
+            "filename": "<filename>",
+            "status": "running|completed|failed",
+            "rows_read": <int>,
+            "rows_inserted": <int>,
+            "rows_skipped": <int>,         # Empty rows
+            "rows_bad": <int>,
+            "bad_rows": [ {"row": <row number in file>, "error": "<error>"}, ... ],   # Capped at IMPORT_MAX_BAD_ROWS
+            "error": "<error if failed>"
+        }
+
+    **Authors**: Gagandeep Singh
+    """
+    ST_RUNNING = 'running'
+    ST_COMPLETED = 'completed'
+    ST_FAILED = 'failed'
+
+    def __init__(self, batch_id, organization_id, filename):
+        self.data = {
+            "batch_id": batch_id,
+            "organization_id": organization_id,
+            "filename": filename,
+            "status": ImportProgress.ST_RUNNING,
+            "rows_read": 0,
+            "rows_inserted": 0,
+            "rows_skipped": 0,
+            "rows_bad": 0,
+            "bad_rows": [],
+            "error": None
+        }
+
+    @staticmethod
+    def get_cache_key(batch_id):
+        return "market:import_progress:{}".format(batch_id)
+
+    @classmethod
+    def get(cls, batch_id, organization_id):
+        """
+        Method to get progress json of a batch of an organization.
+
+        :return: Progress json or None if not found/expired or batch belongs to other organization.
+
+        **Authors**: Gagandeep Singh
+        """
+        progress = cache.get(cls.get_cache_key(batch_id))
+        if progress is None or progress.get("organization_id", None) != organization_id:
+            return None
+        return progress
+
+    def create(self):
+        """
+        Method to save progress of a new batch.
+
+        :return: False if progress of this ``batch_id`` already exists (of any organization), else True.
+
+        **Authors**: Gagandeep Singh
+        """
+        return cache.add(ImportProgress.get_cache_key(self.data["batch_id"]), self.data, IMPORT_PROGRESS_TIMEOUT)
+
+    def add_bad_row(self, row_number, error):
+        self.data["rows_bad"] += 1
+        if len(self.data["bad_rows"]) < IMPORT_MAX_BAD_ROWS:
+            self.data["bad_rows"].append({"row": row_number, "error": error})
+
+    def save(self, status=None, error=None):
+        if status is not None:
+            self.data["status"] = status
+        if error is not None:
+            self.data["error"] = error
+        cache.set(ImportProgress.get_cache_key(self.data["batch_id"]), self.data, IMPORT_PROGRESS_TIMEOUT)
+
+
+def iter_excel_rows(file_excel):
+    """
+    Generator of rows (list of cell values) of first worksheet of an excel file.
+    Workbook is loaded in read-only mode so that rows are streamed.
+
+    **Authors**: Gagandeep Singh
+    """
+    wb = load_workbook(file_excel, read_only=True)
+    ws = wb.worksheets[0]
+    for row in ws.iter_rows():
+        yield [cell.value for cell in row]
+
+def iter_csv_rows(file_csv):
+    """
+    Generator of rows (list of cell values) of a csv file. Empty cells are None. Values are raw
+    UTF-8 strings and are decoded per row by :func:`to_json_value` so that a badly encoded row
+    does not abort the file.
+
+    **Authors**: Gagandeep Singh
+    """
+    for row_idx, row in enumerate(csv.reader(file_csv)):
+        if row_idx == 0 and len(row) and row[0].startswith('\xef\xbb\xbf'):
+            row[0] = row[0][3:]     # UTF-8 BOM
+        yield [value if value != '' else None for value in row]
+
+def to_json_value(value):
+    """
+    Method to convert a cell value to json serializable value.
+
+    **Authors**: Gagandeep Singh
+    """
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, str):
+        return value.decode('utf-8')
+    return value
+
+def dump_bsp_bulk_upload(file_excel, bsp_type, org, creator_user, batch_id=None):
     """
-    Importer that dumps all BSP bulk upload records to :class:`storeroom.models.Record`.
+    Importer that dumps all BSP bulk upload records to :class:`storeroom.models.ImportRecord`.
 
-    :param file_excel: Excel file as the source of the bulk records.
+    **Points**:
+
+        - File can be excel (xlsx) or csv (by file extension). First row must be the header.
+        - Rows are streamed and inserted in chunks of :data:`IMPORT_CHUNK_SIZE`, so memory does not
+          grow with the size of the file.
+        - Empty rows are skipped. Rows that cannot be parsed are skipped and recorded with their row
+          number; they do not abort the batch.
+        - Progress is updated after every chunk and can be polled using :func:`get_import_progress`.
+
+    :param file_excel: Excel or csv file as the source of the bulk records.
     :param bsp_type: BSP type to which records belongs to.
     :param org: Organization for which dumping is done.
     :param creator_user: User who made this import
-    :return: Number of records dumped.
+    :param batch_id: (Optional) Batch id (uuid); a new one is generated if not provided. Must not have been used before.
+    :return: Progress json (refer :class:`market.importers.ImportProgress`)
+
+    **Throws**: ``ValueError`` if ``batch_id`` is not a uuid or has already been used.
+
+    **Authors**: Gagandeep Singh
     """
-    batch_id = str(uuid.uuid4())
+    if batch_id:
+        try:
+            batch_id = str(uuid.UUID(batch_id))
+        except (ValueError, TypeError, AttributeError):
+            raise ValueError("Invalid 'batch_id'; must be a uuid.")
+    else:
+        batch_id = str(uuid.uuid4())
+    filename = file_excel.name
 
-    # Load workbook
-    wb = load_workbook(file_excel, read_only=True)
-    ws =  wb.worksheets[0]
+    progress = ImportProgress(batch_id, org.id, filename)
+    if not progress.create():
+        raise ValueError("Batch '{}' already exists.".format(batch_id))
 
-    # get header mapping: colId-name
-    map_headers = {}
-    for row in ws.iter_rows():
-        for col_idx, cell in enumerate(row):
-            map_headers[col_idx] = cell.value
-        break
-
-    count = 0
-    list_records = []
-    for row_idx, row in enumerate(ws.iter_rows()):
-        if row_idx == 0:
-            continue
-
-        # Obtain row json data
-        row_data = {}
-        for col_idx, cell in enumerate(row):
-            head_name = map_headers[col_idx]
-            row_data[head_name] = cell.value
-        # print row_data
-
-        # Append to bulk insert list
-        list_records.append(
-            ImportRecord(
-                organization_id = org.id,
-                batch_id = batch_id,
-                context = ImportRecord.CNTX_BSP,
-                filename = file_excel._name,
-                identifiers = {
-                    "bsp_type": bsp_type,
-                },
-                data = json.dumps(row_data),
-                created_by = creator_user.id
-            )
-        )
-
-        count += 1
-
-    # Insert in bulk
-    ImportRecord.objects.insert(list_records)
-
-    return count
\ No newline at end of file
+    try:
+        if filename.lower().endswith('.csv'):
+            rows = iter_csv_rows(file_excel)
+        else:
+            rows = iter_excel_rows(file_excel)
+
+        map_headers = None      # Format: { <col idx>: "<name>", ... }
+        list_records = []
+        for row_idx, row in enumerate(rows):
+            row_number = row_idx + 1
+
+            # get header mapping: colId-name
+            if map_headers is None:
+                map_headers = { col_idx: to_json_value(name) for col_idx, name in enumerate(row) if name not in [None, ''] }
+                if not len(map_headers):
+                    raise ValueError("Header row is empty.")
+                continue
+
+            progress.data["rows_read"] += 1
+            if all(value in [None, ''] for value in row):
+                progress.data["rows_skipped"] += 1
+                continue
+
+            # Obtain row json data
+            try:
+                row_data = {}
+                for col_idx, value in enumerate(row):
+                    if col_idx not in map_headers:
+                        if value not in [None, '']:
+                            raise ValueError("Value in column {} without header.".format(col_idx+1))
+                        continue
+                    row_data[map_headers[col_idx]] = to_json_value(value)
+
+                record = ImportRecord(
+                    organization_id = org.id,
+                    batch_id = batch_id,
+                    context = ImportRecord.CNTX_BSP,
+                    filename = filename,
+                    identifiers = {
+                        "bsp_type": bsp_type,
+                    },
+                    data = json.dumps(row_data),
+                    created_by = creator_user.id
+                )
+                record.pack_data()
+            except (ValueError, TypeError, UnicodeError) as ex:
+                progress.add_bad_row(row_number, ex.message or ex.__class__.__name__)
+                continue
+
+            list_records.append(record)
+
+            # Insert in chunks
+            if len(list_records) >= IMPORT_CHUNK_SIZE:
+                ImportRecord.objects.insert(list_records, load_bulk=False)
+                progress.data["rows_inserted"] += len(list_records)
+                progress.save()
+                list_records = []
+
+        if len(list_records):
+            ImportRecord.objects.insert(list_records, load_bulk=False)
+            progress.data["rows_inserted"] += len(list_records)
+
+        progress.save(status=ImportProgress.ST_COMPLETED)
+    except Exception as ex:
+        progress.save(status=ImportProgress.ST_FAILED, error=ex.message or ex.__class__.__name__)
+        raise
+
+    return progress.data
+
+def get_import_progress(batch_id, organization_id):
+    """
+    Method to get progress of a bulk upload of an organization.
+
+    :param batch_id: Batch id of the upload
+    :param organization_id: Organization that made the upload
+    :return: Progress json (refer :class:`market.importers.ImportProgress`) or None if not found.
+
+    **Authors**: Gagandeep Singh
+    """
+    return ImportProgress.get(batch_id, organization_id)
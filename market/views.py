@@ -19,7 +19,7 @@ from market.models import Brand
 from market.forms import *
 from market import operations as ops
 from market.models import *
-from market.importers import dump_bsp_bulk_upload
+from market.importers import dump_bsp_bulk_upload, get_import_progress
 from storeroom.models import ImportRecord
 from feedback.models import BspFeedbackForm
 from reports.models import GraphDiagram
@@ -390,7 +390,8 @@ def console_bsp_import_download_excel_format(request, org):
 @organization_console('market.businessservicepoint.add_businessservicepoint')
 def console_bsp_import_upload_excel(request, org):
     """
-    API view to process uploaded file for BSP import.
+    API view to process uploaded file (xlsx or csv) for BSP import. Client can provide a new ``batch_id``
+    (uuid) and poll :func:`console_bsp_import_progress` while the file is being processed.
 
     **Type**: POST
 
@@ -401,16 +402,44 @@ def console_bsp_import_upload_excel(request, org):
         try:
             bsp_type = request.POST['bsp_type']
             file_excel = request.FILES['file_upload']
+            batch_id = request.POST.get('batch_id', None)
 
-            count = dump_bsp_bulk_upload(file_excel, bsp_type, org, request.user)
+            progress = dump_bsp_bulk_upload(file_excel, bsp_type, org, request.user, batch_id=batch_id)
 
-            return ApiResponse(status=ApiResponse.ST_SUCCESS, message='Ok. {} bsp queued.'.format(count)).gen_http_response()
+            return ApiResponse(
+                status = ApiResponse.ST_SUCCESS if not progress['rows_bad'] else ApiResponse.ST_PARTIAL_SUCCESS,
+                message = 'Ok. {} bsp queued, {} row(s) skipped due to errors.'.format(progress['rows_inserted'], progress['rows_bad']),
+                progress = progress
+            ).gen_http_response()
         except MultiValueDictKeyError:
             return ApiResponse(status=ApiResponse.ST_BAD_REQUEST, message='One or more parameters are missing.').gen_http_response()
+        except ValueError as ex:
+            return ApiResponse(status=ApiResponse.ST_BAD_REQUEST, message=ex.message).gen_http_response()
     else:
         # GET Forbidden
         return ApiResponse(status=ApiResponse.ST_FORBIDDEN, message='Use post.').gen_http_response()
 
+@registered_user_only
+@organization_console('market.businessservicepoint.add_businessservicepoint')
+def console_bsp_import_progress(request, org):
+    """
+    API view to get progress of a BSP import of the organization by its ``batch_id`` (refer :class:`market.importers.ImportProgress`).
+
+    **Type**: GET
+
+    **Authors**: Gagandeep Singh
+    """
+    try:
+        batch_id = request.GET['batch_id']
+    except MultiValueDictKeyError:
+        return ApiResponse(status=ApiResponse.ST_BAD_REQUEST, message="Missing 'batch_id'.").gen_http_response()
+
+    progress = get_import_progress(batch_id, org.id)
+    if progress is None:
+        return ApiResponse(status=ApiResponse.ST_FAILED, message='Import not found.').gen_http_response()
+
+    return ApiResponse(status=ApiResponse.ST_SUCCESS, message='Ok.', progress=progress).gen_http_response()
+
 @registered_user_only
 @organization_console('market.businessservicepoint.add_businessservicepoint')
 def console_bsp_import_queue(request, org):
@@ -0,0 +1,208 @@
+# Copyright (C) 2017 Feedvay (Gagandeep Singh: singh.gagan144@gmail.com) - All Rights Reserved
+# Content in this document can not be copied and/or distributed without the express
+# permission of Gagandeep Singh.
+from datetime import datetime, timedelta
+import random
+import time
+
+from feedback.models import BspFeedbackResponse
+from reports.visuals import StatsNumberGraph, StatsDatetimeGraph, PieGraph, GraphAggregations
+
+# Collection used for synthetic responses; never use a live collection.
+BENCHMARK_COLLECTION = 'benchmark_graph_responses'
+
+# Shape of synthetic responses
+NUM_ORGANIZATIONS = 20
+NUM_FORMS = 5
+NUM_BSPS = 500
+NUM_FILLER_QUESTIONS = 12
+DATE_RANGE_DAYS = 365
+CHOICES = ['excellent', 'good', 'average', 'poor', 'bad']
+
+# Labels of benchmarked questions
+LABEL_NUMBER = 'q_number'
+LABEL_DATE = 'q_date'
+LABEL_CHOICE = 'q_choice'
+
+# ---------- Synthetic responses ----------
+def generate_response_doc(rnd, base_date):
+    """
+    Method to generate raw document of a synthetic BSP feedback response.
+
+    :param rnd: Instance of ``random.Random``
+    :param base_date: Latest response date
+    :return: JSON dict
+
+    **Authors**: Gagandeep Singh
+    """
+    org_id = rnd.randint(1, NUM_ORGANIZATIONS)
+    list_answers = [
+        {"question_label": LABEL_NUMBER, "answer": rnd.randint(0, 1000), "is_other": False},
+        {"question_label": LABEL_DATE, "answer": base_date - timedelta(days=rnd.randint(0, DATE_RANGE_DAYS)), "is_other": False},
+        {"question_label": LABEL_CHOICE, "answer": rnd.choice(CHOICES), "is_other": False},
+    ]
+    for idx in range(NUM_FILLER_QUESTIONS):
+        list_answers.append({"question_label": "q_filler_{}".format(idx), "answer": rnd.randint(0, 100), "is_other": False})
+
+    return {
+        "organization_id": org_id,
+        "form_id": str(rnd.randint(1, NUM_FORMS)),
+        "bsp_id": "bsp_{}_{}".format(org_id, rnd.randint(1, NUM_BSPS)),
+        "response_date": base_date - timedelta(seconds=rnd.randint(0, DATE_RANGE_DAYS*24*3600)),
+        "list_answers": list_answers,
+    }
+
+def create_indexes(collection):
+    """
+    Method to create indexes of :class:`feedback.models.BspFeedbackResponse` on the benchmark collection.
+
+    **Authors**: Gagandeep Singh
+    """
+    for spec in BspFeedbackResponse._meta['index_specs']:
+        options = { key: value for key, value in spec.iteritems() if key not in ['fields', 'cls'] }
+        collection.create_index(spec['fields'], **options)
+
+def populate_collection(collection, count, chunk_size=10000, seed=0):
+    """
+    Method to (re)create benchmark collection with synthetic responses.
+
+    :param collection: pymongo collection
+    :param count: Number of responses
+    :param chunk_size: Responses per insert
+    :param seed: Random seed
+    :return: Seconds taken
+
+    **Authors**: Gagandeep Singh
+    """
+    start = time.time()
+    rnd = random.Random(seed)
+    base_date = datetime(2017, 1, 1)
+
+    collection.drop()
+    create_indexes(collection)
+
+    inserted = 0
+    while inserted < count:
+        size = min(chunk_size, count - inserted)
+        collection.insert_many([generate_response_doc(rnd, base_date) for _ in range(size)], ordered=False)
+        inserted += size
+
+    return round(time.time() - start, 2)
+
+# ---------- Measurement ----------
+def to_unwind_first(pipeline):
+    """
+    Method to convert pipeline built by :func:`reports.visuals.build_answer_pipeline` back to the
+    shape used earlier i.e. ``$unwind`` of all answers followed by a single ``$match``.
+
+    **Authors**: Gagandeep Singh
+    """
+    doc_filters = dict(pipeline[0]["$match"])
+    del doc_filters["list_answers"]
+    final_filters = dict(doc_filters)
+    final_filters.update(pipeline[2]["$match"])
+
+    return [pipeline[1], { "$match": final_filters }] + pipeline[3:]
+
+def find_key(obj, key):
+    """
+    Returns first value of ``key`` found recursively in nested dicts/lists of ``obj``.
+
+    **Authors**: Gagandeep Singh
+    """
+    if isinstance(obj, dict):
+        if key in obj:
+            return obj[key]
+        values = obj.values()
+    elif isinstance(obj, list):
+        values = obj
+    else:
+        return None
+
+    for value in values:
+        found = find_key(value, key)
+        if found is not None:
+            return found
+    return None
+
+def measure_pipeline(collection, pipeline):
+    """
+    Method to measure a pipeline: execution statistics of its leading cursor stage (explain with
+    ``executionStats``) and wall time of actual run.
+
+    :return: JSON dict
+
+    **Authors**: Gagandeep Singh
+    """
+    explain = collection.database.command(
+        'explain',
+        {'aggregate': collection.name, 'pipeline': pipeline, 'cursor': {}},
+        verbosity = 'executionStats'
+    )
+    stats = find_key(explain, 'executionStats') or {}
+    winning_plan = find_key(explain, 'winningPlan') or {}
+
+    start = time.time()
+    list(collection.aggregate(pipeline, allowDiskUse=True))
+    wall_time = time.time() - start
+
+    return {
+        "docs_examined": stats.get('totalDocsExamined', None),
+        "keys_examined": stats.get('totalKeysExamined', None),
+        "index_used": find_key(winning_plan, 'indexName'),
+        "wall_time_sec": round(wall_time, 4),
+    }
+
+def get_scenarios():
+    """
+    Returns list of benchmark scenarios of format ``[(<name>, <graph>, <question label>, <match filters>, <kwargs>), ...]``.
+
+    **Authors**: Gagandeep Singh
+    """
+    graphs = [
+        ('stats_number', StatsNumberGraph(question_id=0), LABEL_NUMBER, {}),
+        ('stats_datetime', StatsDatetimeGraph(question_id=0), LABEL_DATE, {'use_string': True}),
+        ('pie', PieGraph(question_id=0, aggregation=GraphAggregations.COUNT), LABEL_CHOICE, {}),
+    ]
+    date_to = datetime(2017, 1, 1)
+    filters = [
+        ('organization', {"organization_id": 1}),
+        ('organization_form', {"organization_id": 1, "form_id": "1"}),
+        ('organization_30_days', {"organization_id": 1, "response_date": {"$gte": date_to - timedelta(days=30), "$lte": date_to}}),
+        ('organization_bsp', {"organization_id": 1, "bsp_id": "bsp_1_1"}),
+    ]
+
+    scenarios = []
+    for graph_name, graph, label, kwargs in graphs:
+        for filter_name, match_filters in filters:
+            scenarios.append(("{}/{}".format(graph_name, filter_name), graph, label, match_filters, kwargs))
+    return scenarios
+
+def benchmark_graph_pipelines(collection):
+    """
+    Method to compare graph pipelines before (``$unwind`` first) and after (leading ``$match`` with ``$elemMatch``)
+    on benchmark collection.
+
+    :param collection: pymongo collection populated by :func:`populate_collection`
+    :return: JSON dict of results
+
+    **Authors**: Gagandeep Singh
+    """
+    results = []
+    for name, graph, label, match_filters, kwargs in get_scenarios():
+        pipeline = graph.get_pipeline(label, match_filters, **kwargs)
+
+        before = measure_pipeline(collection, to_unwind_first(pipeline))
+        after = measure_pipeline(collection, pipeline)
+        results.append({
+            "scenario": name,
+            "before": before,
+            "after": after,
+            "speedup": round(before["wall_time_sec"] / after["wall_time_sec"], 2) if after["wall_time_sec"] else None,
+        })
+
+    return {
+        "collection": collection.name,
+        "responses": collection.count(),
+        "results": results,
+    }
@@ -0,0 +1,163 @@
+# Copyright (C) 2017 Feedvay (Gagandeep Singh: singh.gagan144@gmail.com) - All Rights Reserved
+# Content in this document can not be copied and/or distributed without the express
+# permission of Gagandeep Singh.
+from django.conf import settings
+from django.core.cache import cache
+from datetime import date, datetime
+import hashlib
+import json
+import time
+
+# Form part of generation key for graphs that are not restricted to a form
+ALL_FORMS = '*'
+
+def get_generation_key(organization_id, form_id):
+    return "reports:graph_generation:{}:{}".format(organization_id, form_id if form_id is not None else ALL_FORMS)
+
+def get_generation(organization_id, form_id=None):
+    """
+    Returns current generation of responses of a form of an organization. Generation changes whenever
+    a new response is ingested (refer :func:`bump_generation`) and is used to version graph data cache.
+
+    :param organization_id: Organization id
+    :param form_id: (Optional) Form id; None for all forms of the organization
+    :return: Generation number
+
+    **Authors**: Gagandeep Singh
+    """
+    key = get_generation_key(organization_id, form_id)
+    generation = cache.get(key)
+    if generation is None:
+        # Timestamp is used so that a lost counter never repeats an older generation
+        cache.add(key, int(time.time()), None)
+        generation = cache.get(key)
+    return generation
+
+def bump_generation(organization_id, form_id):
+    """
+    Method to move responses of a form to next generation. Call this whenever responses are ingested
+    so that cached graph data of the form (and of graphs on all forms of the organization) is not served.
+
+    **Authors**: Gagandeep Singh
+    """
+    for key_form_id in [form_id, None]:
+        key = get_generation_key(organization_id, key_form_id)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Key does not exists
+            get_generation(organization_id, key_form_id)
+
+def to_hash(value):
+    """
+    Returns hash of json serializable value. Keys are sorted so that same filters/definitions
+    always produce same hash irrespective of order of keys.
+
+    **Authors**: Gagandeep Singh
+    """
+    def default(obj):
+        if isinstance(obj, (datetime, date)):
+            return obj.isoformat()
+        return str(obj)
+
+    return hashlib.sha1(json.dumps(value, sort_keys=True, default=default)).hexdigest()
+
+def get_data_cache_key(graph_diag, data_filters, **kwargs):
+    """
+    Returns cache key of data of a graph diagram. Key is made of ``graph_uid``, hash of graph
+    definition, generation of responses and hash of normalized filters & options.
+
+    **Authors**: Gagandeep Singh
+    """
+    definition_hash = to_hash([graph_diag.graph_type, graph_diag.graph_definition])
+    generation = get_generation(graph_diag.organization_id, graph_diag.form_id)
+    filters_hash = to_hash([data_filters, kwargs])
+
+    return "reports:graph_data:{}:{}:{}:{}".format(graph_diag.graph_uid, definition_hash, generation, filters_hash)
+
+def get_graph_data(graph_diag, data_filters={}, **kwargs):
+    """
+    Method to get data of a graph diagram (refer :func:`reports.models.GraphDiagram.get_data`) from
+    cache. Data is cached till a new response of the form is ingested or ``REPORTS_GRAPH_CACHE['TIMEOUT']``.
+
+    On a miss, only one request computes the data; concurrent requests for same key wait upto
+    ``REPORTS_GRAPH_CACHE['LOCK_WAIT']`` seconds for it to appear in cache and compute themselves
+    only if it does not.
+
+    :param graph_diag: Instance of :class:`reports.models.GraphDiagram`
+    :param data_filters: Filters on data
+    :param kwargs: Options passed to ``get_data()``
+    :return: JSON data
+
+    **Authors**: Gagandeep Singh
+    """
+    config = settings.REPORTS_GRAPH_CACHE
+    if not config['ENABLED']:
+        return graph_diag.get_data(data_filters=data_filters, **kwargs)
+
+    key = get_data_cache_key(graph_diag, data_filters, **kwargs)
+    data = cache.get(key)
+    if data is not None:
+        return data
+
+    lock_key = key + ':lock'
+    if cache.add(lock_key, 1, config['LOCK_TIMEOUT']):
+        try:
+            data = graph_diag.get_data(data_filters=data_filters, **kwargs)
+            cache.set(key, data, config['TIMEOUT'])
+        finally:
+            cache.delete(lock_key)
+        return data
+
+    # Other request is computing; wait for it
+    wait_until = time.time() + config['LOCK_WAIT']
+    while time.time() < wait_until:
+        time.sleep(0.1)
+        data = cache.get(key)
+        if data is not None:
+            return data
+        if cache.get(lock_key) is None:
+            # Computation failed
+            break
+
+    return graph_diag.get_data(data_filters=data_filters, **kwargs)
+
+def get_graphs_data(list_graph_diag, data_filters={}, **kwargs):
+    """
+    Method to get data of multiple graph diagrams from cache. Graphs missing in cache are computed
+    together using :func:`reports.models.GraphDiagram.get_data_bulk` and cached.
+
+    :param list_graph_diag: List of :class:`reports.models.GraphDiagram`
+    :param data_filters: Filters on data
+    :param kwargs: Options passed to ``get_data()``
+    :return: JSON dict of format ``{ "<graph_uid>": <data>, ... }``
+
+    **Authors**: Gagandeep Singh
+    """
+    from reports.models import GraphDiagram
+
+    config = settings.REPORTS_GRAPH_CACHE
+    if not config['ENABLED']:
+        return GraphDiagram.get_data_bulk(list_graph_diag, data_filters=data_filters, **kwargs)
+
+    lookup_keys = {}
+    for graph_diag in list_graph_diag:
+        lookup_keys[str(graph_diag.graph_uid)] = get_data_cache_key(graph_diag, data_filters, **kwargs)
+    cached = cache.get_many(lookup_keys.values())
+
+    result = {}
+    list_missed = []
+    for graph_diag in list_graph_diag:
+        graph_uid = str(graph_diag.graph_uid)
+        data = cached.get(lookup_keys[graph_uid], None)
+        if data is None:
+            list_missed.append(graph_diag)
+        else:
+            result[graph_uid] = data
+
+    if len(list_missed):
+        computed = GraphDiagram.get_data_bulk(list_missed, data_filters=data_filters, **kwargs)
+        cache.set_many({ lookup_keys[graph_uid]: data for graph_uid, data in computed.iteritems() if data is not None }, config['TIMEOUT'])
+        result.update(computed)
+
+    return result
@@ -0,0 +1,78 @@
+# Copyright (C) 2017 Feedvay (Gagandeep Singh: singh.gagan144@gmail.com) - All Rights Reserved
+# Content in this document can not be copied and/or distributed without the express
+# permission of Gagandeep Singh.
+from django.core.management.base import BaseCommand, CommandError
+import json
+
+from feedback.models import BspFeedbackResponse
+from reports import benchmarks
+
+class Command(BaseCommand):
+    """
+    Django management command to benchmark aggregation pipelines of graphs (refer :mod:`reports.visuals`)
+    on synthetic responses. For each scenario, documents & index keys examined (explain ``executionStats``)
+    and wall time are reported for pipeline with ``$unwind`` first (before) and with leading ``$match`` (after).
+
+    Synthetic responses are written to a separate collection ``benchmark_graph_responses`` having indexes
+    of :class:`feedback.models.BspFeedbackResponse`.
+
+    **Parameters:**
+
+        - ``responses``: (Default 1000000) Number of synthetic responses.
+        - ``skip_generate``: Reuse existing benchmark collection.
+        - ``drop``: Drop benchmark collection after run.
+
+    Command::
+
+        python manage.py reports_benchmark_pipelines --responses 1000000 > pipelines_bench.json
+
+    **Authors**: Gagandeep Singh
+    """
+    help = "Command to benchmark aggregation pipelines of graphs on synthetic responses."
+    requires_system_checks = True
+    can_import_settings = True
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--responses",
+            dest = "responses",
+            help = "Number of synthetic responses. Default: 1000000",
+            type = int,
+            default = 1000000
+        )
+        parser.add_argument(
+            "--skip_generate",
+            dest = "skip_generate",
+            help = "Reuse existing benchmark collection.",
+            action = "store_true",
+            default = False
+        )
+        parser.add_argument(
+            "--drop",
+            dest = "drop",
+            help = "Drop benchmark collection after run.",
+            action = "store_true",
+            default = False
+        )
+
+    # ----- Main executor -----
+    def handle(self, *args, **options):
+        collection = BspFeedbackResponse._get_collection().database[benchmarks.BENCHMARK_COLLECTION]
+
+        generate_sec = None
+        if not options['skip_generate']:
+            if options['responses'] <= 0:
+                raise CommandError("Invalid number of responses '{}'.".format(options['responses']))
+            self.stderr.write('Generating {} synthetic responses...'.format(options['responses']))
+            generate_sec = benchmarks.populate_collection(collection, options['responses'])
+        elif not collection.count():
+            raise CommandError("Benchmark collection '{}' is empty.".format(collection.name))
+
+        self.stderr.write('Running pipeline benchmark...')
+        result = benchmarks.benchmark_graph_pipelines(collection)
+        result["generate_sec"] = generate_sec
+
+        if options['drop']:
+            collection.drop()
+
+        self.stdout.write(json.dumps(result, indent=4))
@@ -0,0 +1,78 @@
+# Copyright (C) 2017 Feedvay (Gagandeep Singh: singh.gagan144@gmail.com) - All Rights Reserved
+# Content in this document can not be copied and/or distributed without the express
+# permission of Gagandeep Singh.
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+import json
+
+from reports import rollups
+
+class Command(BaseCommand):
+    """
+    Django management command to rebuild (or backfill) answer rollups (:class:`reports.models.AnswerRollup`)
+    from BSP feedback responses. Refer :func:`reports.rollups.rebuild_rollups`.
+
+    **Parameters:**
+
+        - ``organization``: (Optional) Organization id; default all organizations.
+        - ``form``: (Optional) Form id; default all forms.
+        - ``since``: (Optional) Day in format ``YYYY-MM-DD``; default all days.
+        - ``batch_size``: (Default 1000) Number of responses accumulated per write.
+
+    Command::
+
+        python manage.py reports_rebuild_rollups --organization 12 --since 2017-01-01
+
+    **Authors**: Gagandeep Singh
+    """
+    help = "Command to rebuild answer rollups of responses."
+    requires_system_checks = True
+    can_import_settings = True
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--organization",
+            dest = "organization",
+            help = "Organization id. Default: all",
+            type = int,
+            default = None
+        )
+        parser.add_argument(
+            "--form",
+            dest = "form",
+            help = "Form id. Default: all",
+            default = None
+        )
+        parser.add_argument(
+            "--since",
+            dest = "since",
+            help = "Day in format YYYY-MM-DD. Default: all",
+            default = None
+        )
+        parser.add_argument(
+            "--batch_size",
+            dest = "batch_size",
+            help = "Number of responses accumulated per write. Default: 1000",
+            type = int,
+            default = 1000
+        )
+
+    # ----- Main executor -----
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = timezone.datetime.strptime(options['since'], "%Y-%m-%d")
+            except ValueError:
+                raise CommandError("Invalid day '{}'.".format(options['since']))
+
+        self.stdout.write(self.style.SUCCESS('Rebuilding rollups...'))
+        result = rollups.rebuild_rollups(
+            organization_id = options['organization'],
+            form_id = options['form'],
+            since = since,
+            batch_size = options['batch_size'],
+            log = lambda message: self.stdout.write("\t" + message)
+        )
+        self.stdout.write(json.dumps(result, indent=4))
+        self.stdout.write(self.style.SUCCESS('Completed!'))
@@ -5,17 +5,22 @@ from __future__ import unicode_literals
 
 from django.db import models
 from django_mysql import models as models57
+from django.conf import settings
 import tinymce.models as tinymce_models
 from django.utils import timezone
 from jsonobject.exceptions import *
 from django.core.exceptions import ValidationError
 import uuid
 
+from mongoengine.document import *
+from mongoengine.fields import *
+
 from django.contrib.auth.models import User
 
 from clients.models import Organization
 from feedback.models import BspFeedbackResponse
-from reports.visuals import GraphCharts, GRAPH_CLASS_MAPPING
+from form_builder.models import FormQuestion
+from reports.visuals import GraphCharts, GRAPH_CLASS_MAPPING, build_facet_pipeline
 
 class GraphDiagram(models57.Model):
     """
@@ -83,6 +88,33 @@ class GraphDiagram(models57.Model):
         graph = self.graph
         entityModel = self.get_entity_model()
 
+        rollup_model = self.get_rollup_model()
+        if rollup_model is not None:
+            kwargs['rollup_model'] = rollup_model
+
+        return graph.get_data(entityModel, self.get_match_filters(data_filters), **kwargs)
+
+    def get_rollup_model(self):
+        """
+        Method to return rollup model (refer :class:`reports.models.AnswerRollup`) as per ``context`` field.
+
+        :return: Model class or None if rollups are not available/enabled for the context.
+
+        **Authors**: Gagandeep Singh
+        """
+        if settings.REPORTS_ROLLUPS['READ'] and self.context == GraphDiagram.CT_BSP_FEEDBACK:
+            return AnswerRollup
+        return None
+
+    def get_match_filters(self, data_filters={}):
+        """
+        Method to get final filters on data i.e. filters of this graph diagram (organization, form)
+        along with provided ``data_filters``.
+
+        :return: JSON dict
+
+        **Authors**: Gagandeep Singh
+        """
         final_filters = {}
         if self.organization_id:
             final_filters['organization_id'] = self.organization_id
@@ -90,8 +122,82 @@ class GraphDiagram(models57.Model):
             final_filters["form_id"] = str(self.form_id)
 
         final_filters.update(data_filters)
+        return final_filters
+
+    @staticmethod
+    def get_data_bulk(list_graph_diag, data_filters={}, **kwargs):
+        """
+        Method to get data of multiple graph diagrams (for example, all graphs pinned to a dashboard).
+
+        **Points**:
+
+            - Question labels of all graphs are fetched in a single query.
+            - Graphs on same model with same final filters (refer :func:`get_match_filters`) are computed
+              with one ``$facet`` aggregation (refer :func:`reports.visuals.build_facet_pipeline`) so that
+              matched responses are read once.
+            - Graphs that can be computed from rollups (refer :class:`reports.models.AnswerRollup`) are
+              read from rollups instead.
+            - Graphs that do not define a pipeline are computed individually using :func:`get_data`.
+              Data is None for graphs whose data is not implemented.
+
+        :param list_graph_diag: List of :class:`reports.models.GraphDiagram`
+        :param data_filters: Filters on data
+        :return: JSON dict of format ``{ "<graph_uid>": <data>, ... }``
+
+        **Authors**: Gagandeep Singh
+        """
+        result = {}
+
+        # Labels of questions
+        lookup_graph = {}
+        for graph_diag in list_graph_diag:
+            lookup_graph[str(graph_diag.graph_uid)] = graph_diag.graph
+        list_ques_ids = [getattr(graph, 'question_id', None) for graph in lookup_graph.itervalues()]
+        lookup_labels = dict(FormQuestion.objects.filter(id__in=list_ques_ids).values_list('id', 'label'))
+
+        # Group pipelines by model & filters
+        groups = {}     # Format: { (<model>, <filters key>): (<match filters>, { <graph_uid>: <pipeline> }) }
+        for graph_diag in list_graph_diag:
+            graph_uid = str(graph_diag.graph_uid)
+            graph = lookup_graph[graph_uid]
+            match_filters = graph_diag.get_match_filters(data_filters)
+
+            ques_label = lookup_labels.get(getattr(graph, 'question_id', None), None)
+            rollup_model = graph_diag.get_rollup_model()
+            if ques_label is not None and rollup_model is not None:
+                try:
+                    result[graph_uid] = graph.get_rollup_data(rollup_model, ques_label, match_filters, **kwargs)
+                    continue
+                except NotImplementedError:
+                    pass
+
+            pipeline = None
+            if ques_label is not None:
+                try:
+                    pipeline = graph.get_pipeline(ques_label, match_filters, **kwargs)
+                except NotImplementedError:
+                    pass
+
+            if pipeline is None:
+                # Graph without question or pipeline
+                try:
+                    result[graph_uid] = graph_diag.get_data(data_filters=data_filters, **kwargs)
+                except NotImplementedError:
+                    # Graph data not implemented; must not fail other graphs
+                    result[graph_uid] = None
+                continue
 
-        return graph.get_data(entityModel, final_filters, **kwargs)
+            group_key = (graph_diag.get_entity_model(), repr(sorted(match_filters.items())))
+            groups.setdefault(group_key, (match_filters, {}))[1][graph_uid] = pipeline
+
+        # One aggregation per group
+        for (entityModel, _), (match_filters, dict_pipelines) in groups.iteritems():
+            result_aggr = list(entityModel._get_collection().aggregate(build_facet_pipeline(dict_pipelines), allowDiskUse=True))
+            facets = result_aggr[0] if len(result_aggr) else {}
+            for graph_uid in dict_pipelines.iterkeys():
+                result[graph_uid] = lookup_graph[graph_uid].parse_result(facets.get(graph_uid, []), **kwargs)
+
+        return result
 
     def clean(self):
         """
@@ -125,3 +231,46 @@ class GraphDiagram(models57.Model):
         self.clean()
         super(self.__class__, self).save(*args, **kwargs)
 
+
+class AnswerRollup(Document):
+    """
+    Mongodb collection of daily aggregates of answers of a question so that graphs on date ranges
+    can be computed without scanning responses (refer :func:`reports.visuals.BaseGraphChart.get_rollup_data`).
+
+    **Points**:
+
+        - One document per ``(organization_id, form_id, question_label, day, bsp_id)``; ``day`` is
+          ``response_date`` truncated to day.
+        - ``num_*`` fields aggregate numeric answers (as :class:`reports.visuals.StatsNumberGraph`).
+        - ``values`` holds count of each answer value (except 'other' answers) of format
+          ``{ "<encoded value>": <count> }`` (refer :func:`reports.visuals.encode_rollup_value`). Only
+          boolean, integer, decimal & short string values are counted; other values (e.g. long text, lists)
+          are only counted in ``values_skipped`` so that graphs on values fall back to responses.
+        - Rollups are updated atomically using ``$inc``/``$min``/``$max`` when a response is ingested
+          (refer :func:`reports.rollups.add_responses`) and can be rebuilt using ``reports_rebuild_rollups`` command.
+
+    **Authors**: Gagandeep Singh
+    """
+    organization_id = IntField(required=True, help_text='InstanceID of the organization.')
+    form_id     = StringField(required=True, help_text='Primary key of the form.')
+    question_label = StringField(required=True, help_text='Label of the question.')
+    day         = DateTimeField(required=True, help_text='Day of the responses.')
+    bsp_id      = StringField(default=None, help_text='BSP ID in case of BSP feedback responses.')
+
+    num_count   = IntField(default=0, help_text='Number of numeric answers.')
+    num_sum     = FloatField(default=0, help_text='Sum of numeric answers.')
+    num_sum_sq  = FloatField(default=0, help_text='Sum of squares of numeric answers.')
+    num_min     = FloatField(help_text='Minimum numeric answer.')
+    num_max     = FloatField(help_text='Maximum numeric answer.')
+
+    values      = DictField(help_text='Count of each answer value.')
+    values_skipped = IntField(default=0, help_text='Number of answers (except other) not counted in values.')
+
+    meta = {
+        'indexes': [
+            { 'fields':['organization_id', 'question_label', 'day', 'form_id', 'bsp_id'], 'cls':False, 'unique': True },
+        ]
+    }
+
+    def __unicode__(self):
+        return "{} - {} - {}".format(self.form_id, self.question_label, self.day)
@@ -0,0 +1,289 @@
+# Copyright (C) 2017 Feedvay (Gagandeep Singh: singh.gagan144@gmail.com) - All Rights Reserved
+# Content in this document can not be copied and/or distributed without the express
+# permission of Gagandeep Singh.
+from django.conf import settings
+from datetime import datetime
+from bson.objectid import ObjectId
+from pymongo import UpdateOne
+import uuid
+
+from feedback.models import BspFeedbackResponse
+from reports.models import AnswerRollup
+from reports import data_cache
+from reports.visuals import encode_rollup_value
+
+def get_day(dt):
+    return datetime(dt.year, dt.month, dt.day)
+
+def is_number(value):
+    return isinstance(value, (int, long, float)) and not isinstance(value, bool)
+
+def is_countable(value):
+    """
+    Returns True if count of an answer value is kept in rollups i.e. boolean, integer, decimal or short string.
+
+    **Authors**: Gagandeep Singh
+    """
+    if isinstance(value, (bool, int, long, float)):
+        return True
+    if isinstance(value, basestring):
+        return len(value) <= settings.REPORTS_ROLLUPS['MAX_VALUE_LENGTH']
+    return False
+
+
+class RollupAccumulator(object):
+    """
+    Accumulator of answers of responses into :class:`reports.models.AnswerRollup` increments.
+    Increments are written on :func:`save` with one upsert per rollup document.
+
+    Usage::
+
+        accumulator = RollupAccumulator()
+        for doc in responses:
+            accumulator.add(doc)
+        accumulator.save()
+
+    **Authors**: Gagandeep Singh
+    """
+
+    def __init__(self):
+        self.rollups = {}   # Format: { (<org>, <form>, <label>, <day>, <bsp>): { 'count':, 'sum':, 'sum_sq':, 'min':, 'max':, 'values': {}, 'skipped': } }
+
+    def __len__(self):
+        return len(self.rollups)
+
+    def get_counters(self, key):
+        counters = self.rollups.get(key, None)
+        if counters is None:
+            counters = self.rollups[key] = { 'count': 0, 'sum': 0, 'sum_sq': 0, 'min': None, 'max': None, 'values': {}, 'skipped': 0 }
+        return counters
+
+    def add(self, doc):
+        """
+        Method to add answers of a response.
+
+        :param doc: Raw response document (dict) having ``organization_id``, ``form_id``, ``bsp_id``,
+            ``response_date`` & ``list_answers``.
+
+        **Authors**: Gagandeep Singh
+        """
+        day = get_day(doc['response_date'])
+        for answer in doc.get('list_answers', []):
+            value = answer['answer']
+            is_other = answer.get('is_other', False)
+            if is_other and not is_number(value):
+                continue
+
+            counters = self.get_counters((doc['organization_id'], doc['form_id'], answer['question_label'], day, doc.get('bsp_id', None)))
+
+            if is_number(value):
+                counters['count'] += 1
+                counters['sum'] += value
+                counters['sum_sq'] += value * value
+                counters['min'] = value if counters['min'] is None else min(counters['min'], value)
+                counters['max'] = value if counters['max'] is None else max(counters['max'], value)
+
+            if is_other:
+                continue
+            if is_countable(value):
+                value_key = encode_rollup_value(value)
+                counters['values'][value_key] = counters['values'].get(value_key, 0) + 1
+            else:
+                # Graphs on values of this question cannot be answered from rollups
+                counters['skipped'] += 1
+
+    def add_rollup(self, doc):
+        """
+        Method to add counters of an existing rollup document (e.g. of a staging collection).
+
+        :param doc: Raw :class:`reports.models.AnswerRollup` document (dict)
+
+        **Authors**: Gagandeep Singh
+        """
+        counters = self.get_counters((doc['organization_id'], doc['form_id'], doc['question_label'], doc['day'], doc.get('bsp_id', None)))
+
+        if doc.get('num_count', 0):
+            counters['count'] += doc['num_count']
+            counters['sum'] += doc['num_sum']
+            counters['sum_sq'] += doc['num_sum_sq']
+            counters['min'] = doc['num_min'] if counters['min'] is None else min(counters['min'], doc['num_min'])
+            counters['max'] = doc['num_max'] if counters['max'] is None else max(counters['max'], doc['num_max'])
+
+        for value_key, count in doc.get('values', {}).iteritems():
+            counters['values'][value_key] = counters['values'].get(value_key, 0) + count
+        counters['skipped'] += doc.get('values_skipped', 0)
+
+    def save(self, collection=None):
+        """
+        Method to write accumulated increments and reset the accumulator.
+
+        :param collection: (Optional) pymongo collection to write to; default collection of :class:`reports.models.AnswerRollup`
+        :return: Number of rollup documents updated
+
+        **Authors**: Gagandeep Singh
+        """
+        if not len(self.rollups):
+            return 0
+
+        list_ops = []
+        for (organization_id, form_id, ques_label, day, bsp_id), counters in self.rollups.iteritems():
+            update = {}
+            # Encoded values are unicode (refer encode_rollup_value)
+            inc = { u'values.{}'.format(value_key): count for value_key, count in counters['values'].iteritems() }
+            if counters['count']:
+                inc.update({
+                    'num_count': counters['count'],
+                    'num_sum': counters['sum'],
+                    'num_sum_sq': counters['sum_sq'],
+                })
+                update['$min'] = { 'num_min': counters['min'] }
+                update['$max'] = { 'num_max': counters['max'] }
+            if counters['skipped']:
+                inc['values_skipped'] = counters['skipped']
+            update['$inc'] = inc
+
+            list_ops.append(UpdateOne(
+                {
+                    'organization_id': organization_id,
+                    'question_label': ques_label,
+                    'day': day,
+                    'form_id': form_id,
+                    'bsp_id': bsp_id
+                },
+                update,
+                upsert = True
+            ))
+
+        if collection is None:
+            collection = AnswerRollup._get_collection()
+        collection.bulk_write(list_ops, ordered=False)
+        self.rollups = {}
+        return len(list_ops)
+
+
+def add_responses(list_responses):
+    """
+    Method to add answers of newly ingested responses to rollups. Errors are not raised since
+    rollups must never fail ingestion; missed responses can be recovered using ``reports_rebuild_rollups`` command.
+
+    :param list_responses: List of response documents (e.g. :class:`feedback.models.BspFeedbackResponse`)
+    :return: True if written successfully
+
+    **Authors**: Gagandeep Singh
+    """
+    if not settings.REPORTS_ROLLUPS['INGEST']:
+        return True
+
+    try:
+        accumulator = RollupAccumulator()
+        for response in list_responses:
+            accumulator.add(response.to_mongo())
+        accumulator.save()
+        return True
+    except Exception:
+        return False
+
+def accumulate_responses(qry_responses, collection, batch_size, log):
+    """
+    Method to add answers of responses matching the query to rollups in ``collection``.
+
+    :return: Tuple ``(<responses count>, <rollups updated>)``
+
+    **Authors**: Gagandeep Singh
+    """
+    count = 0
+    count_rollups = 0
+    accumulator = RollupAccumulator()
+    projection = { 'organization_id': True, 'form_id': True, 'bsp_id': True, 'response_date': True, 'list_answers': True }
+    for doc in BspFeedbackResponse._get_collection().find(qry_responses, projection, batch_size=batch_size):
+        accumulator.add(doc)
+        count += 1
+        if count % batch_size == 0:
+            count_rollups += accumulator.save(collection)
+            log("{} response(s) processed.".format(count))
+
+    count_rollups += accumulator.save(collection)
+    return count, count_rollups
+
+def rebuild_rollups(organization_id=None, form_id=None, since=None, batch_size=1000, log=None):
+    """
+    Method to rebuild rollups of BSP feedback responses from scratch.
+
+    **Points**:
+
+        - New rollups are first computed in a staging collection from responses created before the
+          rebuild started. Existing rollups are left untouched if this fails.
+        - Existing rollups in the scope are then removed and replaced by the staged ones. Responses
+          created while staging are added as well since their increments were removed along with old rollups.
+        - Cached graph data (refer :mod:`reports.data_cache`) of the rebuilt scope is invalidated once done.
+
+    .. warning::
+        Responses ingested while existing rollups are being replaced may be counted twice or missed. Run during
+        low traffic or disable ``REPORTS_ROLLUPS['READ']`` meanwhile.
+
+    :param organization_id: (Optional) Rebuild only for this organization
+    :param form_id: (Optional) Rebuild only for this form
+    :param since: (Optional) Rebuild only from this day
+    :param batch_size: Number of responses accumulated per write
+    :param log: (Optional) Callable accepting a message string
+    :return: JSON dict of format ``{ "responses": <count>, "rollups_updated": <count> }``
+
+    **Authors**: Gagandeep Singh
+    """
+    log = log or (lambda message: None)
+
+    qry_rollups = {}
+    qry_responses = {}
+    if organization_id is not None:
+        qry_rollups['organization_id'] = qry_responses['organization_id'] = organization_id
+    if form_id is not None:
+        qry_rollups['form_id'] = qry_responses['form_id'] = str(form_id)
+    if since is not None:
+        since = get_day(since)
+        qry_rollups['day'] = qry_responses['response_date'] = { '$gte': since }
+
+    collection = AnswerRollup._get_collection()
+    staging = collection.database["{}_rebuild_{}".format(collection.name, uuid.uuid4().hex)]
+    try:
+        # (1) Compute new rollups in staging
+        started_id = ObjectId.from_datetime(datetime.utcnow())
+        count, _ = accumulate_responses(dict(qry_responses, _id={ '$lt': started_id }), staging, batch_size, log)
+        log("{} response(s) staged.".format(count))
+
+        # (2) Replace existing rollups
+        replaced_id = ObjectId.from_datetime(datetime.utcnow())
+        deleted = collection.delete_many(qry_rollups).deleted_count
+        log("{} rollup(s) removed.".format(deleted))
+
+        count_rollups = 0
+        accumulator = RollupAccumulator()
+        for doc in staging.find({}, batch_size=batch_size):
+            accumulator.add_rollup(doc)
+            if len(accumulator) >= batch_size:
+                count_rollups += accumulator.save(collection)
+        count_rollups += accumulator.save(collection)
+
+        # (3) Responses created while staging
+        count_tail, count_tail_rollups = accumulate_responses(
+            dict(qry_responses, _id={ '$gte': started_id, '$lt': replaced_id }), collection, batch_size, log
+        )
+        count += count_tail
+        count_rollups += count_tail_rollups
+    finally:
+        staging.drop()
+
+    # Invalidate cached graph data of every (organization, form) in the rebuilt scope
+    result_aggr = collection.aggregate([
+        { "$match": qry_rollups },
+        { "$group": { "_id": { "organization_id": "$organization_id", "form_id": "$form_id" } } }
+    ])
+    set_scopes = set((doc["_id"]["organization_id"], doc["_id"]["form_id"]) for doc in result_aggr)
+    if organization_id is not None and form_id is not None:
+        set_scopes.add((organization_id, str(form_id)))
+    for scope_org_id, scope_form_id in set_scopes:
+        data_cache.bump_generation(scope_org_id, scope_form_id)
+
+    return {
+        "responses": count,
+        "rollups_updated": count_rollups,
+    }
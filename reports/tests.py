@@ -1,6 +1,167 @@
 # Copyright (C) 2017 Feedvay (Gagandeep Singh: singh.gagan144@gmail.com) - All Rights Reserved
 # Content in this document can not be copied and/or distributed without the express
 # permission of Gagandeep Singh.
-from django.test import TestCase
+from django.test import SimpleTestCase
+import math
+import random
 
-# Create your tests here.
+from reports.visuals import HistogramGraph, get_nice_bin_size, HISTOGRAM_MAX_BINS, HISTOGRAM_MAX_FILL
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def eval_expression(expr, value):
+    """
+    Evaluates aggregation expression (``$floor``, ``$add``, ``$divide`` on answer) for an answer value
+    the way mongo does, so that bin ids of histogram pipeline can be computed without database.
+    """
+    if isinstance(expr, dict):
+        operator, args = expr.items()[0]
+        if operator == '$floor':
+            return math.floor(eval_expression(args, value))
+        elif operator == '$add':
+            return sum(eval_expression(arg, value) for arg in args)
+        elif operator == '$divide':
+            return eval_expression(args[0], value) / float(eval_expression(args[1], value))
+        raise ValueError("Unsupported operator '{}'.".format(operator))
+    elif expr == '$list_answers.answer':
+        return value
+    return expr
+
+def reference_histogram(values, edges):
+    """
+    Returns count per bin for bins defined by ``edges`` (same semantics as ``numpy.histogram``).
+    """
+    if numpy is not None:
+        return [int(count) for count in numpy.histogram(values, bins=edges)[0]]
+
+    counts = [0] * (len(edges) - 1)
+    for value in values:
+        for idx in range(len(counts)):
+            last = idx == len(counts) - 1
+            if edges[idx] <= value and (value < edges[idx+1] or (last and value == edges[idx+1])):
+                counts[idx] += 1
+                break
+    return counts
+
+
+class GetNiceBinSizeTest(SimpleTestCase):
+
+    def test_rounds_up_to_nice_size(self):
+        self.assertEqual(get_nice_bin_size(1), 1)
+        self.assertEqual(get_nice_bin_size(1.2), 2)
+        self.assertEqual(get_nice_bin_size(3), 5)
+        self.assertEqual(get_nice_bin_size(7), 10)
+        self.assertEqual(get_nice_bin_size(23), 50)
+        self.assertAlmostEqual(get_nice_bin_size(0.03), 0.05)
+        self.assertAlmostEqual(get_nice_bin_size(0.1), 0.1)
+        self.assertAlmostEqual(get_nice_bin_size(0.15), 0.2)
+
+    def test_integer(self):
+        self.assertEqual(get_nice_bin_size(0.4, integer=True), 1)
+        self.assertEqual(get_nice_bin_size(23, integer=True), 50)
+        self.assertIsInstance(get_nice_bin_size(3, integer=True), int)
+
+    def test_empty_range(self):
+        self.assertEqual(get_nice_bin_size(0), 1)
+
+
+class HistogramAutoBinSizeTest(SimpleTestCase):
+
+    def test_sturges(self):
+        graph = HistogramGraph(question_id=1)
+        # ceil(log2(1000)) + 1 = 11 bins over range 110
+        self.assertEqual(graph.get_auto_bin_size(1000, 0, 110), 10)
+        # 1 answer: 1 bin
+        self.assertEqual(graph.get_auto_bin_size(1, 4, 4), 1)
+
+    def test_sturges_capped(self):
+        graph = HistogramGraph(question_id=1)
+        self.assertEqual(graph.get_auto_bin_size(2**200, 0, HISTOGRAM_MAX_BINS), 1)
+
+    def test_bins_defined(self):
+        graph = HistogramGraph(question_id=1, bins=4)
+        self.assertAlmostEqual(graph.get_auto_bin_size(1000, 0, 1), 0.5)
+        self.assertEqual(graph.get_auto_bin_size(1000, 1, 5, integer=True), 1)
+
+
+class HistogramParseResultTest(SimpleTestCase):
+
+    def test_empty_bins_filled(self):
+        graph = HistogramGraph(question_id=1, bin_size=0.1)
+        data = graph.parse_result([{"_id": 3, "count": 1}, {"_id": 0, "count": 2}])
+
+        self.assertEqual(data["bin_size"], 0.1)
+        self.assertEqual([b["min"] for b in data["bins"]], [0.0, 0.1, 0.2, 0.3])
+        self.assertEqual([b["max"] for b in data["bins"]], [0.1, 0.2, 0.3, 0.4])
+        self.assertEqual([b["count"] for b in data["bins"]], [2, 0, 0, 1])
+
+    def test_wide_span_not_filled(self):
+        graph = HistogramGraph(question_id=1, bin_size=1)
+        data = graph.parse_result([{"_id": 0, "count": 2}, {"_id": HISTOGRAM_MAX_FILL, "count": 1}])
+
+        self.assertEqual([b["count"] for b in data["bins"]], [2, 1])
+
+    def test_no_data(self):
+        graph = HistogramGraph(question_id=1, bin_size=1)
+        self.assertEqual(graph.parse_result([]), {"bin_size": 1, "bins": []})
+
+
+class HistogramBinningTest(SimpleTestCase):
+    """
+    Bins computed by histogram pipeline (``$group`` expression evaluated in python) compared with
+    reference histogram (``numpy.histogram`` if available) on a synthetic dataset.
+    """
+    EDGE_VALUES = [0.3, 0.6, 0.7, 1.4, 2.1, -0.3, -0.7, 0, 5, 10]
+
+    def get_histogram(self, graph, values, bin_size):
+        pipeline = graph.get_pipeline('q', {}, bin_size=bin_size)
+        expr = [stage for stage in pipeline if "$group" in stage][0]["$group"]["_id"]
+
+        lookup_counts = {}
+        for value in values:
+            idx = eval_expression(expr, value)
+            lookup_counts[idx] = lookup_counts.get(idx, 0) + 1
+
+        return graph.parse_result([{"_id": idx, "count": count} for idx, count in lookup_counts.iteritems()], bin_size=bin_size)
+
+    def assert_matches_reference(self, values, bin_size):
+        graph = HistogramGraph(question_id=1, bin_size=bin_size)
+        data = self.get_histogram(graph, values, bin_size)
+
+        edges = [b["min"] for b in data["bins"]] + [data["bins"][-1]["max"]]
+        self.assertEqual([b["count"] for b in data["bins"]], reference_histogram(values, edges))
+        self.assertEqual(sum(b["count"] for b in data["bins"]), len(values))
+
+    def test_edge_values(self):
+        graph = HistogramGraph(question_id=1, bin_size=0.1)
+        data = self.get_histogram(graph, [0.3], 0.1)
+        self.assertEqual(data["bins"], [{"min": 0.3, "max": 0.4, "count": 1}])
+
+        graph = HistogramGraph(question_id=1, bin_size=0.2)
+        data = self.get_histogram(graph, [1.4], 0.2)
+        self.assertEqual(data["bins"], [{"min": 1.4, "max": 1.6, "count": 1}])
+
+    def test_synthetic_decimal(self):
+        rnd = random.Random(0)
+        values = [round(rnd.gauss(2, 1.5), 1) for _ in range(5000)] + self.EDGE_VALUES
+        for bin_size in [0.1, 0.2, 0.5, 2.5]:
+            self.assert_matches_reference(values, bin_size)
+
+    def test_synthetic_integer(self):
+        rnd = random.Random(1)
+        values = [rnd.randint(-50, 500) for _ in range(5000)] + [int(v) for v in self.EDGE_VALUES]
+        for bin_size in [1, 2, 5, 50]:
+            self.assert_matches_reference(values, bin_size)
+
+    def test_auto_bin_size(self):
+        rnd = random.Random(2)
+        values = [round(rnd.uniform(0, 1), 2) for _ in range(2000)] + [0.3, 0.7]
+        graph = HistogramGraph(question_id=1)
+        bin_size = graph.get_auto_bin_size(len(values), min(values), max(values))
+
+        self.assertAlmostEqual(bin_size, 0.1)
+        self.assert_matches_reference(values, bin_size)
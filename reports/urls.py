@@ -9,4 +9,5 @@ urlpatterns = [
 
     # Custom API
     url(r'^api/graph_data/(?P<graph_uid>.*)/$', views.api_graph_data, name='reports_api_graph_data'),
+    url(r'^api/dashboard_data/$', views.api_dashboard_data, name='reports_api_dashboard_data'),
 ]
\ No newline at end of file
@@ -6,6 +6,7 @@ from django.utils import timezone
 from datetime import timedelta
 
 from reports.models import GraphDiagram
+from reports import data_cache
 from accounts.decorators import registered_user_only, organization_console
 from utilities.api_utils import ApiResponse
 
@@ -43,6 +44,8 @@ def api_graph_data(request, org, graph_uid):
 
     **TYPE**: GET
 
+    Data is served from cache till a new response is ingested (refer :func:`reports.data_cache.get_graph_data`).
+
     TODO:
         - Make this API private for single user as well as for organization.
 
@@ -63,11 +66,68 @@ def api_graph_data(request, org, graph_uid):
 
         graph_diag = GraphDiagram.objects.get(**filters)
 
-        data = graph_diag.get_data(data_filters=data_filters, use_string='true')
+        data = data_cache.get_graph_data(graph_diag, data_filters=data_filters, use_string='true')
 
         return ApiResponse(status=ApiResponse.ST_SUCCESS, message='ok', data=data).gen_http_response()
     except GraphDiagram.DoesNotExist:
         return ApiResponse(status=ApiResponse.ST_FORBIDDEN, message='Invalid graph reference.').gen_http_response()
 
+@registered_user_only
+@organization_console()
+def api_dashboard_data(request, org):
+    """
+    Custom API to return data of all graphs pinned to dashboard of a context in a single request.
+    Graphs sharing same filters are computed with a single aggregation
+    (refer :func:`reports.models.GraphDiagram.get_data_bulk`).
+
+    **TYPE**: GET
+
+    **Parameters**: ``context`` (Default ``bsp_feedback``) along with filters as in :func:`api_graph_data`.
+
+    **Response data**::
+
+        [
+            {
+                "graph_uid": "<graph_uid>",
+                "graph_type": "<graph_type>",
+                "title": "<title>",
+                "data": <graph data>,
+                "error": "<message if data of this graph is not available>"
+            },
+            ...
+        ]
 
+    **Authors**: Gagandeep Singh
+    """
+    context = request.GET.get('context', GraphDiagram.CT_BSP_FEEDBACK)
+    if context not in dict(GraphDiagram.CH_CONTEXT):
+        return ApiResponse(status=ApiResponse.ST_BAD_REQUEST, message="Invalid context '{}'.".format(context)).gen_http_response()
 
+    try:
+        data_filters = parse_graph_filters(request.GET)
+    except KeyError:
+        return ApiResponse(status=ApiResponse.ST_BAD_REQUEST, message='Some parameters missing.').gen_http_response()
+
+    filters = {
+        "context": context,
+        "pin_to_dashboard": True
+    }
+    if org:
+        filters['organization_id'] = org.id
+
+    list_graph_diag = list(GraphDiagram.objects.filter(**filters).order_by('created_on'))
+    lookup_data = data_cache.get_graphs_data(list_graph_diag, data_filters=data_filters, use_string='true')
+
+    data = []
+    for graph_diag in list_graph_diag:
+        graph_uid = str(graph_diag.graph_uid)
+        graph_data = lookup_data.get(graph_uid, None)
+        data.append({
+            "graph_uid": graph_uid,
+            "graph_type": graph_diag.graph_type,
+            "title": graph_diag.title,
+            "data": graph_data,
+            "error": None if graph_data is not None else "Data is not available for '{}' graph.".format(graph_diag.graph_type)
+        })
+
+    return ApiResponse(status=ApiResponse.ST_SUCCESS, message='ok', data=data).gen_http_response()
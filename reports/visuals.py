@@ -2,6 +2,11 @@
 # Content in this document can not be copied and/or distributed without the express
 # permission of Gagandeep Singh.
 from jsonobject import *
+from jsonobject.exceptions import BadValueError
+from datetime import datetime
+import json
+import math
+
 from reports.exceptions import InvalidGraphDefinition
 
 from form_builder.models import FormQuestion
@@ -25,7 +30,7 @@ class GraphCharts:
     """
     # --- 1-D Graphs ---
     D1_STATS_NUM = '1d_stats_number'
-    # D1_HISTOGRAM = '1d_histogram'
+    D1_HISTOGRAM = '1d_histogram'
     D1_STATS_DT = '1d_stats_datetime'
 
     D1_PIE = '1d_pie'
@@ -51,7 +56,7 @@ class GraphCharts:
     # ----- Choices -----
     choices_all = (
         (D1_STATS_NUM, D1_STATS_NUM),
-        # (D1_HISTOGRAM, D1_HISTOGRAM),
+        (D1_HISTOGRAM, D1_HISTOGRAM),
         (D1_STATS_DT, D1_STATS_DT),
         (D1_PIE, D1_PIE),
         (D1_DONUT, D1_DONUT),
@@ -68,11 +73,11 @@ class GraphCharts:
     formfield_choice_mapping = {
         "NumberFormField":[
             { "id": D1_STATS_NUM, "title": "Statistics" },
-            # { "id": D1_HISTOGRAM, "title": "Histogram" }
+            { "id": D1_HISTOGRAM, "title": "Histogram" }
         ],
         "DecimalFormField" :[
             { "id": D1_STATS_NUM, "title": "Statistics" },
-            # { "id": D1_HISTOGRAM, "title": "Histogram" }
+            { "id": D1_HISTOGRAM, "title": "Histogram" }
         ],
         "DateFormField": [
             { "id": D1_STATS_DT, "title": "Statistics" },
@@ -101,6 +106,7 @@ class GraphCharts:
         ],
         "RatingFormField":[
             { "id": D1_RATING, "title": "Rating" },
+            { "id": D1_HISTOGRAM, "title": "Histogram" },
         ]
     }
 
@@ -145,6 +151,181 @@ class GraphAggregations:
         (MOV_AVG, 'Moving Average')
     )
 
+# ----- Aggregation pipeline -----
+ANSWER_PREFIX = 'list_answers.'
+
+def strip_answer_prefix(filters):
+    """
+    Method to convert answer-level filters (``list_answers.<key>``) into filters on answer sub-document
+    (``<key>``) to be used in ``$elemMatch``. ``$or``/``$and`` clauses are converted recursively.
+
+    **Authors**: Gagandeep Singh
+    """
+    result = {}
+    for key, value in filters.iteritems():
+        if key in ['$or', '$and']:
+            result[key] = [strip_answer_prefix(clause) for clause in value]
+        else:
+            result[key[len(ANSWER_PREFIX):]] = value
+    return result
+
+def is_answer_filter(key, value):
+    """
+    Returns True if a filter applies on answers (``list_answers.*``) rather than the response document.
+
+    **Authors**: Gagandeep Singh
+    """
+    if key in ['$or', '$and']:
+        return all(all(k.startswith(ANSWER_PREFIX) for k in clause.keys()) for clause in value)
+    return key.startswith(ANSWER_PREFIX)
+
+def build_answer_pipeline(match_filters, ques_label, answer_filters=None, stages=None):
+    """
+    Method to build aggregation pipeline on answers of a question across responses.
+
+    **Pipeline**:
+
+        1. ``$match`` on document-level filters (organization_id, form_id, bsp_id, response_date etc.)
+           along with ``$elemMatch`` on ``list_answers`` for the question & answer filters. This stage
+           can use indexes and only responses having a matching answer are passed on.
+        2. ``$unwind`` of ``list_answers``.
+        3. ``$match`` again on answer filters to drop other answers of those responses.
+        4. ``stages`` (e.g. ``$group``).
+
+    :param match_filters: JSON dict of filters; keys may be document-level or ``list_answers.*``
+    :param ques_label: Label of the question
+    :param answer_filters: (Optional) Additional filters on answer using ``list_answers.*`` keys
+    :param stages: (Optional) List of stages to be appended
+    :return: List of pipeline stages
+
+    **Authors**: Gagandeep Singh
+    """
+    if not isinstance(match_filters, dict):
+        raise ValueError("'match_filters' must be a dictionary.")
+
+    doc_filters = {}
+    ans_filters = { ANSWER_PREFIX + "question_label": ques_label }
+    ans_filters.update(answer_filters or {})
+    for key, value in match_filters.iteritems():
+        if is_answer_filter(key, value):
+            ans_filters[key] = value
+        else:
+            doc_filters[key] = value
+
+    doc_filters["list_answers"] = { "$elemMatch": strip_answer_prefix(ans_filters) }
+    pipeline = [
+        { "$match": doc_filters },
+        {
+            "$unwind":{
+                "path" : "$list_answers",
+                "preserveNullAndEmptyArrays" : False
+            }
+        },
+        { "$match": ans_filters }
+    ]
+
+    return pipeline + list(stages or [])
+
+def build_facet_pipeline(dict_pipelines):
+    """
+    Method to combine pipelines built by :func:`build_answer_pipeline` having same document-level
+    filters into a single ``$facet`` pipeline so that matched responses are read once for all of them.
+
+    **Pipeline**:
+
+        1. ``$match`` on common document-level filters along with question labels of all pipelines.
+        2. ``$facet`` with each pipeline (without common filters) against its key.
+
+    .. note::
+        Output of ``$facet`` is a single document and must be within 16MB. Only combine pipelines
+        producing small results (such as grouped aggregates).
+
+    :param dict_pipelines: JSON dict of format ``{ "<key>": <pipeline>, ... }``; keys must not contain ``.`` or start with ``$``
+    :return: List of pipeline stages; result is a single document of format ``{ "<key>": [<result docs>], ... }``
+
+    **Authors**: Gagandeep Singh
+    """
+    if not len(dict_pipelines):
+        raise ValueError("'dict_pipelines' must have atleast one pipeline.")
+
+    common_filters = None
+    list_labels = []
+    facets = {}
+    for key, pipeline in dict_pipelines.iteritems():
+        doc_filters = dict(pipeline[0]["$match"])
+        elem_match = doc_filters.pop("list_answers")
+        if common_filters is None:
+            common_filters = doc_filters
+        elif doc_filters != common_filters:
+            raise ValueError("Pipeline '{}' has different document filters.".format(key))
+
+        label = elem_match["$elemMatch"]["question_label"]
+        if label not in list_labels:
+            list_labels.append(label)
+        facets[key] = [{ "$match": { "list_answers": elem_match } }] + pipeline[1:]
+
+    common_filters[ANSWER_PREFIX + "question_label"] = { "$in": list_labels }
+    return [
+        { "$match": common_filters },
+        { "$facet": facets }
+    ]
+
+# ----- Rollups -----
+# Document-level filters that can be answered from rollups (refer :class:`reports.models.AnswerRollup`)
+ROLLUP_FILTER_KEYS = ('organization_id', 'form_id', 'bsp_id')
+
+def encode_rollup_value(value):
+    """
+    Returns key of an answer value in ``values`` map of :class:`reports.models.AnswerRollup`. Key is
+    json of the value (so that type is preserved) with ``.`` replaced since it is not allowed in mongo keys.
+
+    **Authors**: Gagandeep Singh
+    """
+    return json.dumps(value).replace('.', u'\uff0e')
+
+def decode_rollup_value(key):
+    """
+    Returns answer value of a key made by :func:`encode_rollup_value`.
+
+    **Authors**: Gagandeep Singh
+    """
+    return json.loads(key.replace(u'\uff0e', '.'))
+
+def is_midnight(dt):
+    return isinstance(dt, datetime) and dt.hour == 0 and dt.minute == 0 and dt.second == 0 and dt.microsecond == 0
+
+def to_rollup_filters(match_filters):
+    """
+    Method to convert filters on responses to filters on :class:`reports.models.AnswerRollup`.
+    Only equality filters on :data:`ROLLUP_FILTER_KEYS` and ``response_date`` range with day aligned
+    bounds (``$gte``, ``$lt``, ``$lte``) can be converted. Since rollups are per day, ``$lte`` on
+    midnight is treated as exclusive (as sent by dashboards for end date + 1 day).
+
+    :param match_filters: JSON dict of filters on responses
+    :return: JSON dict of filters on rollups or None if filters cannot be answered from rollups
+
+    **Authors**: Gagandeep Singh
+    """
+    rollup_filters = {}
+    for key, value in match_filters.iteritems():
+        if key in ROLLUP_FILTER_KEYS:
+            if isinstance(value, (dict, list)):
+                return None
+            rollup_filters[key] = value
+        elif key == 'response_date':
+            if not isinstance(value, dict):
+                return None
+            day_filter = {}
+            for operator, dt in value.iteritems():
+                if operator not in ['$gte', '$lt', '$lte'] or not is_midnight(dt):
+                    return None
+                day_filter['$gte' if operator == '$gte' else '$lt'] = dt
+            rollup_filters['day'] = day_filter
+        else:
+            return None
+
+    return rollup_filters
+
 # ----- Graph Definition classes -----
 class BaseGraphChart(JsonObject):
     """
@@ -189,6 +370,63 @@ class BaseGraphChart(JsonObject):
         """
         raise NotImplementedError("'get_data()' is not implement for this inherited graph class.")
 
+    def get_pipeline(self, ques_label, match_filters, **kwargs):
+        """
+        Method to get aggregation pipeline of this graph (refer :func:`reports.visuals.build_answer_pipeline`).
+        Override this for graphs computed with a single aggregation on answers of a question.
+
+        :param ques_label: Label of the question
+        :param match_filters: JSON dict for match filter
+        :return: List of pipeline stages
+        """
+        raise NotImplementedError("'get_pipeline()' is not implement for this inherited graph class.")
+
+    def parse_result(self, list_docs, **kwargs):
+        """
+        Method to convert result documents of pipeline (refer :func:`get_pipeline`) to graph data.
+
+        :param list_docs: List of result documents
+        :return: JSON data
+        """
+        return list_docs
+
+    def get_rollup_pipeline(self, ques_label, rollup_filters, **kwargs):
+        """
+        Method to get aggregation pipeline of this graph on :class:`reports.models.AnswerRollup`.
+        Override this for graphs that can be computed from rollups.
+
+        :param ques_label: Label of the question
+        :param rollup_filters: JSON dict of filters on rollups (refer :func:`reports.visuals.to_rollup_filters`)
+        :return: List of pipeline stages
+        """
+        raise NotImplementedError("'get_rollup_pipeline()' is not implement for this inherited graph class.")
+
+    def parse_rollup_result(self, list_docs, **kwargs):
+        """
+        Method to convert result documents of rollup pipeline (refer :func:`get_rollup_pipeline`) to graph data.
+        Data must be same as returned by :func:`parse_result`.
+
+        :param list_docs: List of result documents
+        :return: JSON data
+        """
+        return self.parse_result(list_docs, **kwargs)
+
+    def get_rollup_data(self, rollupModel, ques_label, match_filters, **kwargs):
+        """
+        Method to get data of this graph from rollups.
+
+        :param rollupModel: Rollup model class (:class:`reports.models.AnswerRollup`)
+        :param ques_label: Label of the question
+        :param match_filters: JSON dict for match filter on responses
+        :return: JSON data; raises NotImplementedError if graph or filters are not supported by rollups.
+        """
+        rollup_filters = to_rollup_filters(match_filters)
+        if rollup_filters is None:
+            raise NotImplementedError("Filters are not supported by rollups.")
+
+        result_aggr = rollupModel._get_collection().aggregate(self.get_rollup_pipeline(ques_label, rollup_filters, **kwargs))
+        return self.parse_rollup_result(list(result_aggr), **kwargs)
+
 
 # --- 1D Graph Definitions ---
 class StatsNumberGraph(BaseGraphChart):
@@ -211,6 +449,7 @@ class StatsNumberGraph(BaseGraphChart):
         Method to get data for this graph on provided ``entityModel``.
         :param entityModel: Class of actual model from which data has to be extracted.
         :param match_filters: JSON dict for match filter
+        :param rollup_model: (Optional) Rollup model; if provided, data is computed from rollups when filters allow.
         :return: JSON data:
 
         **Format**:
@@ -234,37 +473,20 @@ class StatsNumberGraph(BaseGraphChart):
         question  = FormQuestion.objects.get(id=self.question_id)
         ques_label = question.label
 
-        final_filters = {
-            "list_answers.question_label": ques_label,
-            "list_answers.answer": { "$type": "number" }
-        }
-        final_filters.update(match_filters)
+        rollup_model = kwargs.pop('rollup_model', None)
+        if rollup_model is not None:
+            try:
+                return self.get_rollup_data(rollup_model, ques_label, match_filters, **kwargs)
+            except NotImplementedError:
+                pass
 
-        result_aggr = entityModel._get_collection().aggregate([
-            {
-                "$unwind":{
-                    "path" : "$list_answers",
-                    "preserveNullAndEmptyArrays" : False
-                }
-            },
-            {
-                "$match": final_filters
-            },
-            {
-                "$group": {
-                    "_id": None,
-                    "count": { "$sum": 1},
-                    "min": { "$min": "$list_answers.answer"},
-                    "max": { "$max": "$list_answers.answer"},
-                    "sum": { "$sum": "$list_answers.answer"},
-                    "avg": { "$avg": "$list_answers.answer"},
-                    "std": { "$stdDevSamp": "$list_answers.answer" }
-                }
-            }
-        ])
+        result_aggr = entityModel._get_collection().aggregate(self.get_pipeline(ques_label, match_filters, **kwargs))
+
+        return self.parse_result(list(result_aggr), **kwargs)
 
+    def parse_result(self, list_docs, **kwargs):
         try:
-            data = list(result_aggr)[0]
+            data = list_docs[0]
             del data["_id"]
 
             return data
@@ -272,15 +494,254 @@ class StatsNumberGraph(BaseGraphChart):
             # No data
             return {}
 
+    def get_rollup_pipeline(self, ques_label, rollup_filters, **kwargs):
+        final_filters = dict(rollup_filters)
+        final_filters.update({
+            "question_label": ques_label,
+            "num_count": { "$gt": 0 }
+        })
+
+        return [
+            { "$match": final_filters },
+            {
+                "$group": {
+                    "_id": None,
+                    "count": { "$sum": "$num_count"},
+                    "min": { "$min": "$num_min"},
+                    "max": { "$max": "$num_max"},
+                    "sum": { "$sum": "$num_sum"},
+                    "sum_sq": { "$sum": "$num_sum_sq"},
+                }
+            },
+            {
+                "$project": {
+                    "count": 1,
+                    "min": 1,
+                    "max": 1,
+                    "sum": 1,
+                    "avg": { "$divide": ["$sum", "$count"] },
+                    # Sample standard deviation: sqrt((sum_sq - sum^2/n) / (n-1))
+                    "std": {
+                        "$cond": [
+                            { "$gt": ["$count", 1] },
+                            { "$sqrt": { "$max": [0, { "$divide": [
+                                { "$subtract": ["$sum_sq", { "$divide": [{ "$multiply": ["$sum", "$sum"] }, "$count"] }] },
+                                { "$subtract": ["$count", 1] }
+                            ]}]}},
+                            None
+                        ]
+                    }
+                }
+            }
+        ]
+
+    def get_pipeline(self, ques_label, match_filters, **kwargs):
+        return build_answer_pipeline(
+            match_filters,
+            ques_label,
+            answer_filters = { "list_answers.answer": { "$type": "number" } },
+            stages = [
+                {
+                    "$group": {
+                        "_id": None,
+                        "count": { "$sum": 1},
+                        "min": { "$min": "$list_answers.answer"},
+                        "max": { "$max": "$list_answers.answer"},
+                        "sum": { "$sum": "$list_answers.answer"},
+                        "avg": { "$avg": "$list_answers.answer"},
+                        "std": { "$stdDevSamp": "$list_answers.answer" }
+                    }
+                }
+            ]
+        )
+
+
+# Maximum number of bins of a histogram with automatic bin size
+HISTOGRAM_MAX_BINS = 100
+
+# Maximum span (in bins) upto which empty bins are filled in histogram data
+HISTOGRAM_MAX_FILL = 1000
+
+# Added to ``answer / bin_size`` before flooring so that answers on a bin edge (e.g. 0.3 with bin size 0.1,
+# whose quotient is 2.9999999999999996 in floating point) fall in the bin starting at that edge
+HISTOGRAM_EDGE_EPSILON = 1e-9
+
+def validate_bin_size(bin_size):
+    if bin_size is not None and bin_size <= 0:
+        raise BadValueError("Bin size must be greater than 0.")
+
+def validate_bins(bins):
+    if bins is not None and not (1 <= bins <= HISTOGRAM_MAX_BINS):
+        raise BadValueError("Number of bins must be between 1 and {}.".format(HISTOGRAM_MAX_BINS))
+
+def get_nice_bin_size(width, integer=False):
+    """
+    Returns smallest 'nice' bin size (1, 2 or 5 times a power of 10) which is not less than ``width``.
+
+    :param width: Minimum bin size
+    :param integer: If True, bin size is atleast 1 and an integer
+    :return: Bin size
+
+    **Authors**: Gagandeep Singh
+    """
+    if width <= 0:
+        return 1
+    magnitude = 10 ** math.floor(math.log10(width))
+    for step in [1, 2, 5, 10]:
+        bin_size = step * magnitude
+        if bin_size >= width * (1 - 1e-9):
+            break
+
+    if integer:
+        return max(1, int(math.ceil(bin_size)))
+    return bin_size
+
 
 class HistogramGraph(BaseGraphChart):
     """
-    Class to define histogram on a numeric/decimal field.
+    Class to define histogram on a numeric/decimal/rating field. Binning is done by the database and
+    only count per bin is fetched.
+
+    **Points**:
+
+        - Bins are of equal width ``bin_size`` and aligned to multiples of it i.e. bin ``i`` is ``[i*bin_size, (i+1)*bin_size)``.
+        - If ``bin_size`` is not defined, it is determined automatically from minimum & maximum answer:
+          ``(max - min) / bins`` rounded up to a 'nice' size (refer :func:`get_nice_bin_size`); integer
+          for number & rating fields. If ``bins`` is not defined, Sturges' rule is used.
+        - Empty bins between first & last non-empty bin are included if they span atmost :data:`HISTOGRAM_MAX_FILL` bins.
 
     **Authors**: Gagandeep Singh
     """
     question_id = IntegerProperty(required=True)    # Instance ID of :class:`form_builder.models.FormQuestion`
-    bin_size    = IntegerProperty(required=True)    # Binning size of the histogram
+    bin_size    = FloatProperty(validators=[validate_bin_size])     # (Optional) Binning size of the histogram; automatic if not set
+    bins        = IntegerProperty(validators=[validate_bins])       # (Optional) Number of bins for automatic binning
+
+    # Field classes whose answers are integers
+    INTEGER_FIELD_CLASSES = ['NumberFormField', 'RatingFormField']
+
+    def get_data(self, entityModel, match_filters, **kwargs):
+        """
+        Method to get data for this graph on provided ``entityModel``.
+
+        :param entityModel: Class of actual model from which data has to be extracted.
+        :param match_filters: JSON dict for match filter
+        :return: JSON data:
+
+        **Format**:
+
+            .. code-block:: json
+
+                {
+                    "bin_size": 10,
+                    "bins": [
+                        { "min": 0, "max": 10, "count": 46 },
+                        { "min": 10, "max": 20, "count": 0 },
+                        ...
+                    ]
+                }
+
+        **Authors**: Gagandeep Singh
+        """
+        if not isinstance(match_filters, dict):
+            raise ValueError("'match_filters' must be a dictionary.")
+
+        question  = FormQuestion.objects.get(id=self.question_id)
+        ques_label = question.label
+        kwargs.pop('rollup_model', None)
+
+        collection = entityModel._get_collection()
+        bin_size = self.bin_size
+        if bin_size is None:
+            # Automatic bin size from range of answers
+            try:
+                stats = list(collection.aggregate(build_answer_pipeline(
+                    match_filters,
+                    ques_label,
+                    answer_filters = { "list_answers.answer": { "$type": "number" } },
+                    stages = [
+                        {
+                            "$group": {
+                                "_id": None,
+                                "count": { "$sum": 1},
+                                "min": { "$min": "$list_answers.answer"},
+                                "max": { "$max": "$list_answers.answer"},
+                            }
+                        }
+                    ]
+                )))[0]
+            except IndexError:
+                # No data
+                return self.parse_result([], bin_size=None)
+
+            bin_size = self.get_auto_bin_size(
+                stats["count"],
+                stats["min"],
+                stats["max"],
+                integer = question.field_class in HistogramGraph.INTEGER_FIELD_CLASSES
+            )
+
+        kwargs['bin_size'] = bin_size
+        result_aggr = collection.aggregate(self.get_pipeline(ques_label, match_filters, **kwargs))
+
+        return self.parse_result(list(result_aggr), **kwargs)
+
+    def get_auto_bin_size(self, count, min_value, max_value, integer=False):
+        """
+        Method to determine bin size from number & range of answers. Number of bins is ``bins`` or,
+        if not defined, as per Sturges' rule (``ceil(log2(count)) + 1``) capped at :data:`HISTOGRAM_MAX_BINS`.
+
+        :param count: Number of answers
+        :param min_value: Minimum answer
+        :param max_value: Maximum answer
+        :param integer: If True, bin size is an integer (number & rating fields)
+        :return: Bin size
+
+        **Authors**: Gagandeep Singh
+        """
+        bins = self.bins or min(int(math.ceil(math.log(max(count, 1), 2))) + 1, HISTOGRAM_MAX_BINS)
+        return get_nice_bin_size((max_value - min_value) / float(bins), integer=integer)
+
+    def get_pipeline(self, ques_label, match_filters, **kwargs):
+        bin_size = kwargs.get('bin_size', None) or self.bin_size
+        if bin_size is None:
+            # Automatic bin size needs range of answers first
+            raise NotImplementedError("Pipeline of histogram with automatic bin size is computed in 'get_data()'.")
+
+        return build_answer_pipeline(
+            match_filters,
+            ques_label,
+            answer_filters = { "list_answers.answer": { "$type": "number" } },
+            stages = [
+                {
+                    "$group": {
+                        "_id": { "$floor": { "$add": [{ "$divide": ["$list_answers.answer", bin_size] }, HISTOGRAM_EDGE_EPSILON] } },
+                        "count": { "$sum": 1},
+                    }
+                },
+                { "$sort": { "_id": 1 } }
+            ]
+        )
+
+    def parse_result(self, list_docs, **kwargs):
+        bin_size = kwargs.get('bin_size', None) or self.bin_size
+        lookup_counts = { int(doc["_id"]): doc["count"] for doc in list_docs }
+
+        list_idx = sorted(lookup_counts.keys())
+        if len(list_idx) and list_idx[-1] - list_idx[0] < HISTOGRAM_MAX_FILL:
+            list_idx = range(list_idx[0], list_idx[-1] + 1)
+
+        list_bins = []
+        for idx in list_idx:
+            list_bins.append({
+                "min": round(idx * bin_size, 10),
+                "max": round((idx + 1) * bin_size, 10),
+                "count": lookup_counts.get(idx, 0)
+            })
+
+        return {
+            "bin_size": bin_size,
+            "bins": list_bins
+        }
 
 
 class StatsDatetimeGraph(BaseGraphChart):
@@ -318,44 +779,20 @@ class StatsDatetimeGraph(BaseGraphChart):
         question  = FormQuestion.objects.get(id=self.question_id)
         ques_label = question.label
 
-        final_filters = {
-            "list_answers.question_label": ques_label,
-        }
-
-        use_string = kwargs.get('use_string', None)
-        if use_string:
-            final_filters["$or"] = [
-                { "list_answers.answer": { "$type": "date" } },
-                { "list_answers.answer": { "$type": "string" } },
-            ]
-        else:
-            final_filters["list_answers.answer"] = { "$type": "date" }
+        rollup_model = kwargs.pop('rollup_model', None)
+        if rollup_model is not None:
+            try:
+                return self.get_rollup_data(rollup_model, ques_label, match_filters, **kwargs)
+            except NotImplementedError:
+                pass
 
+        result_aggr = entityModel._get_collection().aggregate(self.get_pipeline(ques_label, match_filters, **kwargs))
 
-        final_filters.update(match_filters)
-
-        result_aggr = entityModel._get_collection().aggregate([
-            {
-                "$unwind":{
-                    "path" : "$list_answers",
-                    "preserveNullAndEmptyArrays" : False
-                }
-            },
-            {
-                "$match": final_filters
-            },
-            {
-                "$group": {
-                    "_id": None,
-                    "count": { "$sum": 1},
-                    "min": { "$min": "$list_answers.answer"},
-                    "max": { "$max": "$list_answers.answer"},
-                }
-            }
-        ])
+        return self.parse_result(list(result_aggr), **kwargs)
 
+    def parse_result(self, list_docs, **kwargs):
         try:
-            data = list(result_aggr)[0]
+            data = list_docs[0]
             del data["_id"]
 
             return data
@@ -363,6 +800,34 @@ class StatsDatetimeGraph(BaseGraphChart):
             # No data
             return {}
 
+    def get_pipeline(self, ques_label, match_filters, **kwargs):
+        use_string = kwargs.get('use_string', None)
+        if use_string:
+            answer_filters = {
+                "$or": [
+                    { "list_answers.answer": { "$type": "date" } },
+                    { "list_answers.answer": { "$type": "string" } },
+                ]
+            }
+        else:
+            answer_filters = { "list_answers.answer": { "$type": "date" } }
+
+        return build_answer_pipeline(
+            match_filters,
+            ques_label,
+            answer_filters = answer_filters,
+            stages = [
+                {
+                    "$group": {
+                        "_id": None,
+                        "count": { "$sum": 1},
+                        "min": { "$min": "$list_answers.answer"},
+                        "max": { "$max": "$list_answers.answer"},
+                    }
+                }
+            ]
+        )
+
 
 class PieGraph(BaseGraphChart):
     """
@@ -401,13 +866,66 @@ class PieGraph(BaseGraphChart):
         question  = FormQuestion.objects.get(id=self.question_id)
         ques_label = question.label
 
-        final_filters = {
-            "list_answers.question_label": ques_label,
-            # "list_answers.answer": { "$type": "string" },
-            "list_answers.is_other": False
-        }
-        final_filters.update(match_filters)
+        rollup_model = kwargs.pop('rollup_model', None)
+        if rollup_model is not None:
+            try:
+                return self.get_rollup_data(rollup_model, ques_label, match_filters, **kwargs)
+            except NotImplementedError:
+                pass
+
+        result_aggr = entityModel._get_collection().aggregate(self.get_pipeline(ques_label, match_filters, **kwargs))
+
+        return self.parse_result(list(result_aggr), **kwargs)
+
+    def get_rollup_data(self, rollupModel, ques_label, match_filters, **kwargs):
+        """
+        Method to get data of this graph from rollups. Rollups only count short values
+        (refer :func:`reports.rollups.is_countable`); if any answer in the scope was not counted,
+        NotImplementedError is raised so that data is computed from responses instead.
+
+        **Authors**: Gagandeep Singh
+        """
+        rollup_filters = to_rollup_filters(match_filters)
+        if rollup_filters is None:
+            raise NotImplementedError("Filters are not supported by rollups.")
+
+        qry_skipped = dict(rollup_filters)
+        qry_skipped.update({
+            "question_label": ques_label,
+            "values_skipped": { "$gt": 0 }
+        })
+        if rollupModel._get_collection().find_one(qry_skipped, { "_id": True }) is not None:
+            raise NotImplementedError("Some answers are not counted by rollups.")
+
+        return super(PieGraph, self).get_rollup_data(rollupModel, ques_label, match_filters, **kwargs)
+
+    def get_rollup_pipeline(self, ques_label, rollup_filters, **kwargs):
+        if self.aggregation != GraphAggregations.COUNT:
+            # Rollups only hold count of values
+            raise NotImplementedError("Aggregation '{}' is not supported by rollups.".format(self.aggregation))
 
+        final_filters = dict(rollup_filters)
+        final_filters["question_label"] = ques_label
+
+        return [
+            { "$match": final_filters },
+            { "$project": { "values": { "$objectToArray": "$values" } } },
+            { "$unwind": "$values" },
+            {
+                "$group": {
+                    "_id": "$values.k",
+                    "count": { "$sum": "$values.v" },
+                }
+            }
+        ]
+
+    def parse_rollup_result(self, list_docs, **kwargs):
+        return self.parse_result(
+            [{ "_id": { "answer": decode_rollup_value(doc["_id"]) }, "count": doc["count"] } for doc in list_docs],
+            **kwargs
+        )
+
+    def get_pipeline(self, ques_label, match_filters, **kwargs):
         if self.aggregation == GraphAggregations.COUNT:
             exp_aggr = { "$sum": 1}
         elif self.aggregation == GraphAggregations.MIN:
@@ -421,34 +939,24 @@ class PieGraph(BaseGraphChart):
         else:
             raise InvalidGraphDefinition("Invalid aggregation '{}'.".format(self.aggregation))
 
-
-        result_aggr = entityModel._get_collection().aggregate([
-            {
-                "$unwind":{
-                    "path" : "$list_answers",
-                    "preserveNullAndEmptyArrays" : False
-                }
-            },
-            {
-                "$match": final_filters
+        return build_answer_pipeline(
+            match_filters,
+            ques_label,
+            answer_filters = {
+                # "list_answers.answer": { "$type": "string" },
+                "list_answers.is_other": False
             },
-            {
-                "$group": {
-                    "_id": {
-                        "answer": "$list_answers.answer"
-                    },
-                    "count": exp_aggr,
+            stages = [
+                {
+                    "$group": {
+                        "_id": {
+                            "answer": "$list_answers.answer"
+                        },
+                        "count": exp_aggr,
+                    }
                 }
-            }
-        ])
-
-        try:
-            data = list(result_aggr)
-
-            return data
-        except IndexError:
-            # No data
-            return []
+            ]
+        )
 
 
 class DonutGraph(PieGraph):
@@ -571,7 +1079,7 @@ class RadarGraph(BaseGraphChart):
 GRAPH_CLASS_MAPPING = {
     # --- 1D Graphs ---
     GraphCharts.D1_STATS_NUM: StatsNumberGraph,
-    # GraphCharts.D1_HISTOGRAM: HistogramGraph,
+    GraphCharts.D1_HISTOGRAM: HistogramGraph,
     GraphCharts.D1_STATS_DT: StatsDatetimeGraph,
 
     GraphCharts.D1_PIE: PieGraph,
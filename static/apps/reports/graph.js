@@ -21,6 +21,24 @@ angular.module('feedvay.reports.graphs', [
             return response.data;
         });
     }
+
+    this.get_dashboard_data = function(org_uid, context, filters){
+        var params = {
+            context: context
+        };
+        if(org_uid){
+            params['c'] = org_uid;
+        }
+        for(var key in filters){
+            params[key] = filters[key];
+        }
+
+        return $http.get('/reports/api/dashboard_data/', {
+            params: params
+        }).then(function (response) {
+            return response.data;
+        });
+    }
 })
 // ---------- /Services ----------
 
@@ -190,6 +208,43 @@ angular.module('feedvay.reports.graphs', [
                         }
                     };
                 }break;
+                case '1d_histogram':{
+                    $scope.configOptions = {
+                        series: {
+                            bars: {
+                                show: true,
+                                barWidth: 1,
+                                align: "left",
+                                lineWidth: 1,
+                                fill: true,
+                                fillColor: {
+                                    colors: [
+                                        {
+                                            opacity: 0.8
+                                        },
+                                        {
+                                            opacity: 0.8
+                                        }
+                                    ]
+                                }
+                            }
+                        },
+                        grid: {
+                            color: "#999999",
+                            hoverable: true,
+                            clickable: true,
+                            tickColor: "#D4D4D4",
+                            borderWidth: 0
+                        },
+                        legend: {
+                            show: false
+                        },
+                        tooltip: true,
+                        tooltipOpts: {
+                            content: "%x: %y"
+                        }
+                    };
+                }break;
             }
 
             // --- Graph config & data ---
@@ -265,6 +320,20 @@ angular.module('feedvay.reports.graphs', [
                                 final_data = [final_data];
                                 //$scope.configOptions.series.xaxis = xaxis;
                             }break;
+                            case '1d_histogram':{
+                                // Bars start at lower bound of bins & span bin size
+                                $scope.configOptions.series.bars.barWidth = response_data.data.bin_size || 1;
+                                final_data = {
+                                    label: "histogram",
+                                    data: []
+                                };
+                                angular.forEach(response_data.data.bins, function(row, key){
+                                    final_data["data"].push(
+                                        [ row["min"], row["count"] ]
+                                    );
+                                });
+                                final_data = [final_data];
+                            }break;
                             default: {
                                 final_data = response_data.data;
                             }
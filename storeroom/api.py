@@ -26,7 +26,7 @@ class ImportRecordOrgAPI(resources.MongoEngineResource):
             'context': ALL,
             'batch_id' : ALL,
         }
-        excludes = ('data', 'modified_on')
+        excludes = ('data', 'data_packed', 'codec', 'modified_on')
         authentication = OrgConsoleSessionAuthentication(['market.businessservicepoint.add_businessservicepoint'])
 
     def apply_filters(self, request, applicable_filters):
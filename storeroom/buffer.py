@@ -0,0 +1,308 @@
+# Copyright (C) 2017 Feedvay (Gagandeep Singh: singh.gagan144@gmail.com) - All Rights Reserved
+# Content in this document can not be copied and/or distributed without the express
+# permission of Gagandeep Singh.
+from django.conf import settings
+import atexit
+import os
+import sys
+import threading
+import traceback
+
+from pymongo.errors import BulkWriteError
+
+from storeroom.models import ResponseQueue
+from utilities.cache_utils import TTLCache
+
+class BufferWriteError(Exception):
+    """
+    Exception raised when a buffered item could not be written to the queue.
+
+    **Authors**: Gagandeep Singh
+    """
+    pass
+
+class BufferedItem(object):
+    """
+    An item waiting in :class:`storeroom.buffer.ResponseQueueBuffer` to be written.
+
+    **Authors**: Gagandeep Singh
+    """
+    __slots__ = ('doc', 'event', 'error', 'attempts')
+
+    def __init__(self, doc):
+        self.doc = doc
+        self.event = threading.Event()
+        self.error = None
+        self.attempts = 0
+
+    def wait(self, timeout):
+        """
+        Method to wait until this item is written.
+
+        :param timeout: Seconds to wait
+        :raises: :class:`storeroom.buffer.BufferWriteError` if item could not be written in time
+
+        **Authors**: Gagandeep Singh
+        """
+        if not self.event.wait(timeout):
+            raise BufferWriteError("Timed out while waiting for response to be queued.")
+        if self.error is not None:
+            raise BufferWriteError(self.error)
+
+
+class ResponseQueueBuffer(object):
+    """
+    In-process group-commit buffer for :class:`storeroom.models.ResponseQueue`. Items are accumulated
+    in memory and written with a single ``insert_many`` every ``max_items`` items or ``max_delay_ms``
+    milliseconds, whichever is earlier, by a background thread.
+
+    **Acknowledgement modes**:
+
+        - ``flush``: :func:`add` returns only after the item has been written. Requests still wait
+          for the write but share one round trip with other concurrent requests. If the item is not
+          written within ``flush_timeout``, it is withdrawn from the buffer so that a retry by the client
+          does not queue it twice; an item already being written is waited upon for another ``flush_timeout``.
+        - ``immediate``: :func:`add` returns as soon as the item is buffered. Items that fail to write
+          are retried in the next flush (upto :data:`MAX_ATTEMPTS`). Buffered items are **lost** if the
+          process crashes before the flush; pending items are flushed on normal exit.
+
+    **Points**:
+
+        - Buffer is per process. In pre-forked servers, flusher thread is started lazily in each
+          worker process and items inherited from the parent are discarded.
+        - Use :func:`storeroom.buffer.enqueue_response` instead of using buffer directly.
+
+    **Authors**: Gagandeep Singh
+    """
+    ACK_FLUSH = 'flush'
+    ACK_IMMEDIATE = 'immediate'
+
+    MAX_ATTEMPTS = 3
+
+    def __init__(self, max_items=100, max_delay_ms=50, ack=ACK_FLUSH, flush_timeout=10):
+        if ack not in [ResponseQueueBuffer.ACK_FLUSH, ResponseQueueBuffer.ACK_IMMEDIATE]:
+            raise ValueError("Invalid acknowledgement mode '{}'.".format(ack))
+
+        self.max_items = max_items
+        self.max_delay = max_delay_ms/1000.0
+        self.ack = ack
+        self.flush_timeout = flush_timeout
+
+        self.__cond = threading.Condition(threading.Lock())
+        self.__pending = []
+        self.__thread = None
+        self.__pid = None
+
+    def __len__(self):
+        return len(self.__pending)
+
+    def add(self, context, data):
+        """
+        Method to add a response to the buffer.
+
+        :param context: Response context; refer :class:`storeroom.models.ResponseQueue`
+        :param data: Response data string
+        :return: :class:`storeroom.buffer.BufferedItem`
+        :raises: :class:`storeroom.buffer.BufferWriteError` in ``flush`` mode if item could not be written
+
+        **Authors**: Gagandeep Singh
+        """
+        resp_queue = ResponseQueue(context=context, data=data)
+        resp_queue.validate()
+        item = BufferedItem(resp_queue.to_mongo())
+
+        with self.__cond:
+            self.__ensure_flusher()
+            self.__pending.append(item)
+            if len(self.__pending) >= self.max_items:
+                self.__cond.notify()
+
+        if self.ack == ResponseQueueBuffer.ACK_FLUSH:
+            try:
+                item.wait(self.flush_timeout)
+            except BufferWriteError:
+                if item.error is not None:
+                    raise
+
+                with self.__cond:
+                    is_taken = item not in self.__pending
+                    if not is_taken:
+                        # Not written; must not be written later
+                        self.__pending.remove(item)
+                if not is_taken:
+                    raise
+
+                # Write in progress; wait for its outcome
+                item.wait(self.flush_timeout)
+
+        return item
+
+    def flush(self):
+        """
+        Method to synchronously write all pending items.
+
+        **Authors**: Gagandeep Singh
+        """
+        with self.__cond:
+            list_items = self.__pending
+            self.__pending = []
+
+        for i in range(0, len(list_items), self.max_items):
+            self.__write(list_items[i:i+self.max_items])
+
+    def __ensure_flusher(self):
+        # Must be called holding the lock
+        pid = os.getpid()
+        if self.__pid != pid:
+            # Forked; items and thread of parent do not belong to this process
+            self.__pending = []
+            self.__thread = None
+            self.__pid = pid
+
+        if self.__thread is None or not self.__thread.is_alive():
+            self.__thread = threading.Thread(target=self.__run, name='ResponseQueueBuffer')
+            self.__thread.daemon = True
+            self.__thread.start()
+
+    def __run(self):
+        while True:
+            with self.__cond:
+                if len(self.__pending) < self.max_items:
+                    self.__cond.wait(self.max_delay)
+                list_items = self.__pending[:self.max_items]
+                del self.__pending[:self.max_items]
+
+            if len(list_items):
+                try:
+                    self.__write(list_items)
+                except Exception:
+                    sys.stderr.write("ResponseQueueBuffer: flush failed!\n{}".format(traceback.format_exc()))
+
+    def __write(self, list_items):
+        lookup_errors = {}
+        try:
+            ResponseQueue._get_collection().insert_many([item.doc for item in list_items], ordered=False)
+        except BulkWriteError as ex:
+            for error in ex.details.get('writeErrors', []):
+                lookup_errors[error['index']] = error['errmsg']
+        except Exception as ex:
+            lookup_errors = { idx: str(ex) for idx in range(len(list_items)) }
+
+        list_retry = []
+        for idx, item in enumerate(list_items):
+            error = lookup_errors.get(idx, None)
+            if error is not None and self.ack == ResponseQueueBuffer.ACK_IMMEDIATE:
+                item.attempts += 1
+                if item.attempts < ResponseQueueBuffer.MAX_ATTEMPTS:
+                    list_retry.append(item)
+                    continue
+                sys.stderr.write("ResponseQueueBuffer: dropping response after {} attempts: {}\n{}\n".format(item.attempts, error, item.doc))
+
+            item.error = error
+            item.event.set()
+
+        if len(list_retry):
+            with self.__cond:
+                self.__pending[0:0] = list_retry
+
+
+# ---------- Buffer instance ----------
+def create_buffer_from_settings():
+    """
+    Method to create buffer as per ``settings.STOREROOM_QUEUE_BUFFER``.
+
+    :return: :class:`storeroom.buffer.ResponseQueueBuffer` or None if buffering is disabled
+
+    **Authors**: Gagandeep Singh
+    """
+    config = getattr(settings, 'STOREROOM_QUEUE_BUFFER', None) or {}
+    if not config.get('ENABLED', False):
+        return None
+
+    return ResponseQueueBuffer(
+        max_items = config.get('MAX_ITEMS', 100),
+        max_delay_ms = config.get('MAX_DELAY_MS', 50),
+        ack = config.get('ACK', ResponseQueueBuffer.ACK_FLUSH),
+        flush_timeout = config.get('FLUSH_TIMEOUT', 10)
+    )
+
+# Process-wide buffer; None if disabled
+response_queue_buffer = create_buffer_from_settings()
+if response_queue_buffer is not None:
+    atexit.register(response_queue_buffer.flush)
+
+def enqueue_response(context, data):
+    """
+    Method to push a submitted response to :class:`storeroom.models.ResponseQueue`. Response is written
+    through :data:`response_queue_buffer` if buffering is enabled, else directly.
+
+    :param context: Response context; refer :class:`storeroom.models.ResponseQueue`
+    :param data: Response data string
+    :raises: :class:`storeroom.buffer.BufferWriteError` if response could not be queued
+
+    **Authors**: Gagandeep Singh
+    """
+    if response_queue_buffer is not None:
+        response_queue_buffer.add(context, data)
+    else:
+        ResponseQueue.objects.create(context=context, data=data)
+
+def enqueue_responses(context, list_data):
+    """
+    Method to push many responses to :class:`storeroom.models.ResponseQueue` with a single unordered
+    ``insert_many`` (bypassing buffer since they already form a batch).
+
+    :param context: Response context; refer :class:`storeroom.models.ResponseQueue`
+    :param list_data: List of response data strings
+    :return: List of error messages in same order as ``list_data``; None for responses queued successfully
+
+    **Authors**: Gagandeep Singh
+    """
+    list_errors = [None] * len(list_data)
+    if not len(list_data):
+        return list_errors
+
+    list_docs = []
+    for data in list_data:
+        resp_queue = ResponseQueue(context=context, data=data)
+        resp_queue.validate()
+        list_docs.append(resp_queue.to_mongo())
+
+    try:
+        ResponseQueue._get_collection().insert_many(list_docs, ordered=False)
+    except BulkWriteError as ex:
+        for error in ex.details.get('writeErrors', []):
+            list_errors[error['index']] = error['errmsg']
+    except Exception as ex:
+        list_errors = [str(ex)] * len(list_data)
+
+    return list_errors
+
+
+# ---------- Backpressure ----------
+# Short-lived cache of pending depth per context. Format: { "<context>": <count>, ... }
+queue_depth_cache = TTLCache(ttl=settings.STOREROOM_BACKPRESSURE_CHECK_TTL, max_size=64)
+
+def get_backpressure(context):
+    """
+    Method to check if queue lane of a context is overloaded i.e. number of pending (NEW) responses
+    has crossed ``MAX_DEPTH`` of the lane (refer ``settings.STOREROOM_QUEUE_LANES``). Submit views must
+    reject responses with http 429 in this case. Depth is an index-only count cached for
+    ``settings.STOREROOM_BACKPRESSURE_CHECK_TTL`` seconds.
+
+    :param context: Response context; refer :class:`storeroom.models.ResponseQueue`
+    :return: Seconds after which client must retry; None if lane is not overloaded.
+
+    **Authors**: Gagandeep Singh
+    """
+    lane = settings.STOREROOM_QUEUE_LANES.get(context, None)
+    if not lane or not lane.get('MAX_DEPTH', None):
+        return None
+
+    depth = queue_depth_cache.get_or_set(
+        context,
+        lambda: ResponseQueue._get_collection().count({'context': context, 'status': ResponseQueue.ST_NEW})
+    )
+    if depth >= lane['MAX_DEPTH']:
+        return lane.get('RETRY_AFTER', 60)
+    return None
@@ -0,0 +1,140 @@
+# Copyright (C) 2017 Feedvay (Gagandeep Singh: singh.gagan144@gmail.com) - All Rights Reserved
+# Content in this document can not be copied and/or distributed without the express
+# permission of Gagandeep Singh.
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from bson.binary import Binary
+from pymongo import UpdateOne
+
+from storeroom.models import ImportRecord, ResponseQueue
+from storeroom import payload as payload_codecs
+
+class Command(BaseCommand):
+    """
+    Django management command to re-encode payloads of existing :class:`storeroom.models.ResponseQueue`
+    and :class:`storeroom.models.ImportRecord` records (refer :class:`storeroom.models.PayloadDocument`).
+
+    Records with plain payload are packed with the given codec. With codec ``json``, packed records
+    are converted back to plain payload (e.g. before rolling back to a release that cannot read packed payloads).
+
+    **Parameters:**
+
+        - ``codec``: (Default ``settings.STOREROOM_PAYLOAD_CODEC``) Target codec.
+        - ``model``: (Default all) ``response_queue`` or ``import_record``.
+        - ``batch_size``: (Default 500) Number of records updated per bulk write.
+
+    Command::
+
+        python manage.py storeroom_pack_payloads --codec zlib
+
+    **Authors**: Gagandeep Singh
+    """
+    help = "Command to encode/decode payloads of existing storeroom records."
+    requires_system_checks = True
+    can_import_settings = True
+
+    MODELS = {
+        'response_queue': ResponseQueue,
+        'import_record': ImportRecord,
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--codec",
+            dest = "codec",
+            help = "Target codec. Default: settings.STOREROOM_PAYLOAD_CODEC",
+            default = None
+        )
+        parser.add_argument(
+            "--model",
+            dest = "model",
+            help = "Model to be processed: {}. Default: all".format(', '.join(sorted(self.MODELS.keys()))),
+            default = None
+        )
+        parser.add_argument(
+            "--batch_size",
+            dest = "batch_size",
+            help = "Number of records updated per bulk write. Default: 500",
+            type = int,
+            default = 500
+        )
+
+    def pack_collection(self, collection, codec, batch_size):
+        """
+        Method to pack plain payloads of a collection.
+
+        :return: Number of records updated
+
+        **Authors**: Gagandeep Singh
+        """
+        count = 0
+        list_ops = []
+        qry = {'data': {'$exists': True, '$ne': None}, 'data_packed': {'$exists': False}}
+        for doc in collection.find(qry, {'data': True}):
+            list_ops.append(UpdateOne(
+                {'_id': doc['_id'], 'data': doc['data']},
+                {
+                    '$set': {'data_packed': Binary(payload_codecs.encode_payload(doc['data'], codec)), 'codec': codec},
+                    '$unset': {'data': ''}
+                }
+            ))
+            if len(list_ops) >= batch_size:
+                count += collection.bulk_write(list_ops, ordered=False).modified_count
+                list_ops = []
+
+        if len(list_ops):
+            count += collection.bulk_write(list_ops, ordered=False).modified_count
+        return count
+
+    def unpack_collection(self, collection, batch_size):
+        """
+        Method to convert packed payloads of a collection back to plain payloads.
+
+        :return: Number of records updated
+
+        **Authors**: Gagandeep Singh
+        """
+        count = 0
+        list_ops = []
+        qry = {'data_packed': {'$exists': True}}
+        for doc in collection.find(qry, {'data_packed': True, 'codec': True}):
+            list_ops.append(UpdateOne(
+                {'_id': doc['_id'], 'data_packed': doc['data_packed']},
+                {
+                    '$set': {'data': payload_codecs.decode_payload(doc['data_packed'], doc.get('codec'))},
+                    '$unset': {'data_packed': '', 'codec': ''}
+                }
+            ))
+            if len(list_ops) >= batch_size:
+                count += collection.bulk_write(list_ops, ordered=False).modified_count
+                list_ops = []
+
+        if len(list_ops):
+            count += collection.bulk_write(list_ops, ordered=False).modified_count
+        return count
+
+    # ----- Main executor -----
+    def handle(self, *args, **options):
+        codec = options['codec'] or settings.STOREROOM_PAYLOAD_CODEC
+        if codec not in dict(payload_codecs.CH_CODEC):
+            raise CommandError("Invalid codec '{}'.".format(codec))
+
+        if options['model']:
+            if options['model'] not in self.MODELS:
+                raise CommandError("Invalid model '{}'.".format(options['model']))
+            list_models = [self.MODELS[options['model']]]
+        else:
+            list_models = self.MODELS.values()
+
+        for model in list_models:
+            collection = model._get_collection()
+            self.stdout.write(self.style.SUCCESS("Processing '{}' to '{}'...".format(collection.name, codec)))
+
+            if codec == payload_codecs.CODEC_JSON:
+                count = self.unpack_collection(collection, options['batch_size'])
+            else:
+                count = self.pack_collection(collection, codec, options['batch_size'])
+
+            self.stdout.write(self.style.SUCCESS("\t{} record(s) updated.".format(count)))
+
+        self.stdout.write(self.style.SUCCESS('Completed!'))
@@ -8,7 +8,8 @@ from django.db.models import Q
 
 from mongoengine.queryset import DoesNotExist as DoesNotExist_mongo
 
-from storeroom.models import ImportRecord
+from storeroom.models import ImportRecord, QueueMetrics
+from storeroom.metrics import BatchMetrics
 from clients.models import Organization
 from market.models import BusinessServicePoint, BspTypeCustomization
 from market.bsp_types import *
@@ -55,6 +56,7 @@ class Command(BaseCommand):
         cache_org_bsptypecustm = {}   # Format: { "<org_id>__<bsp_type>": BspTypeCustomization, ... }
 
         count = 0
+        metrics = BatchMetrics(QueueMetrics.QU_IMPORT_RECORD)
         for record in ImportRecord.objects.filter(context=ImportRecord.CNTX_BSP, status=ImportRecord.ST_NEW).limit(limit):
             with transaction.atomic():
                 self.stdout.write(self.style.SUCCESS('\tProcessing: "{}"...'.format(record.pk)))
@@ -183,6 +185,7 @@ class Command(BaseCommand):
                     self.stdout.write(self.style.SUCCESS('\t\tSuccess!'))
 
                     count += 1
+                    metrics.add(record.context, 'processed', record.created_on)
                     # ---
 
                 except Exception as ex:
@@ -192,5 +195,7 @@ class Command(BaseCommand):
                     record.status = ImportRecord.ST_ERROR
                     record.error_message = ex.message
                     record.save()
+                    metrics.add(record.context, 'failed')
 
+        metrics.save()
         self.stdout.write(self.style.SUCCESS('\n{} BSP successfully migrated.'.format(count)))
\ No newline at end of file
@@ -11,7 +11,8 @@ from geojson import Polygon
 
 from mongoengine.queryset import DoesNotExist as DoesNotExist_mongo
 
-from storeroom.models import ImportRecord
+from storeroom.models import ImportRecord, QueueMetrics
+from storeroom.metrics import BatchMetrics
 from geography.models import *
 from geography.utils import generate_fulladdr_from_path
 
@@ -55,6 +56,7 @@ class Command(BaseCommand):
 
         count_created = 0
         count_failed = 0
+        metrics = BatchMetrics(QueueMetrics.QU_IMPORT_RECORD)
         for record in ImportRecord.objects.filter(context=ImportRecord.CNTX_GEO_LOC, status=ImportRecord.ST_NEW).limit(limit):
             with transaction.atomic():
                 data = record.data_json
@@ -112,6 +114,7 @@ class Command(BaseCommand):
                     self.stdout.write(self.style.SUCCESS('\t\tSuccess!'))
 
                     count_created += 1
+                    metrics.add(record.context, 'processed', record.created_on)
 
                 except Exception as ex:
                     # Migration failure
@@ -121,5 +124,7 @@ class Command(BaseCommand):
                     record.status = ImportRecord.ST_ERROR
                     record.error_message = ex.message
                     record.save()
+                    metrics.add(record.context, 'failed')
 
+        metrics.save()
         self.stdout.write(self.style.SUCCESS('\nCompleted! {} Migrated, {} Failed.'.format(count_created, count_failed)))
\ No newline at end of file
@@ -9,7 +9,10 @@ import traceback
 
 from mongoengine.queryset import DoesNotExist as DoesNotExist_mongo
 
-from storeroom.models import ResponseQueue
+from form_builder.form_exceptions import ResponseValidationError
+from storeroom.models import ResponseQueue, ResponseDeadLetter, QueueMetrics
+from storeroom.metrics import BatchMetrics
+from storeroom.operations import validate_responses, process_responses_batch
 from feedback import operations as ops_feedback
 from surveys import operations as ops_surveys
 
@@ -17,14 +20,25 @@ class Command(BaseCommand):
     """
     Django management command to process form responses in queue(:class:`storeroom.models.ResponseQueue`)
 
+    Before processing, all responses in the batch are validated against their forms
+    (refer :class:`form_builder.response_validation.ResponseValidator`). Invalid responses
+    are moved to dead letters (:class:`storeroom.models.ResponseDeadLetter`) with list of errors as traceback.
+    Failed responses are scheduled for retry with backoff; retries due are picked only in ``batch`` mode.
+
+    In ``batch`` mode, records are claimed atomically (refer :func:`storeroom.models.ResponseQueue.claim`)
+    and processed together using :func:`storeroom.operations.process_responses_batch` i.e. survey
+    responses are written with single bulk insert and processed records are removed with single delete.
+
     **Parameters:**
 
         - ``limit``: (Default 100) Number odfimports to be processed.
+        - ``batch``: If set, responses are processed in batch mode.
 
 
     Command::
 
         python manage.py storeroom_process_responses --limit 100
+        python manage.py storeroom_process_responses --limit 1000 --batch
 
     **Authors**: Gagandeep Singh
     """
@@ -40,19 +54,43 @@ class Command(BaseCommand):
             type = int,
             default = 100
         )
+        parser.add_argument(
+            "--batch",
+            dest = "batch",
+            help = "Process responses in batch mode.",
+            action = "store_true",
+            default = False
+        )
 
     # ----- Main executor -----
     def handle(self, *args, **options):
         limit = int(options['limit'])
 
+        if options['batch']:
+            self.stdout.write(self.style.SUCCESS('Claiming pending responses (limit: {})...'.format(limit)))
+            list_resp_queue = ResponseQueue.claim_lanes(limit)
+
+            self.stdout.write(self.style.SUCCESS('Processing {} response(s) in batch...'.format(len(list_resp_queue))))
+            stats = process_responses_batch(list_resp_queue)
+
+            self.stdout.write(self.style.SUCCESS('\nBatch completed! {}'.format(stats)))
+            return
+
         self.stdout.write(self.style.SUCCESS('Retrieving all pending responses (limit: {})...'.format(limit)))
 
         stats = {
             'count': 0,
             'ignored': 0,
+            'invalid': 0,
             'failed': 0
         }
-        for resp_queue in ResponseQueue.objects.filter(status=ResponseQueue.ST_NEW).limit(limit):
+        metrics = BatchMetrics(QueueMetrics.QU_RESPONSE_QUEUE)
+        list_resp_queue = list(ResponseQueue.objects.filter(status=ResponseQueue.ST_NEW).limit(limit))
+
+        # Validate responses against their forms
+        lookup_data, lookup_errors, lookup_resp_form = validate_responses(list_resp_queue)
+
+        for resp_queue in list_resp_queue:
 
             with transaction.atomic():
                 self.stdout.write(self.style.SUCCESS('\tProcessing: "{}"...'.format(resp_queue.pk)))
@@ -63,15 +101,23 @@ class Command(BaseCommand):
 
                 try:
                     # Parse JSON data
-                    data = json.loads(resp_queue.data)
+                    data = lookup_data.get(resp_queue.pk, None)
+                    if data is None:
+                        data = resp_queue.data_json
+
+                    errors = lookup_errors.get(resp_queue.pk, None)
+                    if errors:
+                        raise ResponseValidationError("Invalid response: {} error(s) found.".format(len(errors)), errors)
 
                     # Perform operation as per the context of the response.
+                    # Forms resolved during validation are shared by all responses of the batch.
+                    form = lookup_resp_form.get(resp_queue.pk, None)
                     if resp_queue.context == ResponseQueue.CT_BSP_FEEDBACK:
                         # BSP Feedback Process
-                        is_success = ops_feedback.save_bsp_feedback_response(data)
+                        is_success = ops_feedback.save_bsp_feedback_response(data, form=form)
                     elif resp_queue.context == ResponseQueue.CT_SURVEY_RESPONSE:
                         # Survey response Process
-                        is_success = ops_surveys.save_survey_response(data)
+                        is_success = ops_surveys.save_survey_response(data, form=form)
                     else:
                         raise NotImplementedError("Operation for '{}' response not implemented".format(resp_queue.context))
 
@@ -79,17 +125,31 @@ class Command(BaseCommand):
                         stats['count'] += 1
                     else:
                         stats['ignored'] += 1
+                    metrics.add(resp_queue.context, 'processed' if is_success else 'ignored', resp_queue.created_on)
 
                     # Delete Record
                     resp_queue.delete()
 
+                except ResponseValidationError as ex:
+                    stats['invalid'] += 1
+                    metrics.add(resp_queue.context, 'invalid')
+                    self.stdout.write(self.style.SUCCESS('\t\tInvalid: {}'.format(ex.message)))
+
+                    resp_queue.trans_failed(ex.message, json.dumps(ex.errors, indent=4), retry=False)
+                    ResponseDeadLetter.bury([resp_queue])
+
                 except Exception as ex:
                     stats['failed'] += 1
+                    metrics.add(resp_queue.context, 'failed')
                     self.stdout.write(self.style.SUCCESS('\t\tFailed: {}'.format(ex.message)))
 
                     traceback_text = traceback.format_exc()
                     resp_queue.trans_failed(ex.message, traceback_text)
-                    resp_queue.save()
+                    if resp_queue.is_dead:
+                        ResponseDeadLetter.bury([resp_queue])
+                    else:
+                        resp_queue.save()
 
+        metrics.save()
 
-        self.stdout.write(self.style.SUCCESS('\nBatch completed! {}'.format(stats)))
\ No newline at end of file
+        self.stdout.write(self.style.SUCCESS('\nBatch completed! {}'.format(stats)))
@@ -0,0 +1,73 @@
+# Copyright (C) 2017 Feedvay (Gagandeep Singh: singh.gagan144@gmail.com) - All Rights Reserved
+# Content in this document can not be copied and/or distributed without the express
+# permission of Gagandeep Singh.
+from django.core.management.base import BaseCommand, CommandError
+import json
+
+from storeroom.metrics import get_queue_stats
+
+class Command(BaseCommand):
+    """
+    Django management command to report instrumentation of storeroom queues: depth per context & status,
+    age of oldest pending record, processing rate, failure rate and enqueue-to-processed latency
+    percentiles (refer :func:`storeroom.metrics.get_queue_stats`).
+
+    **Parameters:**
+
+        - ``window``: (Default 60) Minutes of processing statistics window.
+        - ``json``: Print raw json instead of summary.
+
+    Command::
+
+        python manage.py storeroom_queue_stats --window 15
+
+    **Authors**: Gagandeep Singh
+    """
+    help = "Command to report depth, latency and throughput of storeroom queues."
+    requires_system_checks = True
+    can_import_settings = True
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--window",
+            dest = "window",
+            help = "Minutes of processing statistics window. Default: 60",
+            type = int,
+            default = 60
+        )
+        parser.add_argument(
+            "--json",
+            dest = "json",
+            help = "Print raw json.",
+            action = "store_true",
+            default = False
+        )
+
+    # ----- Main executor -----
+    def handle(self, *args, **options):
+        if options['window'] <= 0:
+            raise CommandError("Window must be a positive number of minutes.")
+
+        stats = get_queue_stats(window_minutes=options['window'])
+
+        if options['json']:
+            self.stdout.write(json.dumps(stats, indent=4))
+            return
+
+        self.stdout.write(self.style.SUCCESS('Storeroom queues (window: last {} minute(s))'.format(stats['window_minutes'])))
+        for queue, contexts in sorted(stats['queues'].items()):
+            self.stdout.write(self.style.SUCCESS('\n{}'.format(queue)))
+            for context, info in sorted(contexts.items()):
+                depth = ', '.join('{}: {}'.format(status, count) for status, count in sorted(info['depth'].items()))
+                self.stdout.write('\t{}'.format(context))
+                self.stdout.write('\t\tDepth: {}; oldest pending: {} sec'.format(depth, info['oldest_pending_age_sec']))
+                if 'dead_letters' in info:
+                    self.stdout.write('\t\tDead letters: {}'.format(info['dead_letters']))
+
+                win = info['window']
+                if win is None:
+                    self.stdout.write('\t\tNo batches processed in window.')
+                    continue
+                self.stdout.write('\t\tBatches: {batches}; processed: {processed}, ignored: {ignored}, invalid: {invalid}, failed: {failed}'.format(**win))
+                self.stdout.write('\t\tFailure rate: {failure_rate}; rate: {records_per_busy_sec}/busy sec, {records_per_min}/min'.format(**win))
+                self.stdout.write('\t\tLatency: p50 <= {latency_p50_sec} sec, p95 <= {latency_p95_sec} sec'.format(**win))
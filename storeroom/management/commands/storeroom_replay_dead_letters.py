@@ -0,0 +1,108 @@
+# Copyright (C) 2017 Feedvay (Gagandeep Singh: singh.gagan144@gmail.com) - All Rights Reserved
+# Content in this document can not be copied and/or distributed without the express
+# permission of Gagandeep Singh.
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from datetime import datetime
+
+from storeroom.models import ResponseQueue, ResponseDeadLetter
+
+class Command(BaseCommand):
+    """
+    Django management command to re-enqueue dead responses (:class:`storeroom.models.ResponseDeadLetter`)
+    to :class:`storeroom.models.ResponseQueue` after the cause of failure has been fixed. Records are
+    re-enqueued in bulk with attempts reset (refer :func:`storeroom.models.ResponseDeadLetter.replay`).
+
+    **Parameters:**
+
+        - ``context``: (Optional) Context of responses to be replayed.
+        - ``since``: (Optional) Replay only responses dead on or after this date (YYYY-MM-DD).
+        - ``error``: (Optional) Replay only responses whose error title contains this text.
+        - ``limit``: (Optional) Maximum number of responses to be replayed.
+        - ``batch_size``: (Default 500) Number of responses re-enqueued per bulk write.
+        - ``dry_run``: Only report number of responses that would be replayed.
+
+    Command::
+
+        python manage.py storeroom_replay_dead_letters --context survey_response --since 2017-06-01
+
+    **Authors**: Gagandeep Singh
+    """
+    help = "Command to re-enqueue dead responses to response queue."
+    requires_system_checks = True
+    can_import_settings = True
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--context",
+            dest = "context",
+            help = "Context of responses to be replayed.",
+            default = None
+        )
+        parser.add_argument(
+            "--since",
+            dest = "since",
+            help = "Replay only responses dead on or after this date (YYYY-MM-DD).",
+            default = None
+        )
+        parser.add_argument(
+            "--error",
+            dest = "error",
+            help = "Replay only responses whose error title contains this text.",
+            default = None
+        )
+        parser.add_argument(
+            "--limit",
+            dest = "limit",
+            help = "Maximum number of responses to be replayed.",
+            type = int,
+            default = None
+        )
+        parser.add_argument(
+            "--batch_size",
+            dest = "batch_size",
+            help = "Number of responses re-enqueued per bulk write. Default: 500",
+            type = int,
+            default = 500
+        )
+        parser.add_argument(
+            "--dry_run",
+            dest = "dry_run",
+            help = "Only report number of responses that would be replayed.",
+            action = "store_true",
+            default = False
+        )
+
+    # ----- Main executor -----
+    def handle(self, *args, **options):
+        qry = ResponseDeadLetter.objects.all()
+        if options['context']:
+            if options['context'] not in dict(ResponseQueue.CH_CONTEXT):
+                raise CommandError("Invalid context '{}'.".format(options['context']))
+            qry = qry.filter(context=options['context'])
+        if options['since']:
+            try:
+                since = timezone.make_aware(datetime.strptime(options['since'], '%Y-%m-%d'))
+            except ValueError:
+                raise CommandError("Invalid date '{}'; use YYYY-MM-DD.".format(options['since']))
+            qry = qry.filter(created_on__gte=since)
+        if options['error']:
+            qry = qry.filter(error_title__icontains=options['error'])
+        if options['limit']:
+            qry = qry.limit(options['limit'])
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS('{} dead response(s) would be replayed.'.format(qry.count(with_limit_and_skip=True))))
+            return
+
+        count = 0
+        list_batch = []
+        for dead in qry.timeout(False):
+            list_batch.append(dead)
+            if len(list_batch) >= options['batch_size']:
+                count += ResponseDeadLetter.replay(list_batch)
+                list_batch = []
+                self.stdout.write(self.style.SUCCESS('\t{} replayed...'.format(count)))
+        count += ResponseDeadLetter.replay(list_batch)
+
+        self.stdout.write(self.style.SUCCESS('Completed! {} dead response(s) re-enqueued.'.format(count)))
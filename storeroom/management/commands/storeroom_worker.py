@@ -0,0 +1,127 @@
+# Copyright (C) 2017 Feedvay (Gagandeep Singh: singh.gagan144@gmail.com) - All Rights Reserved
+# Content in this document can not be copied and/or distributed without the express
+# permission of Gagandeep Singh.
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+import multiprocessing
+import signal
+
+from storeroom.operations import run_queue_worker
+
+class Command(BaseCommand):
+    """
+    Django management command to run long-running workers that process form responses in queue
+    (:class:`storeroom.models.ResponseQueue`) in parallel.
+
+    **Points**:
+
+        - Each worker process claims batches atomically (refer :func:`storeroom.models.ResponseQueue.claim`);
+          hence any number of workers can run across processes and nodes without processing same record twice.
+        - Each batch is shared among contexts as per lane weights (refer :func:`storeroom.models.ResponseQueue.claim_lanes`).
+        - Records claimed by a crashed worker are reclaimed by others after the lease expires.
+        - Workers that exit unexpectedly are restarted.
+        - On SIGTERM/SIGINT, workers finish their current batch and exit.
+
+    **Parameters:**
+
+        - ``processes``: (Default: number of cpus) Number of worker processes.
+        - ``batch_size``: (Default 100) Number of records claimed per batch.
+        - ``lease``: (Default ``settings.STOREROOM_QUEUE_LEASE``) Claim lease in seconds. Must be longer than time
+          taken to process a batch.
+        - ``idle_sleep``: (Default 5) Seconds to wait when queue is empty.
+
+    Command::
+
+        python manage.py storeroom_worker --processes 4 --batch_size 200
+
+    **Authors**: Gagandeep Singh
+    """
+    help = "Command to run parallel workers to process responses in queue."
+    requires_system_checks = True
+    can_import_settings = True
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--processes",
+            dest = "processes",
+            help = "Number of worker processes. Default: number of cpus",
+            type = int,
+            default = multiprocessing.cpu_count()
+        )
+        parser.add_argument(
+            "--batch_size",
+            dest = "batch_size",
+            help = "Number of records claimed per batch. Default: 100",
+            type = int,
+            default = 100
+        )
+        parser.add_argument(
+            "--lease",
+            dest = "lease",
+            help = "Claim lease in seconds. Default: {}".format(settings.STOREROOM_QUEUE_LEASE),
+            type = int,
+            default = settings.STOREROOM_QUEUE_LEASE
+        )
+        parser.add_argument(
+            "--idle_sleep",
+            dest = "idle_sleep",
+            help = "Seconds to wait when queue is empty. Default: 5",
+            type = int,
+            default = 5
+        )
+
+    def log(self, message):
+        self.stdout.write(message)
+        self.stdout.flush()
+
+    def start_worker(self, stop_event, options):
+        process = multiprocessing.Process(
+            target = run_queue_worker,
+            args = (stop_event,),
+            kwargs = {
+                "batch_size": options['batch_size'],
+                "lease_seconds": options['lease'],
+                "idle_sleep": options['idle_sleep'],
+                "log": self.log
+            }
+        )
+        process.start()
+        return process
+
+    # ----- Main executor -----
+    def handle(self, *args, **options):
+        num_processes = int(options['processes'])
+        if num_processes < 1:
+            raise CommandError("Number of processes must be atleast 1.")
+
+        stop_event = multiprocessing.Event()
+        def on_signal(signum, frame):
+            stop_event.set()
+        signal.signal(signal.SIGTERM, on_signal)
+        signal.signal(signal.SIGINT, on_signal)
+
+        # Database connections must not be shared with children
+        for conn in connections.all():
+            conn.close()
+
+        self.log('Starting {} worker(s)...'.format(num_processes))
+        list_workers = [self.start_worker(stop_event, options) for i in range(num_processes)]
+
+        # Monitor & restart dead workers
+        while not stop_event.is_set():
+            for idx, process in enumerate(list_workers):
+                if not process.is_alive() and not stop_event.is_set():
+                    self.log('Worker {} exited with code {}; restarting...'.format(process.pid, process.exitcode))
+                    list_workers[idx] = self.start_worker(stop_event, options)
+            stop_event.wait(1)
+
+        # Graceful shutdown; workers complete current batch
+        self.log('Stopping workers...')
+        for process in list_workers:
+            process.join(options['lease'])
+            if process.is_alive():
+                self.log('Worker {} did not stop in time; terminating...'.format(process.pid))
+                process.terminate()
+
+        self.log('All workers stopped.')
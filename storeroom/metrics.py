@@ -0,0 +1,248 @@
+# Copyright (C) 2017 Feedvay (Gagandeep Singh: singh.gagan144@gmail.com) - All Rights Reserved
+# Content in this document can not be copied and/or distributed without the express
+# permission of Gagandeep Singh.
+from django.utils import timezone
+from datetime import datetime, timedelta
+import time
+
+from storeroom.models import ResponseQueue, ResponseDeadLetter, ImportRecord, QueueMetrics
+
+# Upper bounds (in seconds) of latency histogram buckets; last bucket is unbounded.
+LATENCY_BUCKETS = (1, 2, 5, 10, 30, 60, 120, 300, 600, 1800, 3600, 6*3600, 24*3600)
+LATENCY_BUCKET_INF = 'inf'
+
+# Queues reported by get_queue_stats(): { <queue>: (<model>, <pending status>) }
+QUEUE_MODELS = {
+    QueueMetrics.QU_RESPONSE_QUEUE: (ResponseQueue, ResponseQueue.ST_NEW),
+    QueueMetrics.QU_IMPORT_RECORD: (ImportRecord, ImportRecord.ST_NEW),
+}
+
+def utc_naive(dt):
+    """
+    Returns datetime as naive UTC datetime (as returned by mongo).
+
+    **Authors**: Gagandeep Singh
+    """
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+def get_latency_bucket(seconds):
+    """
+    Returns histogram bucket key of a latency.
+
+    **Authors**: Gagandeep Singh
+    """
+    for bound in LATENCY_BUCKETS:
+        if seconds <= bound:
+            return str(bound)
+    return LATENCY_BUCKET_INF
+
+def get_histogram_percentile(histogram, percentile):
+    """
+    Method to get approximate percentile of a latency histogram.
+
+    :param histogram: Latency histogram of format ``{ "<upper bound>": <count>, ... }``
+    :param percentile: Percentile between 0 and 100
+    :return: Upper bound (seconds) of bucket containing the percentile; None if histogram is empty,
+        ``inf`` if percentile lies in unbounded bucket.
+
+    **Authors**: Gagandeep Singh
+    """
+    total = sum(histogram.values())
+    if not total:
+        return None
+
+    rank = total * percentile / 100.0
+    cumulative = 0
+    for bound in LATENCY_BUCKETS:
+        cumulative += histogram.get(str(bound), 0)
+        if cumulative >= rank:
+            return bound
+    return LATENCY_BUCKET_INF
+
+
+class BatchMetrics(object):
+    """
+    Accumulator of counters of a processing batch of a queue. Counters are written to
+    :class:`storeroom.models.QueueMetrics` on :func:`save` with one upsert per context.
+
+    Usage::
+
+        metrics = BatchMetrics(QueueMetrics.QU_RESPONSE_QUEUE)
+        for record in batch:
+            ...
+            metrics.add(record.context, 'processed', record.created_on)
+        metrics.save()
+
+    **Authors**: Gagandeep Singh
+    """
+    OUTCOMES = ('processed', 'ignored', 'invalid', 'failed')
+
+    def __init__(self, queue):
+        self.queue = queue
+        self.start = time.time()
+        self.contexts = {}  # Format: { <context>: { <outcome>: <count>, 'latency': {<bucket>: <count>} } }
+
+    def add(self, context, outcome, created_on=None):
+        """
+        Method to count outcome of a record.
+
+        :param context: Context of the record
+        :param outcome: One of :data:`OUTCOMES`
+        :param created_on: (Optional) Enqueue datetime of the record; latency is recorded for
+            ``processed`` & ``ignored`` records.
+
+        **Authors**: Gagandeep Singh
+        """
+        if outcome not in BatchMetrics.OUTCOMES:
+            raise ValueError("Invalid outcome '{}'.".format(outcome))
+
+        counters = self.contexts.setdefault(context, {'latency': {}})
+        counters[outcome] = counters.get(outcome, 0) + 1
+
+        if created_on is not None and outcome in ['processed', 'ignored']:
+            latency = max((datetime.utcnow() - utc_naive(created_on)).total_seconds(), 0)
+            bucket = get_latency_bucket(latency)
+            counters['latency'][bucket] = counters['latency'].get(bucket, 0) + 1
+
+    def save(self):
+        """
+        Method to write counters. Batch processing time is shared among contexts in proportion to their
+        number of records. Errors are not raised since metrics must never fail processing.
+
+        :return: True if written successfully
+
+        **Authors**: Gagandeep Singh
+        """
+        if not len(self.contexts):
+            return True
+
+        elapsed = time.time() - self.start
+        now = datetime.utcnow()
+        minute = now.replace(second=0, microsecond=0)
+        total = sum(sum(counters.get(o, 0) for o in BatchMetrics.OUTCOMES) for counters in self.contexts.itervalues())
+
+        try:
+            collection = QueueMetrics._get_collection()
+            for context, counters in self.contexts.iteritems():
+                count = sum(counters.get(o, 0) for o in BatchMetrics.OUTCOMES)
+                inc = {
+                    'batches': 1,
+                    'busy_sec': elapsed * count / total if total else 0,
+                }
+                for outcome in BatchMetrics.OUTCOMES:
+                    if counters.get(outcome, 0):
+                        inc[outcome] = counters[outcome]
+                for bucket, count_bucket in counters['latency'].iteritems():
+                    inc['latency.{}'.format(bucket)] = count_bucket
+
+                collection.update_one(
+                    {'queue': self.queue, 'context': context, 'minute': minute},
+                    {'$inc': inc},
+                    upsert = True
+                )
+            return True
+        except Exception:
+            return False
+
+
+# ---------- Reporting ----------
+def get_queue_depth(queue):
+    """
+    Method to get depth of a queue per context and status along with age of oldest pending record.
+    Each figure is an index-only count/lookup on ``(context, status, created_on)``.
+
+    :param queue: One of :data:`storeroom.models.QueueMetrics.CH_QUEUE`
+    :return: JSON dict of format ``{ <context>: { "depth": {<status>: <count>}, "oldest_pending_age_sec": <seconds|None> } }``.
+        Response queue contexts also have ``dead_letters`` count.
+
+    **Authors**: Gagandeep Singh
+    """
+    model, st_pending = QUEUE_MODELS[queue]
+    collection = model._get_collection()
+    now = datetime.utcnow()
+
+    result = {}
+    for context, _ in model.CH_CONTEXT:
+        depth = {}
+        for status, _ in model.CH_STATUS:
+            depth[status] = collection.count({'context': context, 'status': status})
+
+        oldest = None
+        if depth[st_pending]:
+            doc = collection.find_one(
+                {'context': context, 'status': st_pending},
+                {'created_on': True},
+                sort = [('created_on', 1)]
+            )
+            if doc is not None:
+                oldest = round((now - utc_naive(doc['created_on'])).total_seconds(), 1)
+
+        result[context] = {
+            "depth": depth,
+            "oldest_pending_age_sec": oldest,
+        }
+        if model is ResponseQueue:
+            result[context]["dead_letters"] = ResponseDeadLetter._get_collection().count({'context': context})
+    return result
+
+def get_queue_stats(window_minutes=60):
+    """
+    Method to get instrumentation of storeroom queues: current depth & age of oldest pending record
+    and processing statistics over last ``window_minutes`` from :class:`storeroom.models.QueueMetrics`.
+
+    **Window statistics per context**:
+
+        - ``batches``, ``processed``, ``ignored``, ``invalid``, ``failed``: Totals in the window.
+        - ``failure_rate``: (invalid + failed) / total records.
+        - ``records_per_busy_sec``: Records processed per second of batch processing (per worker rate).
+        - ``records_per_min``: Overall throughput in the window.
+        - ``latency_p50_sec``, ``latency_p95_sec``: Enqueue-to-processed latency percentiles (histogram bucket bounds).
+
+    :param window_minutes: Minutes of window
+    :return: JSON dict of format ``{ "window_minutes": <>, "generated_on": <>, "queues": { <queue>: { <context>: {...} } } }``
+
+    **Authors**: Gagandeep Singh
+    """
+    since = datetime.utcnow().replace(second=0, microsecond=0) - timedelta(minutes=window_minutes-1)
+
+    # Sum counters
+    windows = {}
+    for doc in QueueMetrics._get_collection().find({'minute': {'$gte': since}}):
+        win = windows.setdefault((doc['queue'], doc['context']), {
+            'batches': 0, 'processed': 0, 'ignored': 0, 'invalid': 0, 'failed': 0, 'busy_sec': 0.0, 'latency': {}
+        })
+        for key in ['batches', 'processed', 'ignored', 'invalid', 'failed', 'busy_sec']:
+            win[key] += doc.get(key, 0)
+        for bucket, count in doc.get('latency', {}).iteritems():
+            win['latency'][bucket] = win['latency'].get(bucket, 0) + count
+
+    queues = {}
+    for queue in QUEUE_MODELS.keys():
+        queues[queue] = get_queue_depth(queue)
+        for context, info in queues[queue].iteritems():
+            win = windows.get((queue, context), None)
+            if win is None:
+                info['window'] = None
+                continue
+
+            total = win['processed'] + win['ignored'] + win['invalid'] + win['failed']
+            info['window'] = {
+                'batches': win['batches'],
+                'processed': win['processed'],
+                'ignored': win['ignored'],
+                'invalid': win['invalid'],
+                'failed': win['failed'],
+                'failure_rate': round((win['invalid'] + win['failed']) / float(total), 4) if total else 0,
+                'records_per_busy_sec': round(total / win['busy_sec'], 2) if win['busy_sec'] else None,
+                'records_per_min': round(total / float(window_minutes), 2),
+                'latency_p50_sec': get_histogram_percentile(win['latency'], 50),
+                'latency_p95_sec': get_histogram_percentile(win['latency'], 95),
+            }
+
+    return {
+        'window_minutes': window_minutes,
+        'generated_on': timezone.now().isoformat(),
+        'queues': queues,
+    }
@@ -3,17 +3,106 @@
 # permission of Gagandeep Singh.
 from __future__ import unicode_literals
 
+from django.conf import settings
 from django.db import models
 from django.utils import timezone
 from django.core.exceptions import ValidationError
+from datetime import timedelta
+import random
 import ujson
+import uuid
 
 from mongoengine.document import *
 from mongoengine.fields import *
 
 from clients.models import Organization
+from storeroom import payload as payload_codecs
 
-class ImportRecord(Document):
+class PayloadDocument(Document):
+    """
+    Abstract mongo model for records carrying a JSON string payload. Payload can be stored as plain
+    string in ``data`` or compactly as binary in ``data_packed`` along with the ``codec`` used to encode it
+    (refer :mod:`storeroom.payload`). Payloads are encoded on validation as per ``settings.STOREROOM_PAYLOAD_CODEC``.
+
+    **Points**:
+
+        - Always read payload using :func:`get_data` or :attr:`data_json`; never read ``data`` directly.
+        - Payload can still be set on ``data`` and is packed on :func:`validate` (called by :func:`save`).
+          Call :func:`pack_data` explicitly when documents are inserted in bulk without validation.
+        - Use ``storeroom_pack_payloads`` command to encode/decode existing records.
+
+    .. warning::
+        This is only an abstract model. This does not map any collection.
+
+    **Authors**: Gagandeep Singh
+    """
+    data        = StringField(help_text="Plain payload string; None if payload is packed.")
+    data_packed = BinaryField(help_text="Encoded payload as per 'codec'.")
+    codec       = StringField(choices=payload_codecs.CH_CODEC, help_text="Codec of 'data_packed'. None means payload is plain.")
+
+    meta = {
+        'abstract': True,
+    }
+
+    def get_data(self):
+        """
+        Method to get payload string irrespective of how it is stored.
+
+        :return: Payload string
+
+        **Authors**: Gagandeep Singh
+        """
+        if self.data_packed is not None and self.codec not in [None, payload_codecs.CODEC_JSON]:
+            return payload_codecs.decode_payload(self.data_packed, self.codec)
+        return self.data
+
+    @property
+    def data_json(self):
+        """
+        Parsed payload. Payload is parsed only once per instance.
+
+        **Authors**: Gagandeep Singh
+        """
+        cached = self.__dict__.get('_data_json_cache', None)
+        if cached is None or cached[0] is not self.data or cached[1] is not self.data_packed:
+            cached = (self.data, self.data_packed, ujson.loads(self.get_data()))
+            self.__dict__['_data_json_cache'] = cached
+        return cached[2]
+
+    def pack_data(self, codec=None):
+        """
+        Method to encode plain payload into ``data_packed``.
+
+        :param codec: (Optional) Codec; default ``settings.STOREROOM_PAYLOAD_CODEC``. If ``json``,
+            payload is left plain.
+
+        **Authors**: Gagandeep Singh
+        """
+        codec = codec or getattr(settings, 'STOREROOM_PAYLOAD_CODEC', payload_codecs.CODEC_JSON)
+        if codec == payload_codecs.CODEC_JSON or self.data is None:
+            return
+
+        cached = self.__dict__.get('_data_json_cache', None)
+        self.data_packed = payload_codecs.encode_payload(self.data, codec)
+        self.codec = codec
+        self.data = None
+
+        # Parsed payload is still valid
+        if cached is not None:
+            self.__dict__['_data_json_cache'] = (self.data, self.data_packed, cached[2])
+
+    def clean(self):
+        """
+        Validates payload presence and packs it (refer :func:`pack_data`).
+
+        **Authors**: Gagandeep Singh
+        """
+        if self.data is None and self.data_packed is None:
+            raise ValidationError("Payload 'data' is required.")
+        self.pack_data()
+
+
+class ImportRecord(PayloadDocument):
     """
     Mongo model to store data of any schema. This model act as a buffer storage
     for bulk uploads where records can be stored and later picked-up by process
@@ -54,7 +143,8 @@ class ImportRecord(Document):
     context     = StringField(required=True, choices=CH_CONTEXT, help_text="Context of the record.")
     filename    = StringField(help_text="Uploaded file name that created this record.")
     identifiers = DictField(help_text="Identifiers that describe this data record.")
-    data        = StringField(required=True, help_text="JSON dict string containing actual data for the record. This is string because mongo does not allow dot in keys.")
+    # data      : JSON dict string containing actual data for the record. This is string because mongo does not allow dot in keys.
+    #             Refer PayloadDocument.
 
     status      = StringField(required=True, default=ST_NEW, choices=CH_STATUS, help_text="Status of this record.")
     error_message = StringField(help_text="Error details in case processing encountered any error.")
@@ -63,10 +153,6 @@ class ImportRecord(Document):
     created_on  = DateTimeField(default=timezone.now, required=True, confidential=True, help_text='Date on which this record was created in the database.')
     modified_on = DateTimeField(default=None, confidential=True, help_text='Date on which this record was modified.')
 
-    @property
-    def data_json(self):
-        return ujson.loads(self.data)
-
     @property
     def organization(self):
         return Organization.objects.get(id=self.organization_id)
@@ -79,6 +165,7 @@ class ImportRecord(Document):
             'context',
             'status',
             'created_on',
+            { 'fields':['context', 'status', 'created_on'], 'cls':False },
         ]
     }
 
@@ -105,7 +192,7 @@ class ImportRecord(Document):
         return super(ImportRecord, self).save(*args, **kwargs)
 
 
-class ResponseQueue(Document):
+class ResponseQueue(PayloadDocument):
     """
     Mongodb collection to store all submitted responses for all types of forms. All responses received
     are queued in this collection immediately without any pre-processing. These are then later picked-up by a
@@ -121,6 +208,10 @@ class ResponseQueue(Document):
         - ``status`` state chart is custom implemented similar to 'django-fsm'. However, this is not
           error-proof since ``status`` field is not PROTECTED. Please change state carefully and always
           use transition methods only.
+        - FAILED records are retried with exponential backoff upto ``settings.STOREROOM_QUEUE_RETRY['MAX_ATTEMPTS']``
+          after which they are moved to :class:`storeroom.models.ResponseDeadLetter`.
+        - ``attempt_count`` is incremented on every claim so that records whose processing never completes
+          (e.g. crashes the worker) are also moved to dead letters after ``MAX_ATTEMPTS`` (refer :func:`claim`).
 
     .. note::
         Responses which are successfully processed are **removed** from this collection.
@@ -149,11 +240,15 @@ class ResponseQueue(Document):
     )
 
     context     = StringField(required=True, choices=CH_CONTEXT, help_text='Context of the responses. This defines how the response must be processed.')
-    data        = StringField(required=True, help_text='Response data. This is mostly JSON string.')
+    # data      : Response data. This is mostly JSON string. Refer PayloadDocument.
 
     status      = StringField(required=True, default=ST_NEW, choices=CH_STATUS, help_text='Status of the record.')
     error_title = StringField(help_text='Error message if processing failed.')
     error_traceback = StringField(help_text='Error traceback used for debugging.')
+    claim_id    = StringField(default=None, help_text='Id of the batch that claimed this record for processing. Refer claim().')
+    lease_expires_on = DateTimeField(default=None, help_text='Datetime until which claim is valid. Records still PROCESSING after this are reclaimed.')
+    attempt_count = IntField(default=0, help_text='Number of processing attempts i.e. number of times record was claimed for processing.')
+    next_attempt_at = DateTimeField(default=None, help_text='Datetime after which FAILED record is retried. None means record is not retried.')
 
     created_on  = DateTimeField(required=True, default=timezone.now, help_text='Datetime on which this record was created or was received at the server.')
     modified_on = DateTimeField(default=None, help_text='Date on which this record was modified.')
@@ -164,17 +259,172 @@ class ResponseQueue(Document):
             'context',
             'status',
             'created_on',
-            'modified_on'
+            'modified_on',
+            { 'fields':['claim_id'], 'cls':False, 'sparse': True },
+            { 'fields':['status', 'lease_expires_on'], 'cls':False },
+            { 'fields':['status', 'next_attempt_at'], 'cls':False },
+            { 'fields':['context', 'status', 'created_on'], 'cls':False },
         ]
     }
 
     def __unicode__(self):
         return "{} - {}".format(self.context, self.pk)
 
+    @classmethod
+    def claim(cls, limit, lease_seconds=None, context=None):
+        """
+        Method to claim a batch of records for processing. Records are marked PROCESSING along
+        with a unique claim id and lease expiry in a single update conditioned on their claimable state;
+        hence a record is claimed by only one batch even if many processes claim together.
+
+        Claimable records are NEW records, PROCESSING records whose lease has expired
+        (stale claims of crashed workers) and FAILED records due for retry (refer :func:`trans_failed`).
+        Records not due yet are skipped using ``(status, next_attempt_at)`` index.
+
+        ``attempt_count`` of claimed records is incremented in the same update. Reclaimed records that have
+        already been attempted ``settings.STOREROOM_QUEUE_RETRY['MAX_ATTEMPTS']`` times are moved to
+        :class:`storeroom.models.ResponseDeadLetter` instead of being returned.
+
+        :param limit: Maximum number of records to be claimed
+        :param lease_seconds: (Optional) Lease duration; default ``settings.STOREROOM_QUEUE_LEASE``
+        :param context: (Optional) Claim records of this context only
+        :return: List of claimed :class:`storeroom.models.ResponseQueue` (status PROCESSING)
+
+        **Authors**: Gagandeep Singh
+        """
+        if limit <= 0:
+            return []
+
+        now = timezone.now()
+        lease_seconds = lease_seconds or settings.STOREROOM_QUEUE_LEASE
+        qry_claimable = {
+            '$or': [
+                {'status': cls.ST_NEW},
+                {'status': cls.ST_PROCESSING, 'lease_expires_on': {'$lt': now}},
+                {'status': cls.ST_FAILED, 'next_attempt_at': {'$lte': now}},
+            ]
+        }
+        if context is not None:
+            qry_claimable['context'] = context
+
+        collection = cls._get_collection()
+        list_ids = [
+            doc['_id'] for doc in collection.find(qry_claimable, {'_id': True}).sort('created_on', 1).limit(limit)
+        ]
+        if not len(list_ids):
+            return []
+
+        claim_id = uuid.uuid4().hex
+        qry_claimable['_id'] = {'$in': list_ids}
+        collection.update_many(
+            qry_claimable,
+            {
+                '$set': {
+                    'status': cls.ST_PROCESSING,
+                    'claim_id': claim_id,
+                    'lease_expires_on': now + timedelta(seconds=lease_seconds),
+                    'modified_on': now
+                },
+                '$inc': {'attempt_count': 1}
+            }
+        )
+
+        max_attempts = settings.STOREROOM_QUEUE_RETRY['MAX_ATTEMPTS']
+        list_claimed = []
+        list_dead = []
+        for resp_queue in cls.objects(claim_id=claim_id):
+            if resp_queue.attempt_count > max_attempts:
+                # Lease expired in every attempt; processing never completes
+                resp_queue.attempt_count = max_attempts
+                resp_queue.error_title = "Processing did not complete in {} attempt(s); lease expired.".format(max_attempts)
+                resp_queue.error_traceback = resp_queue.error_traceback or ''
+                list_dead.append(resp_queue)
+            else:
+                list_claimed.append(resp_queue)
+        ResponseDeadLetter.bury(list_dead)
+
+        return list_claimed
+
+    @classmethod
+    def claim_lanes(cls, limit, lease_seconds=None):
+        """
+        Method to claim a batch of records with weighted fair share among contexts (priority lanes;
+        refer ``settings.STOREROOM_QUEUE_LANES``) so that a large backlog of one context does not starve
+        others. Each lane is claimed upto its share ``limit * weight / total weight`` (atleast 1);
+        capacity left unused by idle lanes is then given to busy lanes in order of weight.
+
+        :param limit: Maximum number of records to be claimed
+        :param lease_seconds: (Optional) Lease duration; default ``settings.STOREROOM_QUEUE_LEASE``
+        :return: List of claimed :class:`storeroom.models.ResponseQueue` (status PROCESSING)
+
+        **Authors**: Gagandeep Singh
+        """
+        lanes = settings.STOREROOM_QUEUE_LANES
+        list_contexts = sorted(
+            [context for context, _ in cls.CH_CONTEXT],
+            key = lambda context: -lanes.get(context, {}).get('WEIGHT', 1)
+        )
+        total_weight = float(sum(lanes.get(context, {}).get('WEIGHT', 1) for context in list_contexts))
+
+        list_claimed = []
+        list_busy = []
+        for context in list_contexts:
+            share = max(int(limit * lanes.get(context, {}).get('WEIGHT', 1) / total_weight), 1)
+            share = min(share, limit - len(list_claimed))
+            claimed = cls.claim(share, lease_seconds, context=context)
+            list_claimed += claimed
+            if share and len(claimed) == share:
+                list_busy.append(context)
+
+        # Work conserving: unused share goes to busy lanes
+        for context in list_busy:
+            if len(list_claimed) >= limit:
+                break
+            list_claimed += cls.claim(limit - len(list_claimed), lease_seconds, context=context)
+
+        return list_claimed
+
+    @staticmethod
+    def get_retry_delay(attempt_count):
+        """
+        Returns delay in seconds before next attempt after ``attempt_count`` failed attempts:
+        ``BACKOFF_BASE * 2^(attempt_count-1)`` capped at ``BACKOFF_MAX`` with upto 10% jitter so that
+        records failed together are not retried together (refer ``settings.STOREROOM_QUEUE_RETRY``).
+
+        **Authors**: Gagandeep Singh
+        """
+        config = settings.STOREROOM_QUEUE_RETRY
+        delay = min(config['BACKOFF_BASE'] * (2 ** max(attempt_count-1, 0)), config['BACKOFF_MAX'])
+        return delay * (1 + random.random() * 0.1)
+
+    @property
+    def is_dead(self):
+        """
+        True if record has failed and will not be retried.
+
+        **Authors**: Gagandeep Singh
+        """
+        return self.status == ResponseQueue.ST_FAILED and self.next_attempt_at is None
+
+    @classmethod
+    def delete_processed(cls, list_ids):
+        """
+        Method to remove successfully processed records in a single delete.
+
+        :param list_ids: List of record ids
+        :return: Number of records deleted
+
+        **Authors**: Gagandeep Singh
+        """
+        if not len(list_ids):
+            return 0
+        return cls._get_collection().delete_many({'_id': {'$in': list(list_ids)}}).deleted_count
+
     # --- Transitions ---
     def trans_process(self):
         """
-        Transition method to change state from NEW to PROCESSING.
+        Transition method to change state from NEW to PROCESSING. This is an attempt hence
+        ``attempt_count`` is incremented.
 
         **Authors**: Gagandeep Singh
         """
@@ -182,10 +432,19 @@ class ResponseQueue(Document):
             raise ValidationError("Invalid Transition")
 
         self.status = ResponseQueue.ST_PROCESSING
+        self.attempt_count = (self.attempt_count or 0) + 1
 
-    def trans_failed(self, error_title, error_traceback):
+    def trans_failed(self, error_title, error_traceback, retry=True):
         """
-        Transition method to change state from PROCESSING to FAILED.
+        Transition method to change state from PROCESSING to FAILED. Retry is scheduled with
+        exponential backoff (refer :func:`get_retry_delay`) unless attempts are exhausted or ``retry``
+        is False; such records are dead (refer :attr:`is_dead`) and must be moved to
+        :class:`storeroom.models.ResponseDeadLetter`. Current attempt is already counted in ``attempt_count``
+        (refer :func:`claim` & :func:`trans_process`).
+
+        :param error_title: Error message
+        :param error_traceback: Error traceback
+        :param retry: False if failure is permanent (e.g. invalid response)
 
         **Authors**: Gagandeep Singh
         """
@@ -195,6 +454,13 @@ class ResponseQueue(Document):
         self.status = ResponseQueue.ST_FAILED
         self.error_title = error_title
         self.error_traceback = error_traceback
+        self.claim_id = None
+        self.lease_expires_on = None
+
+        if retry and self.attempt_count < settings.STOREROOM_QUEUE_RETRY['MAX_ATTEMPTS']:
+            self.next_attempt_at = timezone.now() + timedelta(seconds=ResponseQueue.get_retry_delay(self.attempt_count))
+        else:
+            self.next_attempt_at = None
 
     # --- /Transitions ---
 
@@ -224,3 +490,134 @@ class ResponseQueue(Document):
 
         return super(ResponseQueue, self).delete(**write_concern)
 
+
+class ResponseDeadLetter(PayloadDocument):
+    """
+    Mongodb collection of dead responses i.e. :class:`storeroom.models.ResponseQueue` records that
+    failed permanently (invalid) or exhausted all retry attempts. Dead letters are not processed;
+    they are re-enqueued in bulk using ``storeroom_replay_dead_letters`` command after the cause has been fixed.
+
+    **Authors**: Gagandeep Singh
+    """
+    context     = StringField(required=True, choices=ResponseQueue.CH_CONTEXT, help_text='Context of the response.')
+    attempt_count = IntField(default=0, help_text='Number of processing attempts.')
+    error_title = StringField(help_text='Error message of last attempt.')
+    error_traceback = StringField(help_text='Error traceback of last attempt.')
+
+    queued_on   = DateTimeField(help_text='Datetime on which response was originally queued.')
+    created_on  = DateTimeField(required=True, default=timezone.now, help_text='Datetime on which response was moved to dead letters.')
+
+    meta = {
+        'ordering': ['created_on'],
+        'indexes': [
+            { 'fields':['context', 'created_on'], 'cls':False },
+        ]
+    }
+
+    def __unicode__(self):
+        return "{} - {}".format(self.context, self.pk)
+
+    @classmethod
+    def bury(cls, list_resp_queue):
+        """
+        Method to move dead queue records to dead letters with a single insert & delete.
+
+        :param list_resp_queue: List of :class:`storeroom.models.ResponseQueue`
+        :return: Number of records moved
+
+        **Authors**: Gagandeep Singh
+        """
+        if not len(list_resp_queue):
+            return 0
+
+        list_docs = []
+        for resp_queue in list_resp_queue:
+            dead = cls(
+                context = resp_queue.context,
+                data = resp_queue.data,
+                data_packed = resp_queue.data_packed,
+                codec = resp_queue.codec,
+                attempt_count = resp_queue.attempt_count,
+                error_title = resp_queue.error_title,
+                error_traceback = resp_queue.error_traceback,
+                queued_on = resp_queue.created_on
+            )
+            list_docs.append(dead.to_mongo())
+
+        cls._get_collection().insert_many(list_docs, ordered=False)
+        ResponseQueue._get_collection().delete_many({'_id': {'$in': [resp_queue.pk for resp_queue in list_resp_queue]}})
+        return len(list_docs)
+
+    @classmethod
+    def replay(cls, list_dead):
+        """
+        Method to re-enqueue dead letters as NEW queue records (with attempts reset) with a single
+        insert & delete.
+
+        :param list_dead: List of :class:`storeroom.models.ResponseDeadLetter`
+        :return: Number of records re-enqueued
+
+        **Authors**: Gagandeep Singh
+        """
+        if not len(list_dead):
+            return 0
+
+        list_docs = []
+        for dead in list_dead:
+            resp_queue = ResponseQueue(
+                context = dead.context,
+                data = dead.data,
+                data_packed = dead.data_packed,
+                codec = dead.codec
+            )
+            list_docs.append(resp_queue.to_mongo())
+
+        ResponseQueue._get_collection().insert_many(list_docs, ordered=False)
+        cls._get_collection().delete_many({'_id': {'$in': [dead.pk for dead in list_dead]}})
+        return len(list_docs)
+
+
+
+class QueueMetrics(Document):
+    """
+    Mongodb collection of per-minute processing counters of storeroom queues (:class:`storeroom.models.ResponseQueue`
+    & :class:`storeroom.models.ImportRecord`). Counters are incremented by workers once per batch
+    (refer :class:`storeroom.metrics.BatchMetrics`) so that statistics can be reported without scanning queues.
+
+    **Points**:
+
+        - One document per ``(queue, context, minute)``; ``minute`` is UTC datetime truncated to minute.
+        - ``latency`` is histogram of enqueue-to-processed seconds of format ``{ "<upper bound>": <count>, ... }``
+          (refer :data:`storeroom.metrics.LATENCY_BUCKETS`).
+        - Documents expire after ``settings.STOREROOM_METRICS_RETENTION`` seconds.
+
+    **Authors**: Gagandeep Singh
+    """
+    QU_RESPONSE_QUEUE = 'response_queue'
+    QU_IMPORT_RECORD = 'import_record'
+    CH_QUEUE = (
+        (QU_RESPONSE_QUEUE, 'Response Queue'),
+        (QU_IMPORT_RECORD, 'Import Record'),
+    )
+
+    queue       = StringField(required=True, choices=CH_QUEUE, help_text='Queue collection.')
+    context     = StringField(required=True, help_text='Context of the records of the queue.')
+    minute      = DateTimeField(required=True, help_text='UTC minute of the counters.')
+
+    batches     = IntField(default=0, help_text='Number of batches processed.')
+    processed   = IntField(default=0, help_text='Number of records processed successfully.')
+    ignored     = IntField(default=0, help_text='Number of records ignored (e.g. duplicates).')
+    invalid     = IntField(default=0, help_text='Number of records failed validation.')
+    failed      = IntField(default=0, help_text='Number of records failed processing.')
+    busy_sec    = FloatField(default=0, help_text='Total seconds spent in processing batches.')
+    latency     = DictField(help_text='Histogram of enqueue-to-processed latency in seconds.')
+
+    meta = {
+        'indexes': [
+            { 'fields':['queue', 'context', 'minute'], 'cls':False, 'unique': True },
+            { 'fields':['minute'], 'cls':False, 'expireAfterSeconds': settings.STOREROOM_METRICS_RETENTION },
+        ]
+    }
+
+    def __unicode__(self):
+        return "{} - {} - {}".format(self.queue, self.context, self.minute)
@@ -0,0 +1,253 @@
+# Copyright (C) 2017 Feedvay (Gagandeep Singh: singh.gagan144@gmail.com) - All Rights Reserved
+# Content in this document can not be copied and/or distributed without the express
+# permission of Gagandeep Singh.
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+import json
+import os
+import signal
+import time
+import traceback
+
+from form_builder.models import Form
+from storeroom.models import ResponseQueue, ResponseDeadLetter, QueueMetrics
+from storeroom.metrics import BatchMetrics
+from surveys.models import SurveyPhase
+from feedback import operations as ops_feedback
+from surveys import operations as ops_surveys
+from utilities.db_mongo import reconnect_mongo
+
+# ---------- Validation ----------
+def get_response_form(context, data, cache):
+    """
+    Method to get form of a queued response. Forms are cached in ``cache`` by their lookup keys.
+
+    :param context: Response context; refer :class:`storeroom.models.ResponseQueue`
+    :param data: Parsed response json
+    :param cache: Dictionary used as cache across calls
+    :return: Form or None if it cannot be determined.
+
+    **Authors**: Gagandeep Singh
+    """
+    if context == ResponseQueue.CT_SURVEY_RESPONSE:
+        key = (context, data.get('survey_uid'), data.get('phase_id'))
+    elif context == ResponseQueue.CT_BSP_FEEDBACK:
+        key = (context, data.get('form_id'))
+    else:
+        return None
+
+    if key not in cache:
+        try:
+            if context == ResponseQueue.CT_SURVEY_RESPONSE:
+                cache[key] = SurveyPhase.objects.select_related('form').get(
+                    id = data['phase_id'],
+                    survey__survey_uid = data['survey_uid']
+                ).form
+            else:
+                cache[key] = Form.objects.get(id=data['form_id'])
+        except (ObjectDoesNotExist, KeyError, ValueError):
+            cache[key] = None
+
+    return cache[key]
+
+def validate_responses(list_resp_queue):
+    """
+    Method to validate queued responses against their forms. Responses are grouped by form and
+    each group is validated in a single batch (refer :class:`form_builder.response_validation.ResponseValidator`).
+    Responses for older form versions are not validated.
+
+    :param list_resp_queue: List of :class:`storeroom.models.ResponseQueue`
+    :return: Tuple (lookup_data, lookup_errors, lookup_resp_form) of format
+        ``({ <pk>: <parsed data> }, { <pk>: <list errors> }, { <pk>: <form> })``
+
+    **Authors**: Gagandeep Singh
+    """
+    lookup_data = {}
+    lookup_form = {}
+    lookup_resp_form = {}
+    groups = {}     # Format: { <form_id>: (<form>, [<pk>, ...], [<data>, ...]) }
+
+    for resp_queue in list_resp_queue:
+        try:
+            data = resp_queue.data_json
+        except ValueError:
+            continue    # Will fail while processing
+        lookup_data[resp_queue.pk] = data
+
+        form = get_response_form(resp_queue.context, data, lookup_form)
+        if form is not None:
+            lookup_resp_form[resp_queue.pk] = form
+        if form is None or str(form.version) != data.get('form_version', None):
+            continue
+
+        group = groups.setdefault(form.id, (form, [], []))
+        group[1].append(resp_queue.pk)
+        group[2].append(data)
+
+    lookup_errors = {}
+    for form, list_pk, list_data in groups.itervalues():
+        list_batch_errors = form.get_response_validator().validate_batch(list_data)
+        for pk, errors in zip(list_pk, list_batch_errors):
+            if len(errors):
+                lookup_errors[pk] = errors
+
+    return lookup_data, lookup_errors, lookup_resp_form
+
+# ---------- Processing ----------
+def process_responses_batch(list_resp_queue):
+    """
+    Method to process a batch of claimed queued responses (refer :func:`storeroom.models.ResponseQueue.claim`).
+
+    **Points**:
+
+        - All responses are first validated against their forms.
+        - Survey responses are written in bulk using :func:`surveys.operations.save_survey_responses_bulk`.
+        - BSP feedback responses are processed one by one since each creates rating & review as well.
+        - Processed (saved or ignored) records are removed with a single delete. Failed records are
+          marked failed and scheduled for retry (refer :func:`storeroom.models.ResponseQueue.trans_failed`).
+          Invalid records and records that exhausted retries are moved to :class:`storeroom.models.ResponseDeadLetter`.
+        - Outcome counters & latencies are recorded in :class:`storeroom.models.QueueMetrics`.
+
+    :param list_resp_queue: List of :class:`storeroom.models.ResponseQueue` with status PROCESSING
+    :return: JSON dict of statistics
+
+    **Authors**: Gagandeep Singh
+    """
+    start = time.time()
+    stats = {
+        'count': 0,
+        'ignored': 0,
+        'invalid': 0,
+        'failed': 0,
+        'dead': 0
+    }
+
+    metrics = BatchMetrics(QueueMetrics.QU_RESPONSE_QUEUE)
+    lookup_data, lookup_errors, lookup_resp_form = validate_responses(list_resp_queue)
+
+    lookup_failed = {}      # Format: { <pk>: (<error title>, <traceback>) }
+    lookup_outcome = {}     # Format: { <pk>: <metrics outcome> }
+    list_processed_ids = []
+    list_survey_items = []
+
+    for resp_queue in list_resp_queue:
+        pk = resp_queue.pk
+        data = lookup_data.get(pk, None)
+        if data is None:
+            lookup_failed[pk] = ("Invalid response: data is not a valid json.", resp_queue.get_data())
+            lookup_outcome[pk] = 'failed'
+            stats['failed'] += 1
+            continue
+
+        errors = lookup_errors.get(pk, None)
+        if errors:
+            lookup_failed[pk] = ("Invalid response: {} error(s) found.".format(len(errors)), json.dumps(errors, indent=4))
+            lookup_outcome[pk] = 'invalid'
+            stats['invalid'] += 1
+            continue
+
+        if resp_queue.context == ResponseQueue.CT_SURVEY_RESPONSE:
+            list_survey_items.append((pk, data))
+        elif resp_queue.context == ResponseQueue.CT_BSP_FEEDBACK:
+            try:
+                with transaction.atomic():
+                    is_success = ops_feedback.save_bsp_feedback_response(data, form=lookup_resp_form.get(pk, None))
+                stats['count' if is_success else 'ignored'] += 1
+                lookup_outcome[pk] = 'processed' if is_success else 'ignored'
+                list_processed_ids.append(pk)
+            except Exception as ex:
+                lookup_failed[pk] = (ex.message, traceback.format_exc())
+                lookup_outcome[pk] = 'failed'
+                stats['failed'] += 1
+        else:
+            lookup_failed[pk] = ("Operation for '{}' response not implemented".format(resp_queue.context), '')
+            lookup_outcome[pk] = 'failed'
+            stats['failed'] += 1
+
+    # Survey responses in bulk
+    if len(list_survey_items):
+        for pk, result in ops_surveys.save_survey_responses_bulk(list_survey_items).iteritems():
+            if result is True:
+                stats['count'] += 1
+                lookup_outcome[pk] = 'processed'
+                list_processed_ids.append(pk)
+            elif result is False:
+                stats['ignored'] += 1
+                lookup_outcome[pk] = 'ignored'
+                list_processed_ids.append(pk)
+            else:
+                lookup_failed[pk] = result
+                lookup_outcome[pk] = 'failed'
+                stats['failed'] += 1
+
+    # Remove processed, mark failed & bury dead
+    ResponseQueue.delete_processed(list_processed_ids)
+    list_dead = []
+    for resp_queue in list_resp_queue:
+        outcome = lookup_outcome.get(resp_queue.pk, None)
+        failure = lookup_failed.get(resp_queue.pk, None)
+        if failure is not None:
+            resp_queue.trans_failed(failure[0], failure[1], retry=(outcome != 'invalid'))
+            if resp_queue.is_dead:
+                list_dead.append(resp_queue)
+            else:
+                resp_queue.save()
+
+        if outcome is not None:
+            metrics.add(resp_queue.context, outcome, resp_queue.created_on)
+    stats['dead'] = ResponseDeadLetter.bury(list_dead)
+    metrics.save()
+
+    elapsed = time.time() - start
+    total = len(list_resp_queue)
+    stats['time_sec'] = round(elapsed, 3)
+    stats['responses_per_sec'] = round(total / elapsed, 2) if elapsed and total else 0
+
+    return stats
+
+# ---------- Worker ----------
+def run_queue_worker(stop_event, batch_size=100, lease_seconds=None, idle_sleep=5, log=None):
+    """
+    Method to run a worker that continuously claims & processes batches of queued responses until
+    ``stop_event`` is set or process receives SIGTERM/SIGINT. Current batch is always completed before exit.
+    Records of a batch interrupted by crash are reclaimed by other workers once their lease expires
+    (refer :func:`storeroom.models.ResponseQueue.claim`).
+
+    This is the target of worker processes of ``storeroom_worker`` command and must be called in a
+    freshly forked process.
+
+    :param stop_event: ``multiprocessing.Event`` shared by all workers to signal shutdown
+    :param batch_size: Maximum number of records claimed per batch
+    :param lease_seconds: (Optional) Claim lease; default ``settings.STOREROOM_QUEUE_LEASE``
+    :param idle_sleep: Seconds to wait when queue is empty
+    :param log: (Optional) Callable accepting a message string
+
+    **Authors**: Gagandeep Singh
+    """
+    log = log or (lambda message: None)
+    pid = os.getpid()
+
+    # Connections inherited from parent must not be shared
+    reconnect_mongo()
+
+    stopping = [False]
+    def on_signal(signum, frame):
+        stopping[0] = True
+    signal.signal(signal.SIGTERM, on_signal)
+    signal.signal(signal.SIGINT, on_signal)
+
+    log("[{}] Worker started.".format(pid))
+    while not stopping[0] and not stop_event.is_set():
+        try:
+            list_resp_queue = ResponseQueue.claim_lanes(batch_size, lease_seconds)
+            if not len(list_resp_queue):
+                stop_event.wait(idle_sleep)
+                continue
+
+            stats = process_responses_batch(list_resp_queue)
+            log("[{}] Batch completed! {}".format(pid, stats))
+        except Exception:
+            log("[{}] Batch failed!\n{}".format(pid, traceback.format_exc()))
+            stop_event.wait(idle_sleep)
+
+    log("[{}] Worker stopped.".format(pid))
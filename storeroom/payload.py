@@ -0,0 +1,47 @@
+# Copyright (C) 2017 Feedvay (Gagandeep Singh: singh.gagan144@gmail.com) - All Rights Reserved
+# Content in this document can not be copied and/or distributed without the express
+# permission of Gagandeep Singh.
+import zlib
+
+# Codecs of stored payloads
+CODEC_JSON = 'json'     # Plain JSON string stored in 'data'
+CODEC_ZLIB = 'zlib'     # zlib compressed UTF-8 JSON stored as binary in 'data_packed'
+CH_CODEC = (
+    (CODEC_JSON, 'JSON'),
+    (CODEC_ZLIB, 'zlib JSON'),
+)
+
+ZLIB_LEVEL = 6
+
+def encode_payload(text, codec):
+    """
+    Method to encode a payload string as per the codec.
+
+    :param text: Payload string (mostly JSON)
+    :param codec: Codec; one of :data:`CH_CODEC` except ``json``
+    :return: Encoded bytes
+
+    **Authors**: Gagandeep Singh
+    """
+    if isinstance(text, unicode):
+        text = text.encode('utf-8')
+
+    if codec == CODEC_ZLIB:
+        return zlib.compress(text, ZLIB_LEVEL)
+    else:
+        raise ValueError("Unknown payload codec '{}'.".format(codec))
+
+def decode_payload(packed, codec):
+    """
+    Method to decode payload bytes encoded by :func:`storeroom.payload.encode_payload`.
+
+    :param packed: Encoded bytes
+    :param codec: Codec used to encode
+    :return: Payload unicode string
+
+    **Authors**: Gagandeep Singh
+    """
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(packed).decode('utf-8')
+    else:
+        raise ValueError("Unknown payload codec '{}'.".format(codec))
@@ -0,0 +1,10 @@
+# Copyright (C) 2017 Feedvay (Gagandeep Singh: singh.gagan144@gmail.com) - All Rights Reserved
+# Content in this document can not be copied and/or distributed without the express
+# permission of Gagandeep Singh.
+from django.conf.urls import url, include
+
+from storeroom import views
+
+urlpatterns = [
+    url(r'^queue-stats/$', views.queue_stats, name='storeroom_queue_stats'),
+]
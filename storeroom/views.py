@@ -3,4 +3,28 @@
 # permission of Gagandeep Singh.
 from django.shortcuts import render
 
-# Create your views here.
+from accounts.decorators import staff_user_only
+from storeroom.metrics import get_queue_stats
+from utilities.api_utils import ApiResponse
+
+@staff_user_only
+def queue_stats(request):
+    """
+    API view for staff to get instrumentation of storeroom queues (refer :func:`storeroom.metrics.get_queue_stats`).
+
+    **Type**: GET
+
+    **Parameters**:
+
+        - ``window``: (Optional; default 60) Minutes of processing statistics window.
+
+    **Authors**: Gagandeep Singh
+    """
+    try:
+        window = int(request.GET.get('window', 60))
+        if window <= 0:
+            raise ValueError()
+    except ValueError:
+        return ApiResponse(status=ApiResponse.ST_BAD_REQUEST, message="Invalid 'window'.").gen_http_response()
+
+    return ApiResponse(status=ApiResponse.ST_SUCCESS, message='Ok.', stats=get_queue_stats(window_minutes=window)).gen_http_response()
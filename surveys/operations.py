@@ -2,15 +2,22 @@
 # Content in this document can not be copied and/or distributed without the express
 # permission of Gagandeep Singh.
 from django.utils import timezone
+import traceback
 
 from django.contrib.auth.models import User
-from surveys.models import Survey, SurveyResponse
+from pymongo.errors import BulkWriteError
+from surveys.models import Survey, SurveyPhase, SurveyResponse
 
-def save_survey_response(response_json):
+# Mongo error code for duplicate key
+MONGO_DUPLICATE_KEY_ERROR = 11000
+
+def save_survey_response(response_json, form=None):
     """
     Method to save survey response.
 
     :param response_json: JSON dict data that has to be processed.
+    :param form: (Optional) Already fetched form of the survey phase; used to avoid queries when
+        processing responses in batch.
     :return: True if processing was successful, False if response was already processed.
 
     **Note**:
@@ -24,14 +31,12 @@ def save_survey_response(response_json):
     """
     # Bring out regular variables
     response_uid = response_json['response_uid']
-    form_version = response_json['form_version']
 
     # Fetch survey, phase, form as per the survey uid
     survey = Survey.objects.get(survey_uid=response_json['survey_uid'])
     phase = survey.phases.get(id=response_json['phase_id'])
-    form = phase.form
-
-    version_obsolete = False if str(form.version) == form_version else True
+    if form is None or form.id != phase.form_id:
+        form = phase.form
 
     # Get User who submitted this response
     user_id = response_json['user']['user_id']
@@ -40,42 +45,139 @@ def save_survey_response(response_json):
     # Check if response is already created
     if not SurveyResponse.objects.filter(response_uid=response_uid).count():
         # Create new entry
-        survey_response = SurveyResponse.objects.create(
-            survey_uid      = str(survey.survey_uid),
-            phase_id        = str(phase.id),
-            form_id         = str(form.id),
-            form_version    = form_version,
-            version_obsolete = version_obsolete,
-
-            app_version     = response_json['app_version'],
-            user            = SurveyResponse.UserInformation(**response_json['user']) if response_json['user'] else None,
-            end_point_info  = SurveyResponse.EndPointInformation(**response_json['end_point_info']),
-            language_code   = response_json["language_code"],
-
-            response_uid    = response_uid,
-            constants       = response_json.get('constants', None),
-            answers         = response_json['answers'],
-            answers_other   = response_json['answers_other'],
-            calculated_fields = response_json['calculated_fields'],
-
-            timezone_offset = response_json['timezone_offset'],
-            response_date   = timezone.datetime.strptime(response_json['response_date'],"%Y-%m-%dT%H:%M:%S"),
-            start_time      = timezone.datetime.strptime(response_json['start_time'],"%Y-%m-%dT%H:%M:%S"),
-            end_time        = timezone.datetime.strptime(response_json['end_time'],"%Y-%m-%dT%H:%M:%S"),
-            duration        = response_json['duration'],
-
-            location        = SurveyResponse.LocationInformation(**response_json['location']) if response_json['location'] else None,
-
-            flags           = SurveyResponse.ResponseFlags(
-                                   description_read = response_json['flags']['description_read'],
-                                   instructions_read = response_json['flags']['instructions_read'],
-                                   suspect = response_json['flags']['suspect'],
-                                   suspect_reasons = response_json['flags']['suspect_reasons']
-                              )
-        )
+        survey_response = build_survey_response(response_json, survey, phase, form)
+        survey_response.save(force_insert=True, form=form)
 
         # Processing completed! Return now
         return True
     else:
         # Response has already been processed; Ignore
         return False
+
+def build_survey_response(response_json, survey, phase, form):
+    """
+    Method to create (unsaved) survey response document from response json.
+
+    :param response_json: JSON dict of the response.
+    :param survey: Instance of :class:`surveys.models.Survey`
+    :param phase: Instance of :class:`surveys.models.SurveyPhase`
+    :param form: Form of the phase
+    :return: Unsaved instance of :class:`surveys.models.SurveyResponse`
+
+    **Authors**: Gagandeep Singh
+    """
+    return SurveyResponse(
+        survey_uid      = str(survey.survey_uid),
+        phase_id        = str(phase.id),
+        form_id         = str(form.id),
+        form_version    = response_json['form_version'],
+        version_obsolete = str(form.version) != response_json['form_version'],
+
+        app_version     = response_json['app_version'],
+        user            = SurveyResponse.UserInformation(**response_json['user']) if response_json['user'] else None,
+        end_point_info  = SurveyResponse.EndPointInformation(**response_json['end_point_info']),
+        language_code   = response_json["language_code"],
+
+        response_uid    = response_json['response_uid'],
+        constants       = response_json.get('constants', None),
+        answers         = response_json['answers'],
+        answers_other   = response_json['answers_other'],
+        calculated_fields = response_json['calculated_fields'],
+
+        timezone_offset = response_json['timezone_offset'],
+        response_date   = timezone.datetime.strptime(response_json['response_date'],"%Y-%m-%dT%H:%M:%S"),
+        start_time      = timezone.datetime.strptime(response_json['start_time'],"%Y-%m-%dT%H:%M:%S"),
+        end_time        = timezone.datetime.strptime(response_json['end_time'],"%Y-%m-%dT%H:%M:%S"),
+        duration        = response_json['duration'],
+
+        location        = SurveyResponse.LocationInformation(**response_json['location']) if response_json['location'] else None,
+
+        flags           = SurveyResponse.ResponseFlags(
+                               description_read = response_json['flags']['description_read'],
+                               instructions_read = response_json['flags']['instructions_read'],
+                               suspect = response_json['flags']['suspect'],
+                               suspect_reasons = response_json['flags']['suspect_reasons']
+                          )
+    )
+
+def save_survey_responses_bulk(list_items):
+    """
+    Method to save a batch of survey responses. Surveys, phases, forms and users of all responses are
+    fetched in bulk and responses are written with a single unordered ``insert_many``.
+
+    **Points**:
+
+        - Duplicate responses are detected by unique index on ``response_uid`` instead of
+          a lookup per response. Duplicates (including those within the batch) are ignored.
+        - Responses whose survey, phase or user does not exist or which fails validation
+          are not written; their exception is returned instead.
+
+    :param list_items: List of tuple ``(<key>, <response_json>)``. Key can be anything hashable
+        identifying the item for the caller (for example, queue item id).
+    :return: Dictionary ``{ <key>: <result> }`` where result is True if response was saved, False if it
+        was already processed and tuple ``(<error title>, <traceback>)`` if it failed.
+
+    **Authors**: Gagandeep Singh
+    """
+    results = {}
+
+    # (1) Resolve surveys, phases, forms & users in bulk
+    set_survey_uids = set()
+    set_phase_ids = set()
+    set_user_ids = set()
+    for key, response_json in list_items:
+        try:
+            set_survey_uids.add(response_json['survey_uid'])
+            set_phase_ids.add(int(response_json['phase_id']))
+            set_user_ids.add(int(response_json['user']['user_id']))
+        except (KeyError, TypeError, ValueError):
+            pass    # Will fail while building
+
+    lookup_survey = { str(survey.survey_uid): survey for survey in Survey.objects.filter(survey_uid__in=set_survey_uids) }
+    lookup_phase = { phase.id: phase for phase in SurveyPhase.objects.select_related('form').filter(id__in=set_phase_ids) }
+    set_existing_user_ids = set(User.objects.filter(id__in=set_user_ids).values_list('id', flat=True))
+
+    # (2) Build documents in memory
+    list_keys = []
+    list_docs = []
+    for key, response_json in list_items:
+        try:
+            survey = lookup_survey.get(str(response_json['survey_uid']), None)
+            if survey is None:
+                raise Survey.DoesNotExist("Survey '{}' does not exist.".format(response_json['survey_uid']))
+
+            phase = lookup_phase.get(int(response_json['phase_id']), None)
+            if phase is None or phase.survey_id != survey.id:
+                raise SurveyPhase.DoesNotExist("Phase '{}' does not exist in the survey.".format(response_json['phase_id']))
+
+            if int(response_json['user']['user_id']) not in set_existing_user_ids:
+                raise User.DoesNotExist("User '{}' does not exist.".format(response_json['user']['user_id']))
+
+            survey_response = build_survey_response(response_json, survey, phase, phase.form)
+            survey_response.prepare_for_save(form=phase.form)
+            survey_response.validate()
+
+            list_keys.append(key)
+            list_docs.append(survey_response.to_mongo())
+        except Exception as ex:
+            results[key] = (ex.message or str(ex), traceback.format_exc())
+
+    # (3) Write in bulk
+    if len(list_docs):
+        lookup_write_errors = {}
+        try:
+            SurveyResponse._get_collection().insert_many(list_docs, ordered=False)
+        except BulkWriteError as ex:
+            for error in ex.details.get('writeErrors', []):
+                lookup_write_errors[error['index']] = error
+
+        for idx, key in enumerate(list_keys):
+            error = lookup_write_errors.get(idx, None)
+            if error is None:
+                results[key] = True
+            elif error['code'] == MONGO_DUPLICATE_KEY_ERROR:
+                results[key] = False
+            else:
+                results[key] = (error['errmsg'], str(error))
+
+    return results
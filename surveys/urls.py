@@ -8,4 +8,5 @@ from surveys import views
 urlpatterns = [
     url(r'^(?P<survey_uid>\w+)(/|/(?P<phase_id>[0-9]+)/)$', views.open_survey_form, name='surveys_open_form'),
     url(r'^submit-response/$', views.submit_survey_response, name='surveys_submit_response'),
+    url(r'^submit-responses-batch/$', views.submit_survey_responses_batch, name='surveys_submit_responses_batch'),
 ]
\ No newline at end of file
@@ -7,6 +7,8 @@ from django.db.models import Q
 from django.utils import timezone
 from django_fsm import TransitionNotAllowed
 from django.db import transaction
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
 
 import json
 import copy
@@ -23,7 +25,9 @@ from accounts.models import RegisteredUser
 from accounts.decorators import registered_user_only, organization_console
 from accounts.utils import lookup_permission
 from storeroom.models import ResponseQueue
-from utilities.api_utils import ApiResponse
+from storeroom.buffer import enqueue_response, enqueue_responses, get_backpressure, BufferWriteError
+from utilities.api_utils import ApiResponse, load_json_batch_payload
+from utilities.cache_utils import TTLCache
 
 # TODO: Mobile/Source validation firewall
 def open_survey_form(request, survey_uid, phase_id=None):
@@ -46,12 +50,13 @@ def open_survey_form(request, survey_uid, phase_id=None):
             if survey.start_date <= now <= survey.end_date:
                 #TODO: Audience filter
 
-                # Obtain phase
+                # Obtain phase along with form & theme
+                qry_phases = survey.phases.select_related('form__theme_skin__theme')
                 if survey.type == Survey.TYPE_SIMPLE:
-                    phase = survey.phases[0]
+                    phase = qry_phases[0]
                 else:
                     try:
-                        phase = survey.phases.filter(id=phase_id)
+                        phase = qry_phases.get(id=phase_id)
                     except SurveyPhase.DoesNotExist:
                         raise Survey.DoesNotExist("Invalid survey phase.")
 
@@ -68,9 +73,13 @@ def open_survey_form(request, survey_uid, phase_id=None):
                     'title': survey.title,
                     'theme': form.theme_skin.theme,
                     'skin': form.theme_skin,
-                    'lookup_translations': form.get_translation_lookup(),
+                    'lookup_translations': SimpleLazyObject(form.get_translation_lookup),  # Not required if questionnaire is cached
                     'DEFAULT_LANGUAGE_CODE': Language.DEFAULT_LANGUAGE_CODE,    # Fallback language incase translation not found
 
+                    # Rendered questionnaire cache
+                    'form_render_key': form.get_render_cache_key(),
+                    'FORM_RENDER_CACHE_TIMEOUT': settings.FORM_RENDER_CACHE_TIMEOUT,
+
                     #TODO: Set user properties
                     'reg_user': RegisteredUser.objects.get(user__username=request.GET['username']),
                     'USER_DEFAULT_LANG_CODE': 'hin'
@@ -89,12 +98,34 @@ def open_survey_form(request, survey_uid, phase_id=None):
         # Invalid link
         raise Http404("Invalid survey.")
 
+# Short-lived cache of survey phase existence used by submission.
+# Format: { ("<survey_uid>", "<phase_id>"): <bool>, ... }
+survey_phase_exists_cache = TTLCache(ttl=settings.STOREROOM_LOOKUP_CACHE_TTL, max_size=4096)
+
+def survey_phase_exists(survey_uid, phase_id):
+    """
+    Returns True if survey phase exists. Result is cached for ``settings.STOREROOM_LOOKUP_CACHE_TTL`` seconds.
+    Malformed ids (e.g. null, list or object from client json) are reported as non-existent.
+
+    **Authors**: Gagandeep Singh
+    """
+    if not isinstance(survey_uid, basestring):
+        return False
+    if isinstance(phase_id, bool) or not (isinstance(phase_id, (int, long)) or (isinstance(phase_id, basestring) and phase_id.isdigit())):
+        return False
+
+    return survey_phase_exists_cache.get_or_set(
+        (str(survey_uid), str(phase_id)),
+        lambda: SurveyPhase.objects.filter(id=int(phase_id), survey__survey_uid=survey_uid).exists()
+    )
+
 # TODO: Mobile/Source validation firewall
 @csrf_exempt
 def submit_survey_response(request):
     """
     View to submit a response for survey phase. This view receives response
-    submitted by the user and is queued for processing.
+    submitted by the user and is queued for processing. If queue is overloaded,
+    response is rejected with http 429 and ``Retry-After`` header (refer :func:`storeroom.buffer.get_backpressure`).
 
     **Type**: POST
 
@@ -104,24 +135,30 @@ def submit_survey_response(request):
     if request.method.lower() == 'post':
         token = request.POST['token']
 
+        # Backpressure
+        retry_after = get_backpressure(ResponseQueue.CT_SURVEY_RESPONSE)
+        if retry_after is not None:
+            return ApiResponse(
+                status = ApiResponse.ST_TOO_MANY_REQUESTS,
+                message = 'Too many responses in queue. Please retry after {} seconds.'.format(retry_after),
+                retry_after = retry_after
+            ).gen_http_response(use_http_code=True, headers={'Retry-After': str(retry_after)})
+
         response_data = request.POST['response']
 
         try:
             response_json = json.loads(response_data)
 
-            # Get Survey
-            survey = Survey.objects.get(survey_uid=response_json['survey_uid'])
-            phase = survey.phases.get(id=response_json['phase_id'])
+            # Check Survey & phase
+            if not survey_phase_exists(response_json['survey_uid'], response_json['phase_id']):
+                raise SurveyPhase.DoesNotExist()
 
-            resp_queue = ResponseQueue.objects.create(
-                context = ResponseQueue.CT_SURVEY_RESPONSE,
-                data    = response_data,
-            )
+            enqueue_response(ResponseQueue.CT_SURVEY_RESPONSE, response_data)
 
             return ApiResponse(status=ApiResponse.ST_SUCCESS, message='Response queued for processing.').gen_http_response()
 
-        except ValueError:
-            # No JSON object could be decoded
+        except (ValueError, TypeError):
+            # No JSON object could be decoded or it is not an object
             return ApiResponse(status=ApiResponse.ST_BAD_REQUEST, message="Badly formed 'response' structure.").gen_http_response()
         except KeyError as ex:
             # response_json does not contain some require data
@@ -129,6 +166,117 @@ def submit_survey_response(request):
         except (Survey.DoesNotExist, SurveyPhase.DoesNotExist) as ex:
             # Survey or Survey phase does not exists
             return ApiResponse(status=ApiResponse.ST_FAILED, message='Invalid survey or survey phase.').gen_http_response()
+        except BufferWriteError as ex:
+            return ApiResponse(status=ApiResponse.ST_SERVER_ERROR, message=ex.message).gen_http_response()
+
+    else:
+        # GET Forbidden
+        return ApiResponse(status=ApiResponse.ST_FORBIDDEN, message='Use post.').gen_http_response()
+
+# TODO: Mobile/Source validation firewall
+@csrf_exempt
+def submit_survey_responses_batch(request):
+    """
+    View to submit many survey responses at once; used by devices syncing responses collected offline.
+    Responses are validated for envelope (``response_uid``, ``survey_uid`` & ``phase_id``) and all
+    valid responses are queued with a single write.
+
+    **Type**: POST
+
+    **Request**:
+
+        - Query parameter ``token``.
+        - Body: JSON array of responses or NDJSON (``Content-Type: application/x-ndjson``), optionally
+          gzip compressed (``Content-Encoding: gzip``). Limited by ``settings.STOREROOM_BATCH_MAX_RESPONSES``
+          and ``settings.STOREROOM_BATCH_MAX_BYTES``.
+
+    **Response**: ``results`` contains a status per response in the order submitted::
+
+        [
+            { "response_uid": "<uid>", "status": "queued|invalid|duplicate|failed", "message": "<reason>" },
+            ...
+        ]
+
+    Client must retry only the responses with status ``failed``; ``invalid`` responses will never be accepted.
+    If queue is overloaded, whole batch is rejected with http 429 and ``Retry-After`` header.
+
+    **Authors**: Gagandeep Singh
+    """
+
+    if request.method.lower() == 'post':
+        token = request.GET.get('token', None)
+
+        # Backpressure
+        retry_after = get_backpressure(ResponseQueue.CT_SURVEY_RESPONSE)
+        if retry_after is not None:
+            return ApiResponse(
+                status = ApiResponse.ST_TOO_MANY_REQUESTS,
+                message = 'Too many responses in queue. Please retry after {} seconds.'.format(retry_after),
+                retry_after = retry_after
+            ).gen_http_response(use_http_code=True, headers={'Retry-After': str(retry_after)})
+
+        try:
+            list_responses = load_json_batch_payload(
+                request,
+                max_bytes = settings.STOREROOM_BATCH_MAX_BYTES,
+                max_items = settings.STOREROOM_BATCH_MAX_RESPONSES
+            )
+        except ValueError as ex:
+            return ApiResponse(status=ApiResponse.ST_BAD_REQUEST, message=ex.message or "Badly formed payload.").gen_http_response()
+
+        results = []
+        list_queue_idx = []
+        list_queue_data = []
+        set_uids = set()
+        for response_json in list_responses:
+            response_uid = response_json.get('response_uid', None)
+            result = {"response_uid": response_uid, "status": "queued", "message": None}
+            results.append(result)
+
+            try:
+                if not response_uid:
+                    raise KeyError("'response_uid' is required.")
+                if response_uid in set_uids:
+                    result["status"] = "duplicate"
+                    result["message"] = "Response repeated in this batch."
+                    continue
+                set_uids.add(response_uid)
+
+                # Check Survey & phase
+                if not survey_phase_exists(response_json['survey_uid'], response_json['phase_id']):
+                    raise SurveyPhase.DoesNotExist()
+            except KeyError as ex:
+                result["status"] = "invalid"
+                result["message"] = "Missing {}".format(ex.message)
+                continue
+            except (ValueError, TypeError, SurveyPhase.DoesNotExist):
+                result["status"] = "invalid"
+                result["message"] = "Invalid survey or survey phase."
+                continue
+
+            list_queue_idx.append(len(results) - 1)
+            list_queue_data.append(json.dumps(response_json))
+
+        # Queue all at once
+        list_errors = enqueue_responses(ResponseQueue.CT_SURVEY_RESPONSE, list_queue_data)
+        for idx, error in zip(list_queue_idx, list_errors):
+            if error is not None:
+                results[idx]["status"] = "failed"
+                results[idx]["message"] = error
+
+        count_queued = sum(1 for result in results if result["status"] == "queued")
+        if count_queued == len(results):
+            status = ApiResponse.ST_SUCCESS
+        elif count_queued:
+            status = ApiResponse.ST_PARTIAL_SUCCESS
+        else:
+            status = ApiResponse.ST_FAILED
+
+        return ApiResponse(
+            status = status,
+            message = '{} of {} response(s) queued for processing.'.format(count_queued, len(results)),
+            results = results
+        ).gen_http_response()
 
     else:
         # GET Forbidden
@@ -3,7 +3,9 @@
 # permission of Gagandeep Singh.
 from django.core.exceptions import ValidationError
 from django.http import JsonResponse
+import json
 import ujson
+import zlib
 
 class ApiResponse(object):
     """
@@ -14,7 +16,8 @@ class ApiResponse(object):
         >>> { "code": <int http code>, "status": "<status>", "message":"<message">, ... }
 
     .. note::
-        Response created by this class is always http 200 OK.
+        Response created by this class is always http 200 OK unless ``use_http_code`` is set
+        in :func:`gen_http_response`.
 
     **Authors**: Gagandeep Singh
     """
@@ -29,6 +32,7 @@ class ApiResponse(object):
     ST_UNAUTHORIZED = 'unauthorized ' # Authentication fails
     ST_BAD_REQUEST = 'bad_request'    # Bad request formation/Invalid or missing parameteres
     ST_SERVER_ERROR = 'server_error'  # Any internal server error
+    ST_TOO_MANY_REQUESTS = 'too_many_requests'  # Server is overloaded; retry later
 
     CH_STATUS = (
         (ST_SUCCESS, 'Success'),
@@ -40,6 +44,7 @@ class ApiResponse(object):
         (ST_UNAUTHORIZED, 'Unauthorized'),
         (ST_BAD_REQUEST, 'Bad request'),
         (ST_SERVER_ERROR, 'Server error'),
+        (ST_TOO_MANY_REQUESTS, 'Too many requests'),
     )
 
     STATUS_CODES = {
@@ -51,7 +56,8 @@ class ApiResponse(object):
         ST_FORBIDDEN: 403,
         ST_UNAUTHORIZED: 401,
         ST_BAD_REQUEST: 400,
-        ST_SERVER_ERROR: 500
+        ST_SERVER_ERROR: 500,
+        ST_TOO_MANY_REQUESTS: 429
     }
 
     # --- Fields ---
@@ -119,11 +125,66 @@ class ApiResponse(object):
         self.__data['code'] = ApiResponse.STATUS_CODES[status]
 
 
-    def gen_http_response(self):
+    def gen_http_response(self, use_http_code=False, headers=None):
         """
         Method to generate http response instance. Return this from the view.
 
+        :param use_http_code: If True, response ``code`` is used as http status instead of 200 OK.
+            Use this when clients or proxies must act on the status (e.g. 429).
+        :param headers: (Optional) Dict of additional http headers
         :return: Returns :class:`django.http.JsonResponse` instance
         """
+        response = JsonResponse(self.__data, status=self.__data['code'] if use_http_code else 200)
+        for key, value in (headers or {}).iteritems():
+            response[key] = value
 
-        return JsonResponse(self.__data)
\ No newline at end of file
+        return response
+
+
+# ---------- Batch payload ----------
+GZIP_MAGIC = b'\x1f\x8b'
+
+def load_json_batch_payload(request, max_bytes, max_items):
+    """
+    Method to load list of json objects from request body of a batch API. Body can be a JSON array or
+    NDJSON (one json object per line; content type ``application/x-ndjson``), optionally gzip
+    compressed (``Content-Encoding: gzip`` or detected by gzip header).
+
+    :param request: Django request
+    :param max_bytes: Maximum size of (decompressed) body
+    :param max_items: Maximum number of items
+    :return: List of json objects
+    :raises: ``ValueError`` if payload is malformed or exceeds limits
+
+    **Authors**: Gagandeep Singh
+    """
+    body = request.body
+
+    # Decompress
+    if request.META.get('HTTP_CONTENT_ENCODING', '').lower() == 'gzip' or body[:2] == GZIP_MAGIC:
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            body = decompressor.decompress(body, max_bytes + 1)
+        except zlib.error:
+            raise ValueError("Payload is not a valid gzip stream.")
+        if len(body) > max_bytes or decompressor.unconsumed_tail:
+            raise ValueError("Payload exceeds {} bytes.".format(max_bytes))
+    elif len(body) > max_bytes:
+        raise ValueError("Payload exceeds {} bytes.".format(max_bytes))
+
+    # Parse
+    if 'ndjson' in request.META.get('CONTENT_TYPE', '').lower():
+        list_items = [json.loads(line) for line in body.splitlines() if line.strip()]
+    else:
+        list_items = json.loads(body)
+        if not isinstance(list_items, list):
+            raise ValueError("Payload must be a json array.")
+
+    if len(list_items) > max_items:
+        raise ValueError("Payload cannot have more than {} items.".format(max_items))
+
+    for item in list_items:
+        if not isinstance(item, dict):
+            raise ValueError("Each item of the payload must be a json object.")
+
+    return list_items
@@ -0,0 +1,247 @@
+# Copyright (C) 2017 Feedvay (Gagandeep Singh: singh.gagan144@gmail.com) - All Rights Reserved
+# Content in this document can not be copied and/or distributed without the express
+# permission of Gagandeep Singh.
+from collections import OrderedDict
+import threading
+import time
+
+class LRUCache(object):
+    """
+    Thread-safe, process-local 'least recently used' cache with a fixed capacity.
+    When the cache is full, the least recently accessed key is evicted to make space for the new one.
+
+    The cache keeps count of hits & misses which can be obtained using :func:`stats`.
+
+    .. warning::
+        Values are shared across all consumers of the cache and are not copied. Please make
+        sure cached values are never mutated.
+
+    **Authors**: Gagandeep Singh
+    """
+
+    def __init__(self, max_size=128):
+        if max_size < 1:
+            raise ValueError("'max_size' must be atleast 1.")
+
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+        self.__data = OrderedDict()
+        self.__lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.__data)
+
+    def __contains__(self, key):
+        return key in self.__data
+
+    def get(self, key, default=None):
+        """
+        Method to get value for a key. Accessed key is marked as most recently used.
+
+        :param key: Cache key
+        :param default: Value to return if key is not found
+        :return: Cached value or ``default``
+
+        **Authors**: Gagandeep Singh
+        """
+        with self.__lock:
+            try:
+                value = self.__data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+
+            self.__data[key] = value
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """
+        Method to add or replace value for a key. Least recently used key is evicted
+        if cache is full.
+
+        :param key: Cache key
+        :param value: Value to be cached
+
+        **Authors**: Gagandeep Singh
+        """
+        with self.__lock:
+            self.__data.pop(key, None)
+            self.__data[key] = value
+
+            while len(self.__data) > self.max_size:
+                self.__data.popitem(last=False)
+
+    def get_or_set(self, key, loader):
+        """
+        Method to get value for a key. In case of a miss, ``loader`` is called to
+        obtain the value which is then cached.
+
+        :param key: Cache key
+        :param loader: Callable without arguments that returns value for the key
+        :return: Cached value
+
+        **Authors**: Gagandeep Singh
+        """
+        with self.__lock:
+            try:
+                value = self.__data.pop(key)
+                self.__data[key] = value
+                self.hits += 1
+                return value
+            except KeyError:
+                self.misses += 1
+
+        # Load outside lock so that slow loaders do not block other keys
+        value = loader()
+        self.set(key, value)
+        return value
+
+    def delete(self, key):
+        """
+        Method to remove a key from the cache.
+
+        :return: True if key was present, else False
+
+        **Authors**: Gagandeep Singh
+        """
+        with self.__lock:
+            return self.__data.pop(key, None) is not None
+
+    def delete_where(self, condition):
+        """
+        Method to remove all keys for which ``condition(key)`` is true.
+
+        :param condition: Callable accepting a key and returning bool
+        :return: Number of keys removed
+
+        **Authors**: Gagandeep Singh
+        """
+        with self.__lock:
+            list_keys = [key for key in self.__data.iterkeys() if condition(key)]
+            for key in list_keys:
+                del self.__data[key]
+            return len(list_keys)
+
+    def clear(self):
+        """
+        Method to remove all keys and reset counters.
+
+        **Authors**: Gagandeep Singh
+        """
+        with self.__lock:
+            self.__data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """
+        Method to get cache statistics.
+
+        :return: JSON dict of format ``{ "size": <int>, "max_size": <int>, "hits": <int>, "misses": <int> }``
+
+        **Authors**: Gagandeep Singh
+        """
+        with self.__lock:
+            return {
+                "size": len(self.__data),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+class TTLCache(object):
+    """
+    Thread-safe, process-local cache whose values expire ``ttl`` seconds after they were set.
+    Capacity is bounded using :class:`utilities.cache_utils.LRUCache`.
+
+    Use it for lookups that are read very frequently and can be stale for a short while, for example
+    existence checks in high traffic views.
+
+    .. warning::
+        Values are shared across all consumers of the cache and are not copied. Please make
+        sure cached values are never mutated.
+
+    **Authors**: Gagandeep Singh
+    """
+
+    def __init__(self, ttl, max_size=128):
+        if ttl <= 0:
+            raise ValueError("'ttl' must be greater than 0.")
+
+        self.ttl = ttl
+        self.__cache = LRUCache(max_size=max_size)
+
+    def __len__(self):
+        return len(self.__cache)
+
+    def get(self, key, default=None):
+        """
+        Method to get unexpired value for a key.
+
+        :param key: Cache key
+        :param default: Value to return if key is not found or has expired
+        :return: Cached value or ``default``
+
+        **Authors**: Gagandeep Singh
+        """
+        item = self.__cache.get(key, None)
+        if item is None or item[0] < time.time():
+            return default
+        return item[1]
+
+    def set(self, key, value):
+        """
+        Method to add or replace value for a key. Value expires after ``ttl`` seconds.
+
+        **Authors**: Gagandeep Singh
+        """
+        self.__cache.set(key, (time.time() + self.ttl, value))
+
+    def get_or_set(self, key, loader):
+        """
+        Method to get value for a key. In case of a miss or expired value, ``loader`` is called to
+        obtain the value which is then cached.
+
+        :param key: Cache key
+        :param loader: Callable without arguments that returns value for the key
+        :return: Cached value
+
+        **Authors**: Gagandeep Singh
+        """
+        item = self.__cache.get(key, None)
+        if item is not None and item[0] >= time.time():
+            return item[1]
+
+        value = loader()
+        self.set(key, value)
+        return value
+
+    def delete(self, key):
+        """
+        Method to remove a key from the cache.
+
+        **Authors**: Gagandeep Singh
+        """
+        return self.__cache.delete(key)
+
+    def clear(self):
+        """
+        Method to remove all keys.
+
+        **Authors**: Gagandeep Singh
+        """
+        self.__cache.clear()
+
+    def stats(self):
+        """
+        Method to get cache statistics. Refer :func:`utilities.cache_utils.LRUCache.stats`.
+
+        **Authors**: Gagandeep Singh
+        """
+        stats = self.__cache.stats()
+        stats['ttl'] = self.ttl
+        return stats
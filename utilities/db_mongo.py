@@ -27,4 +27,30 @@ MAPPING_MONGO_FLD_PYTHON = {
     "ComplexDateTimeField": timezone.datetime,
     "UUIDField": uuid.uuid4,
     "GeoPointField": list
-}
\ No newline at end of file
+}
+
+def reconnect_mongo():
+    """
+    Method to re-establish MongoDb connection. Mongo client is not fork-safe; hence every
+    child process (for example, workers of a multiprocessing pool) must call this method before
+    using any mongo model.
+
+    Connection settings are taken from ``settings.MONGO_DATABASE``.
+
+    **Authors**: Gagandeep Singh
+    """
+    from django.conf import settings
+    from mongoengine.base.common import _document_registry
+    from mongoengine.connection import connect, disconnect
+
+    disconnect()
+
+    # Models cache their collection which is bound to the old client
+    for doc_cls in _document_registry.itervalues():
+        doc_cls._collection = None
+
+    connect(
+        db = settings.MONGO_DATABASE["NAME"],
+        host = settings.MONGO_DATABASE["HOST"],
+        port = settings.MONGO_DATABASE["PORT"],
+    )
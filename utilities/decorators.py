@@ -16,6 +16,19 @@ from accounts.utils import ClassifyRegisteredUser, lookup_permission
 from clients.models import Organization, OrganizationMember
 from utilities.api_utils import ApiResponse
 
+RE_MINIFY_WHITESPACE = re.compile('(^\s*|^\s+|\n|\s+$)', re.MULTILINE)
+
+def minify_content(content):
+    """
+    Method to minify html/javascript content by removing new lines and leading & trailing whitespaces of each line.
+
+    :param content: Content string
+    :return: Minified content
+
+    **Authors**: Gagandeep Singh
+    """
+    return RE_MINIFY_WHITESPACE.sub('', content)
+
 def minified_response(f):
     """
     Django view decorator to minify html page.
@@ -26,13 +39,7 @@ def minified_response(f):
     def minify(*args, **kwargs):
         response = f(*args, **kwargs)
 
-        content = response.content
-
-        re_whitespace = re.compile('(^\s*|^\s+|\n|\s+$)', re.MULTILINE)
-
-        content = re_whitespace.sub('', content)
-
-        response.content = content
+        response.content = minify_content(response.content)
         return response
 
     return minify